@@ -0,0 +1,55 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python bench/compare.py bench/results/baseline.json bench/results/new.json --threshold 0.2
+
+Exits 1 if any timing got slower by more than ``threshold`` (a fraction).
+"""
+import sys
+import json
+import argparse
+
+def timings(report, prefix=""):
+    """Flatten a results file to {path: seconds}, taking each benchmark's
+    median (or its single ``seconds`` run)."""
+    flat = {}
+    for key, value in report.items():
+        if key == "meta" or not isinstance(value, dict):
+            continue
+        path = f"{prefix}{key}"
+        if "median" in value:
+            flat[path] = value["median"]
+        elif "seconds" in value and "requests" not in value:
+            flat[path] = value["seconds"]
+        elif "latency_p50" in value:
+            flat[path + ".p50"] = value["latency_p50"]
+            flat[path + ".p95"] = value["latency_p95"]
+        else:
+            flat.update(timings(value, path + "."))
+    return flat
+
+def compare(baseline, current, threshold):
+    old, new = timings(baseline), timings(current)
+    regressions = []
+    for path in sorted(old.keys() & new.keys()):
+        if not old[path] or new[path] is None:
+            continue
+        change = new[path] / old[path] - 1
+        flag = "❌" if change > threshold else ("✅" if change < -threshold else "  ")
+        print(f"{flag} {path:<55} {old[path] * 1000:10.3f} → {new[path] * 1000:10.3f} ms  {change:+7.1%}")
+        if change > threshold:
+            regressions.append(path)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two bench/run.py result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
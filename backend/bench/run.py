@@ -0,0 +1,258 @@
+"""Offline benchmark suite for the trend pipeline.
+
+Synthesizes Apify-shaped corpora (Zipfian hashtags, bodies copied from
+``src/data/*.json``) and measures hashtag extraction, TF-IDF scoring,
+relevance filtering, the cache paths and end-to-end ``/analyze``
+throughput against local Apify and LLM stubs. Everything runs in a
+scratch directory; results are written as JSON.
+
+    python bench/run.py --sizes 1000,10000,100000 --out bench/results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench.synth import Corpus, VOCAB_SIZE, ZIPF_EXPONENT
+from bench.stubs import start_apify_stub, start_llm_stub, HashEncoder
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# ─── Timing helpers ────────────────────────────────────────────────────
+def measure(fn, repeat=5, warmup=1):
+    """Run ``fn`` ``warmup + repeat`` times; stats over the timed runs."""
+    for _ in range(warmup):
+        fn()
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": repeat}
+
+def once(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def per_second(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+# ─── Benchmarks ────────────────────────────────────────────────────────
+def bench_corpus(posts, repeat):
+    """extract_hashtags, compute_tf_idf_trends and score_tag_counts (vectorized and pure-Python paths)."""
+    from src.trend_analysis import (extract_hashtags, count_hashtags, score_tag_counts, score_tag_counts_python,
+                                    compute_tf_idf_trends)
+
+    captions = [post["caption"] for post in posts]
+
+    def extract():
+        for caption in captions:
+            extract_hashtags(caption)
+
+    results = {}
+    results["extract_hashtags"] = stats = measure(extract, repeat)
+    stats["posts_per_s"] = per_second(len(posts), stats["median"])
+    results["compute_tf_idf_trends"] = stats = measure(lambda: compute_tf_idf_trends(posts, top_n=15), repeat)
+    stats["posts_per_s"] = per_second(len(posts), stats["median"])
+    counts = count_hashtags(posts)
+    results["count_and_score_python"] = stats = measure(
+        lambda: score_tag_counts_python(*count_hashtags(posts), top_n=15), repeat)
+    stats["posts_per_s"] = per_second(len(posts), stats["median"])
+    # What /analyze runs on merged per-hashtag counts
+    results["score_tag_counts"] = measure(lambda: score_tag_counts(*counts, top_n=30), repeat)
+    results["score_tag_counts_python"] = measure(lambda: score_tag_counts_python(*counts, top_n=30), repeat)
+    return results
+
+def bench_store(hashtag, posts, repeat):
+    """Post store ingest, snapshot build and the tag-count/top-posts cache paths."""
+    from src.post_store import get_post_store
+    from src.snapshot import get_snapshot_store
+    from src.tag_counts import tag_counts_cache
+
+    store = get_post_store()
+    seconds, _ = once(lambda: store.ingest(hashtag, iter(posts)))
+    results = {"ingest": {"seconds": seconds, "posts_per_s": per_second(len(posts), seconds)}}
+    seconds, _ = once(lambda: get_snapshot_store().get(hashtag))
+    results["snapshot_build"] = {"seconds": seconds}
+    seconds, _ = once(lambda: tag_counts_cache.merged([hashtag]))
+    results["tag_counts_cold"] = {"seconds": seconds}
+    results["tag_counts_warm"] = measure(lambda: tag_counts_cache.merged([hashtag]), repeat * 20)
+    results["top_posts_warm"] = measure(lambda: get_snapshot_store().get(hashtag).top_posts("engagement", 6), repeat * 20)
+    return results
+
+def bench_relevance(corpus, repeat):
+    """filter_irrelevant_trends on cold and cached tag embeddings, plus the
+    keyword and embedding cache hit paths."""
+    from src.relevance import filter_irrelevant_trends
+    from src.embedding_service import get_embedding_service
+    from src.embedding_cache import get_embedding_cache
+    from src.keyword_extractor import extract_keywords_llama
+
+    prompt = "Handmade skincare products for a sustainable beauty routine"
+    trends = {tag: {"score": 1.0, "volume": 1, "velocity": None, "window_start": None}
+              for tag in corpus.popular_tags(1000)[-15:]}
+    keywords = ["skincare"]
+    cold, _ = once(lambda: filter_irrelevant_trends(prompt, trends, keywords))
+    results = {
+        "filter_irrelevant_trends_cold": {"seconds": cold},
+        "filter_irrelevant_trends_warm": measure(
+            lambda: filter_irrelevant_trends(prompt, trends, keywords), repeat),
+    }
+    cache = get_embedding_cache(get_embedding_service().model_name)
+    tags = list(trends)
+    results["embedding_cache_hit"] = measure(lambda: cache.get_many(tags), repeat * 20)
+    extract_keywords_llama(prompt)
+    results["keyword_cache_hit"] = measure(lambda: extract_keywords_llama(prompt), repeat * 20)
+    return results
+
+def bench_analyze(corpus, requests, concurrency, prompts):
+    """End-to-end /analyze through the Flask app: a cold pass (every
+    keyword scraped) then a warm pass over the same prompts."""
+    from src.app import create_app
+    from src.metrics import STAGE_SECONDS
+
+    app = create_app()
+    topics = corpus.popular_tags(400)
+    texts = [f"Content about {topics[i]} and {topics[-i - 1]} for a small brand (#{i})" for i in range(prompts)]
+
+    def call(prompt):
+        t0 = time.perf_counter()
+        response = app.test_client().post("/analyze", json={"prompt": prompt})
+        return time.perf_counter() - t0, response.status_code
+
+    results = {}
+    for phase, batch in (("cold", texts), ("warm", [texts[i % prompts] for i in range(requests)])):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            outcomes = list(executor.map(call, batch))
+        elapsed = time.perf_counter() - t0
+        latencies = [seconds for seconds, status in outcomes if status == 200]
+        results[phase] = {
+            "requests": len(batch),
+            "errors": sum(status != 200 for _, status in outcomes),
+            "seconds": elapsed,
+            "requests_per_s": per_second(len(batch), elapsed),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+        }
+    results["stage_count"] = {stage: STAGE_SECONDS.count(stage=stage)
+                              for stage in ("keywords", "scraping", "trends", "suggestions")}
+    return results
+
+# ─── Runner ────────────────────────────────────────────────────────────
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated corpus sizes (1000000 needs a few GB of RAM)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--vocab", type=int, default=VOCAB_SIZE)
+    parser.add_argument("--zipf", type=float, default=ZIPF_EXPONENT)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--embeddings", choices=("hash", "model"), default="hash",
+                        help="hash: deterministic stand-in encoder; model: load EMBEDDING_MODEL")
+    parser.add_argument("--requests", type=int, default=200, help="warm /analyze requests")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--prompts", type=int, default=20, help="distinct /analyze prompts")
+    parser.add_argument("--posts-per-hashtag", type=int, default=200)
+    parser.add_argument("--apify-latency", type=float, default=0.0, help="stub delay per scrape, seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub delay per LLM call, seconds")
+    parser.add_argument("--skip", default="", help="comma-separated: corpus,store,relevance,analyze")
+    parser.add_argument("--out", default=None, help="results file (default bench/results/<timestamp>.json)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    skip = set(filter(None, args.skip.split(",")))
+    out = os.path.abspath(args.out or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"))
+
+    corpus = Corpus(seed=args.seed, vocab_size=args.vocab, zipf_exponent=args.zipf)
+    apify, apify_url = start_apify_stub(corpus, args.posts_per_hashtag, args.apify_latency)
+    llm, llm_url = start_llm_stub(corpus, args.llm_latency)
+
+    # Every cache and store lives in a scratch dir; config is read at import
+    workdir = tempfile.mkdtemp(prefix="hashtrend-bench-")
+    os.chdir(workdir)
+    os.environ.update({
+        "APIFY_API_TOKEN": "bench", "APIFY_BASE_URL": apify_url,
+        "LLM_BASE_URL": llm_url, "REFRESH_SCHEDULER": "0",
+    })
+    os.environ.pop("HF_TOKEN", None)
+
+    from src.embedding_service import get_embedding_service
+    service = get_embedding_service()
+    if args.embeddings == "hash":
+        service._model = HashEncoder()   # skip loading sentence-transformers entirely
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embeddings": args.embeddings if args.embeddings == "hash" else service.model_name,
+            "args": vars(args),
+        },
+        "sizes": {},
+    }
+    try:
+        for size in sizes:
+            print(f"🧪 Synthesizing {size} posts...")
+            posts = list(corpus.posts(size))
+            result = report["sizes"][str(size)] = {}
+            if "corpus" not in skip:
+                result.update(bench_corpus(posts, args.repeat))
+            if "store" not in skip:
+                result.update(bench_store(f"bench{size}", posts, args.repeat))
+            for name, stats in result.items():
+                print(f"  {name:<28} {stats.get('median', stats.get('seconds')) * 1000:10.2f} ms")
+            del posts
+        if "relevance" not in skip:
+            report["relevance"] = bench_relevance(corpus, args.repeat)
+        if "analyze" not in skip:
+            report["analyze"] = bench_analyze(corpus, args.requests, args.concurrency, args.prompts)
+            report["analyze"]["apify_calls"] = apify.handler.calls
+            report["analyze"]["llm_calls"] = llm.handler.calls
+            for phase in ("cold", "warm"):
+                stats = report["analyze"][phase]
+                print(f"  /analyze {phase:<5} {stats['requests_per_s']} req/s  p50={stats['latency_p50']}  "
+                      f"p95={stats['latency_p95']}  errors={stats['errors']}")
+    finally:
+        apify.shutdown()
+        llm.shutdown()
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results → {out}")
+    return report
+
+if __name__ == "__main__":
+    main()
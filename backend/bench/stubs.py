@@ -0,0 +1,100 @@
+import json
+import time
+import zlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+# ─── Local stand-ins for Apify and the LLM ─────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _json(self, payload, status=200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+    def log_message(self, *args):
+        pass
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=handler.__name__, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def start_apify_stub(corpus, posts_per_hashtag=200, latency=0.0):
+    """Serve ``run-sync-get-dataset-items`` from ``corpus``. Each hashtag
+    always gets the same posts. Returns (server, base_url) for APIFY_BASE_URL."""
+
+    class ApifyStub(_Handler):
+        calls = 0
+
+        def do_POST(self):
+            body = self._body()
+            hashtag = body["hashtags"][0]
+            ApifyStub.calls += 1
+            time.sleep(latency)
+            seed = zlib.crc32(hashtag.encode())
+            self._json(list(corpus.posts(posts_per_hashtag, seed=seed, hashtag=hashtag)), status=201)
+
+    server, url = _serve(ApifyStub)
+    server.handler = ApifyStub
+    return server, url
+
+def start_llm_stub(corpus, latency=0.0):
+    """OpenAI-compatible ``/v1/chat/completions``. Keyword requests get
+    popular corpus tags, so scraping hits them; everything else gets a
+    numbered list. Returns (server, base_url) for LLM_BASE_URL."""
+    popular = corpus.popular_tags(200)
+
+    class LLMStub(_Handler):
+        calls = 0
+
+        def do_POST(self):
+            body = self._body()
+            LLMStub.calls += 1
+            time.sleep(latency)
+            prompt = json.dumps(body.get("messages", []))
+            if "Extract" in prompt and "keywords" in prompt:
+                start = zlib.crc32(prompt.encode()) % (len(popular) - 3)
+                text = ", ".join(popular[start:start + 3])
+            else:
+                text = "1. Post short reels\n2. Reply to every comment\n3. Use a clear hook"
+            self._json({
+                "id": "bench", "object": "chat.completion", "created": 0, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                          "total_tokens": (len(prompt) + len(text)) // 4},
+            })
+
+    server, url = _serve(LLMStub)
+    server.handler = LLMStub
+    return server, url + "/v1"
+
+# ─── Hash embeddings ───────────────────────────────────────────────────
+class HashEncoder:
+    """Deterministic character-trigram embeddings with the SentenceTransformer
+    ``encode`` signature. Stands in for the model when it can't be loaded,
+    so everything around the model still gets measured."""
+
+    device = "cpu"
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, sentences, normalize_embeddings=False, convert_to_tensor=False, **kwargs):
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            text = f"  {text.lower()} "
+            for i in range(len(text) - 2):
+                vectors[row, zlib.crc32(text[i:i + 3].encode()) % self.dim] += 1.0
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
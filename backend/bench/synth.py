@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import glob
+import random
+import hashlib
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# ─── Config ────────────────────────────────────────────────────────────
+TEMPLATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'data'))
+VOCAB_SIZE = 50_000      # distinct hashtags in the synthetic corpus
+ZIPF_EXPONENT = 1.1      # tag popularity ~ 1 / rank^s
+CORPUS_DAYS = 7          # timestamps spread over the last week
+CAPTION_CHARS = 160      # template caption text kept before the hashtags
+
+def _strip_hashtags(caption):
+    return re.sub(r"#\S+", "", caption or "").strip()
+
+# ─── Templates ─────────────────────────────────────────────────────────
+def load_templates(template_dir=TEMPLATE_DIR):
+    """Apify posts from the sample ``data/*.json`` files, deduplicated by id."""
+    posts = {}
+    for path in sorted(glob.glob(os.path.join(template_dir, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            for post in json.load(f):
+                if isinstance(post, dict) and post.get("id"):
+                    posts.setdefault(post["id"], post)
+    if not posts:
+        raise RuntimeError(f"No template posts found in {template_dir}")
+    return list(posts.values())
+
+class Corpus:
+    """Deterministic generator of Apify-shaped posts.
+
+    Post bodies are copied from the templates; hashtags are drawn from a
+    Zipf distribution over a vocabulary seeded with the templates' real
+    tags (most popular first) and padded with synthetic ones.
+    """
+
+    def __init__(self, seed=42, vocab_size=VOCAB_SIZE, zipf_exponent=ZIPF_EXPONENT, templates=None):
+        self.seed = seed
+        self.templates = templates or load_templates()
+        real = {}
+        for post in self.templates:
+            for tag in post.get("hashtags") or []:
+                tag = tag.lower()
+                real[tag] = real.get(tag, 0) + 1
+        ranked = sorted(real, key=lambda tag: -real[tag])
+        self.vocab = ranked[:vocab_size] + [f"tag{i}" for i in range(max(0, vocab_size - len(ranked)))]
+        weights = 1.0 / np.arange(1, len(self.vocab) + 1) ** zipf_exponent
+        self.probabilities = weights / weights.sum()
+        # Tags per post follow the templates' own distribution
+        self.tag_counts = [len(post.get("hashtags") or []) or 1 for post in self.templates]
+        self.now = datetime(2025, 7, 6, 12, tzinfo=timezone.utc)
+
+    def popular_tags(self, n):
+        return self.vocab[:n]
+
+    def posts(self, n, seed=None, hashtag=None):
+        """Yield ``n`` posts. With ``hashtag`` every post carries that tag,
+        the way an Apify hashtag scrape would."""
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        pick = random.Random(int(rng.integers(1 << 31)))
+        block = 4096
+        for start in range(0, n, block):
+            size = min(block, n - start)
+            counts = [pick.choice(self.tag_counts) for _ in range(size)]
+            drawn = rng.choice(len(self.vocab), size=sum(counts), p=self.probabilities)
+            offsets = rng.uniform(0, CORPUS_DAYS * 86400, size=size)
+            likes = rng.pareto(1.5, size=size) * 20
+            offset = 0
+            for i in range(size):
+                # Draws repeat popular tags; a post lists each tag once
+                tags = list(dict.fromkeys(self.vocab[t] for t in drawn[offset:offset + counts[i]]))
+                offset += counts[i]
+                if hashtag is not None and hashtag not in tags:
+                    tags[0:0] = [hashtag]
+                yield self._post(start + i, pick.choice(self.templates), tags, offsets[i], int(likes[i]), hashtag)
+
+    def _post(self, index, template, tags, age, likes, hashtag):
+        post_id = hashlib.md5(f"{self.seed}:{hashtag}:{index}".encode()).hexdigest()[:18]
+        text = _strip_hashtags(template.get("caption"))[:CAPTION_CHARS]
+        timestamp = (self.now - timedelta(seconds=float(age))).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return {
+            "inputUrl": f"https://www.instagram.com/explore/tags/{hashtag or tags[0]}",
+            "id": post_id,
+            "type": template.get("type", "Image"),
+            "shortCode": post_id[:11],
+            "caption": text + "\n\n" + " ".join("#" + tag for tag in tags),
+            "hashtags": tags,
+            "url": f"https://www.instagram.com/p/{post_id[:11]}/",
+            "commentsCount": likes // 10,
+            "likesCount": likes,
+            "timestamp": timestamp,
+            "ownerUsername": template.get("ownerUsername"),
+            "ownerFullName": template.get("ownerFullName"),
+            "ownerId": template.get("ownerId"),
+            "displayUrl": template.get("displayUrl"),
+        }
+
+# ─── CLI: write a corpus to disk ───────────────────────────────────────
+if __name__ == "__main__":
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    path = sys.argv[2] if len(sys.argv) > 2 else f"synthetic_{n}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, post in enumerate(Corpus().posts(n)):
+            f.write(("," if i else "") + json.dumps(post, ensure_ascii=False))
+        f.write("]")
+    print(f"🧪 Wrote {n} synthetic posts → {path}")
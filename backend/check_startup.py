@@ -0,0 +1,63 @@
+"""Startup budget check for the CLI entry points.
+
+Imports each module in a fresh interpreter (without API tokens, as a bare
+checkout would) and fails if it takes longer than its budget or pulls in
+a dependency that should only load on first use.
+
+    python check_startup.py
+"""
+import os
+import sys
+import json
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+ML_MODULES = ("torch", "sentence_transformers", "transformers")
+CLIENT_MODULES = ("huggingface_hub",)
+
+# module -> (budget in seconds, modules it must not import)
+BUDGETS = {
+    "trend_analysis": (0.1, ML_MODULES + CLIENT_MODULES + ("numpy", "scipy", "requests")),
+    "post_store": (0.1, ML_MODULES + CLIENT_MODULES + ("numpy",)),
+    "tag_counts": (0.1, ML_MODULES + CLIENT_MODULES + ("scipy",)),
+    "keyword_extractor": (0.5, ML_MODULES + CLIENT_MODULES),
+    "apify_scraper": (0.5, ML_MODULES + CLIENT_MODULES),
+    "main": (1.0, ML_MODULES + CLIENT_MODULES),
+}
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+def measure(module, forbidden, runs=3):
+    env = {k: v for k, v in os.environ.items() if k not in ("APIFY_API_TOKEN", "HF_TOKEN")}
+    best = None
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, forbidden=forbidden)],
+            cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["elapsed"] < best["elapsed"]:
+            best = result
+    return best
+
+if __name__ == "__main__":
+    failures = 0
+    for module, (budget, forbidden) in BUDGETS.items():
+        try:
+            result = measure(module, forbidden)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ {module}: import failed\n{e.stderr.strip()}")
+            failures += 1
+            continue
+        ok = result["elapsed"] <= budget and not result["loaded"]
+        failures += not ok
+        extra = f"  loaded {', '.join(result['loaded'])}" if result["loaded"] else ""
+        print(f"{'✅' if ok else '❌'} {module}: {result['elapsed'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms){extra}")
+    sys.exit(1 if failures else 0)
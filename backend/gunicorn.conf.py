@@ -0,0 +1,38 @@
+import os
+import multiprocessing
+
+# ─── Server ────────────────────────────────────────────────────────────
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))   # /analyze mostly waits on Apify and the LLM
+timeout = int(os.getenv("WEB_TIMEOUT", "300"))  # covers a cold scrape
+preload_app = True
+
+# Workers write their metrics here so /metrics can report all of them;
+# set before the app is imported, since config is read at import
+os.environ.setdefault("METRICS_DIR", "data/metrics")
+
+# ─── Server start-up ───────────────────────────────────────────────────
+def on_starting(server):
+    import shutil
+
+    # Counters restart from zero with the server, like any Prometheus target
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+def child_exit(server, worker):
+    from src.metrics import fold_process_metrics
+
+    # One file for every exited worker's counts instead of one per restart
+    try:
+        fold_process_metrics(worker.pid)
+    except (OSError, ValueError) as e:
+        print("❌ Folding worker metrics failed:", e)
+
+# ─── Per-worker start-up ───────────────────────────────────────────────
+def post_fork(server, worker):
+    from src.app import init_worker
+
+    # Split the cores between workers instead of every torch pool using all of them
+    init_worker(embedding_threads=max(1, multiprocessing.cpu_count() // server.cfg.workers),
+                workers=server.cfg.workers)
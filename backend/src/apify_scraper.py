@@ -1,54 +1,304 @@
 import os
+import re
 import json
+import time
+import random
+import threading
+import contextvars
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    from .post_store import get_post_store
+    from .ingest import iter_posts_from_response, JsonArrayWriter
+    from .metrics import SCRAPE_LOOKUPS, APIFY_REQUEST_SECONDS
+except ImportError:
+    from post_store import get_post_store
+    from ingest import iter_posts_from_response, JsonArrayWriter
+    from metrics import SCRAPE_LOOKUPS, APIFY_REQUEST_SECONDS
+
 # ─── 1) Load env & config ───────────────────────────────────────────────────────
 load_dotenv()
-API_TOKEN = os.getenv("APIFY_API_TOKEN")
-if not API_TOKEN:
-    raise RuntimeError("APIFY_API_TOKEN not set in .env")
+CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'apify_config.json'))
+BASE_URL = os.getenv("APIFY_BASE_URL", "https://api.apify.com/v2")   # point at a fake server for offline runs
 
-import os
+# Token and actor config are read on first use so importing this module
+# (e.g. for sanitize_hashtag) needs neither.
+_config = None
 
-config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'apify_config.json'))
-with open(config_path, 'r', encoding='utf-8') as f:
-    config = json.load(f)
+def load_config():
+    global _config
+    if _config is None:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            _config = json.load(f)
+    return _config
 
-ACTOR_ID = config['actorId']        # "apify~instagram-hashtag-scraper"
-BASE_URL = "https://api.apify.com/v2"
-SYNC_URL = f"{BASE_URL}/acts/{ACTOR_ID}/run-sync-get-dataset-items?token={API_TOKEN}"
+def api_token():
+    token = os.getenv("APIFY_API_TOKEN")
+    if not token:
+        raise RuntimeError("APIFY_API_TOKEN not set in .env")
+    return token
 
-# ─── 2) Single-shot sync run + fetch ───────────────────────────────────────────
-def run_and_fetch_sync(hashtag):
-    payload = {
-        "hashtags":     [hashtag],
-        "resultsType":  config.get("resultsType", "posts"),
-        "resultsLimit": config.get("resultsLimit", 100),
-    }
-    # if config.get("proxy"):
-    #     payload["proxy"] = config["proxy"]
-
-    print(f"🚀 Running actor synchronously for #{hashtag}...")
-    resp = requests.post(SYNC_URL, json=payload)
-
-    # Accept both 200 and 201 as “success”
-    if resp.status_code not in (200, 201):
-        print("❌ Error in sync run:", resp.status_code, resp.text)
-        return
-
-    # The full dataset items are in the response body
-    items = resp.json()
-    print(f"📊 Retrieved {len(items)} items")
-
-    # Save them
+def actor_sync_url():
+    actor_id = load_config()['actorId']        # "apify~instagram-hashtag-scraper"
+    return f"{BASE_URL}/acts/{actor_id}/run-sync-get-dataset-items"
+
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "5"))
+SCRAPE_CONNECT_TIMEOUT = float(os.getenv("SCRAPE_CONNECT_TIMEOUT", "10"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "150"))     # read timeout per attempt
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "3"))
+SCRAPE_BACKOFF = float(os.getenv("SCRAPE_BACKOFF", "1.0"))     # first retry delay, doubles each time
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Serve stale posts immediately and re-scrape in the background instead of
+# blocking the request; only hashtags with no posts at all block.
+STALE_WHILE_REVALIDATE = os.getenv("STALE_WHILE_REVALIDATE", "1") == "1"
+# After a background refresh fails, keep serving the stale posts without
+# starting another Apify run for this many seconds.
+REFRESH_RETRY_AFTER = float(os.getenv("REFRESH_RETRY_AFTER", "300"))
+
+# ─── 2) Shared scraping client ─────────────────────────────────────────────────
+class ScrapeClient:
+    """Pooled, retrying client for the actor's sync endpoint.
+
+    Calls run on a shared executor; simultaneous requests for the same
+    hashtag share one in-flight upstream call.
+    """
+
+    def __init__(self, sync_url=None, token=None, concurrency=SCRAPE_CONCURRENCY,
+                 timeout=(SCRAPE_CONNECT_TIMEOUT, SCRAPE_TIMEOUT), retries=SCRAPE_RETRIES, backoff=SCRAPE_BACKOFF):
+        self.sync_url = sync_url or actor_sync_url()
+        self.token = token or api_token()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="apify")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, hashtag) -> Future:
+        with self._lock:
+            future = self._inflight.get(hashtag)
+            if future is None:
+                # Run in the caller's context so the scrape joins its request trace
+                future = self._inflight[hashtag] = self.executor.submit(
+                    contextvars.copy_context().run, self._run, hashtag)
+                future.add_done_callback(lambda _, tag=hashtag: self._forget(tag))
+            return future
+
+    def fetch(self, hashtag) -> int:
+        """Scrape ``hashtag`` into the post store; returns the number of posts retrieved."""
+        return self.submit(hashtag).result()
+
+    def _forget(self, hashtag):
+        with self._lock:
+            self._inflight.pop(hashtag, None)
+
+    def _run(self, hashtag):
+        config = load_config()
+        payload = {
+            "hashtags":     [hashtag],
+            "resultsType":  config.get("resultsType", "posts"),
+            "resultsLimit": config.get("resultsLimit", 100),
+        }
+        # if config.get("proxy"):
+        #     payload["proxy"] = config["proxy"]
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * 2 ** (attempt - 1)
+                delay = random.uniform(delay / 2, delay)
+                print(f"🔁 Retrying #{hashtag} in {delay:.1f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+
+            print(f"🚀 Running actor synchronously for #{hashtag}...")
+            timer = APIFY_REQUEST_SECONDS.time(status="error")
+            try:
+                # Stream the dataset items straight into the post store
+                with timer, self.session.post(self.sync_url, params={"token": self.token}, json=payload,
+                                              timeout=self.timeout, stream=True) as resp:
+                    status = resp.status_code
+                    timer.labels = {"status": str(status)}
+                    # Accept both 200 and 201 as “success”
+                    if status in (200, 201):
+                        count = _ingest_response(hashtag, resp)
+                        print(f"📊 Retrieved {count} items")
+                        return count
+                    print("❌ Error in sync run:", status, resp.text[:500])
+            except (requests.RequestException, ValueError) as e:
+                print(f"❌ Sync run for #{hashtag} failed: {e}")
+                continue
+
+            if status not in RETRY_STATUSES:
+                return 0
+        return 0
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_scrape_client() -> ScrapeClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ScrapeClient()
+    return _client
+
+# ─── 3) Single-shot sync run + fetch ──────────────────────────────────────────
+def _ingest_response(hashtag, resp):
+    """Parse items one by one from the response, keep only the fields
+    analysis needs, and feed them to the store while also writing them to
+    data/scraped_data.json. Returns the number of items."""
     os.makedirs("data", exist_ok=True)
-    with open("data/scraped_data.json", "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    print("✅ Saved to data/scraped_data.json")
-    return items
+    tmp_path = f"data/scraped_data.json.{os.getpid()}.{threading.get_ident()}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            writer = JsonArrayWriter(f)
+
+            def tee():
+                nonlocal count
+                for post in iter_posts_from_response(resp):
+                    writer.write(post)
+                    count += 1
+                    yield post
+
+            get_post_store().ingest(hashtag, tee())
+            writer.close()
+        os.replace(tmp_path, "data/scraped_data.json")
+        print("✅ Saved to data/scraped_data.json")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _rebuild_snapshot(hashtag)
+    return count
+
+def _rebuild_snapshot(hashtag):
+    # Build the snapshot (and its top-posts index) here on the scrape
+    # thread rather than on the first /hashtag read
+    try:
+        from .snapshot import get_snapshot_store
+    except ImportError:
+        try:
+            from snapshot import get_snapshot_store
+        except ImportError:  # numpy not installed
+            return
+    try:
+        get_snapshot_store().get(hashtag)
+    except Exception as e:
+        print(f"❌ Snapshot rebuild for #{hashtag} failed:", e)
+
+def run_and_fetch_sync(hashtag):
+    if not get_scrape_client().fetch(hashtag):
+        return None
+    return get_post_store().posts_for_hashtag(hashtag)
+
+# ─── 4) Cached fetch via the post store ────────────────────────────────────────
+def sanitize_hashtag(tag: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '', tag)
+
+def _import_legacy_cache(store, hashtag):
+    # Carry over per-hashtag JSON files written before the post store existed
+    path = f"data/{hashtag}.json"
+    if os.path.exists(path):
+        store.import_json_file(hashtag, path)
+
+def _start_refresh(store, hashtag):
+    """Kick off a scrape if ``hashtag`` is stale; returns its future or None."""
+    if store.fetched_at(hashtag) is None:
+        _import_legacy_cache(store, hashtag)
+    if store.is_fresh(hashtag):
+        print(f"🗂️ Loaded cached #{hashtag}")
+        SCRAPE_LOOKUPS.inc(result="fresh")
+        return None
+    if STALE_WHILE_REVALIDATE and store.post_count(hashtag) > 0:
+        SCRAPE_LOOKUPS.inc(result="stale")
+        if refresh_in_background(hashtag) is None:
+            print(f"♻️ Serving stale #{hashtag} (last refresh failed, backing off)")
+        else:
+            print(f"♻️ Serving stale #{hashtag}, refreshing in background")
+        return None
+    SCRAPE_LOOKUPS.inc(result="miss")
+    return get_scrape_client().submit(hashtag)
+
+def refresh_hashtag(hashtag):
+    """Scrape ``hashtag`` now regardless of freshness; returns True on success."""
+    return get_scrape_client().fetch(hashtag) > 0
+
+_retry_after = {}   # hashtag -> monotonic time before which background refreshes are skipped
+_retry_after_lock = threading.Lock()
+
+def refresh_in_background(hashtag):
+    """Start a scrape without waiting for it; returns its future, or None
+    while a recent failure for ``hashtag`` is backing off."""
+    with _retry_after_lock:
+        retry_at = _retry_after.get(hashtag)
+        if retry_at is not None and time.monotonic() < retry_at:
+            return None
+    future = get_scrape_client().submit(hashtag)
+
+    def on_done(f):
+        failed = f.exception() is not None or not f.result()
+        with _retry_after_lock:
+            if failed:
+                now = time.monotonic()
+                for tag in [tag for tag, retry_at in _retry_after.items() if retry_at <= now]:
+                    del _retry_after[tag]
+                _retry_after[hashtag] = now + REFRESH_RETRY_AFTER
+            else:
+                _retry_after.pop(hashtag, None)
+        if f.exception() is not None:
+            print(f"❌ Background refresh of #{hashtag} failed:", f.exception())
+        elif failed:
+            print(f"❌ Background refresh of #{hashtag} returned no posts, retrying in {REFRESH_RETRY_AFTER:.0f}s")
+
+    future.add_done_callback(on_done)
+    return future
+
+def ensure_keywords_fresh_parallel(keywords, timeout=None):
+    """Scrape every stale keyword hashtag concurrently on the shared client.
+
+    Returns the hashtags the store holds posts for (possibly stale ones
+    when a scrape failed). Raises TimeoutError if the scrapes take longer
+    than ``timeout`` seconds; they carry on in the client's own pool and
+    land in the store for later requests.
+    """
+    store = get_post_store()
+    hashtags = [tag for tag in dict.fromkeys(sanitize_hashtag(kw) for kw in keywords) if tag]
+    # Popularity feeds the background refresh scheduler
+    store.record_requests(hashtags)
+    pending = [future for future in (_start_refresh(store, tag) for tag in hashtags) if future is not None]
+    done, not_done = wait(pending, timeout=timeout)
+    if not_done:
+        raise TimeoutError(f"{len(not_done)} of {len(pending)} scrapes still running")
+    for future in done:
+        future.result()
+    return [tag for tag in hashtags if store.post_count(tag) > 0]
+
+def ensure_fresh(hashtag):
+    return bool(ensure_keywords_fresh_parallel([hashtag]))
+
+def run_and_fetch_cached(hashtag):
+    if not ensure_fresh(hashtag):
+        return []
+    return get_post_store().posts_for_hashtag(hashtag)
+
+def fetch_all_keywords_parallel(keywords):
+    store = get_post_store()
+    available = set(ensure_keywords_fresh_parallel(keywords))
+    all_posts = []
+    for kw in keywords:
+        tag = sanitize_hashtag(kw)
+        if tag in available:
+            all_posts.extend(store.iter_posts([tag]))
+    return all_posts
 
-# ─── 3) CLI Entrypoint ─────────────────────────────────────────────────────────
+# ─── 5) CLI Entrypoint ─────────────────────────────────────────────────────────
 if __name__ == "__main__":
     tag = input("Enter a hashtag to scrape (without #): ").strip()
     if tag:
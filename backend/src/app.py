@@ -1,252 +1,437 @@
 import os
 import sys
-import re
 import time
 import json
 import traceback
-import requests
-from flask import Flask, request, jsonify, send_file
+import contextvars
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from io import BytesIO
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from huggingface_hub import InferenceClient
-from sentence_transformers import SentenceTransformer, util
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 # ─── Load Local Modules ───────────────────────────────────────────────
-from src.apify_scraper import run_and_fetch_sync
-from src.trend_analysis import compute_tf_idf_trends
+from src.apify_scraper import ensure_fresh, ensure_keywords_fresh_parallel, sanitize_hashtag
+from src.keyword_extractor import extract_keywords_llama, keyword_cache
+from src.trend_analysis import score_tag_counts, _sparse_backend
+from src.tag_counts import tag_counts_cache
+from src.trend_windows import get_trend_engine
+from src.refresh_scheduler import RefreshScheduler
+from src.embedding_service import get_embedding_service
+from src.llm_gateway import get_llm_gateway
+from src.suggestions import generate_suggestions, stream_suggestions, parse_suggestions
+from src.apify_scraper import get_scrape_client
+from src.relevance import filter_irrelevant_trends, embed_prompt_and_tags
+from src.embedding_cache import get_embedding_cache
+from src.snapshot import get_snapshot_store
+from src.top_posts import SORT_MODES
+from src.heavy_hitters import get_trending_tracker, TRENDING_TOP_K
+from src.cooccurrence import get_cooccurrence_index, prerank_candidates, COOC_CANDIDATE_POOL, COOC_TOP_K, RANKINGS
+from src.batch_analysis import analyze_batch, BATCH_MAX_PROMPTS
+from src.metrics import render_all, start_metrics_flusher, STAGE_SECONDS, start_trace, end_trace, current_trace
+from src.image_proxy import (get_image_proxy, image_etag, variant_id, snap_width,
+                             IMAGE_CACHE_MAX_AGE, IMAGE_FALLBACK_MAX_AGE, IMAGE_FORMATS, RESIZE_AVAILABLE)
 
-# ─── Load Hugging Face Token ───────────────────────────────────────────
 load_dotenv()
-HF_TOKEN = os.getenv("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("❌ HF_TOKEN missing in .env")
 
-client = InferenceClient(
-    model="meta-llama/Meta-Llama-3-8B-Instruct",
-    token=HF_TOKEN
+# ─── App Setup ─────────────────────────────────────────────────────────
+api = Blueprint("api", __name__)
+
+# Keep popular hashtags pre-scraped; set REFRESH_SCHEDULER=0 when running
+# refresh_scheduler.py as its own process instead.
+REFRESH_SCHEDULER = os.getenv("REFRESH_SCHEDULER", "1") == "1"
+refresh_scheduler = RefreshScheduler()
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, origins="*", methods=["GET", "POST"], allow_headers="*")
+    app.register_blueprint(api)
+    return app
+
+def init_worker(embedding_threads=None, workers=1):
+    """Per-process start-up, run once in each of ``workers`` server workers
+    after fork: HTTP clients, in-memory post views, background embedding
+    warm-up and the refresh scheduler."""
+    get_llm_gateway()
+    get_scrape_client()
+    get_image_proxy()
+    start_metrics_flusher()
+    # Attach the global trending tracker, co-occurrence index and trend
+    # windows before any scrape lands, so the first /analyze doesn't bootstrap them
+    get_trending_tracker()
+    get_cooccurrence_index(workers)
+    get_trend_engine()
+    # Import the vectorized TF-IDF scorer (SciPy) now rather than on the first /analyze
+    _sparse_backend()
+    service = get_embedding_service()
+    if embedding_threads and not service.num_threads:
+        service.num_threads = embedding_threads
+    # Load the embedding model in the background so the first /analyze doesn't pay for it
+    service.warm_up_async()
+    if REFRESH_SCHEDULER:
+        refresh_scheduler.start()
+
+# ─── Analysis Pipeline ────────────────────────────────────────────────
+# Per-stage deadlines in seconds. A stage that misses its deadline fails the
+# request with 504, except suggestions, which fall back to the draft. The
+# keywords stage is bounded by the LLM gateway's LLM_KEYWORDS_DEADLINE.
+STAGE_TIMEOUTS = {
+    "scraping": float(os.getenv("SCRAPING_TIMEOUT", "180")),
+    "trends": float(os.getenv("TRENDS_TIMEOUT", "30")),
+    "suggestions": float(os.getenv("SUGGESTIONS_TIMEOUT", "30")),
+}
+# Start a keyword-only suggestion call while scraping runs, used if the
+# trend-aware call misses its deadline. Off by default: it spends a second
+# LLM call (and gateway slot) per request that is rarely used.
+SUGGESTION_DRAFT = os.getenv("SUGGESTION_DRAFT", "0") == "1"
+
+pipeline_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PIPELINE_WORKERS", "16")),
+    thread_name_prefix="analyze",
 )
 
-# ─── App Setup ─────────────────────────────────────────────────────────
-app = Flask(__name__)
-CORS(app, origins="*", methods=["GET", "POST"], allow_headers="*")
-
-# ─── Keyword Extraction ───────────────────────────────────────────────
-class KeywordResult(BaseModel):
-    keywords: list[str]
-
-def extract_keywords_llama(prompt: str, max_keywords: int = 3) -> KeywordResult:
-    system_msg = {
-        "role": "system",
-        "content": (
-            f"You are an assistant. Extract {max_keywords} relevant keywords from a product description. "
-            f"Respond only with a comma-separated list."
-        )
-    }
-    user_msg = {
-        "role": "user",
-        "content": f"Description: \"{prompt}\"\nKeywords:"
-    }
+class StageError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+def _submit(fn, *args):
+    # Copy the caller's context so stage work joins the request trace
+    return pipeline_executor.submit(contextvars.copy_context().run, fn, *args)
 
+def _stage_result(stage, future):
     try:
-        resp = client.chat.completions.create(
-            model=client.model,
-            messages=[system_msg, user_msg],
-            max_tokens=40,
-            temperature=0.7
-        )
-        text = resp.choices[0].message.content.strip()
-        if not text:
-            print("⚠️ Empty response")
-            return KeywordResult(keywords=[])
-        print("🧪 Raw response:", repr(text))
-        return KeywordResult(keywords=[k.strip().lower() for k in text.split(",") if k.strip()])
-    except Exception as e:
-        print("❌ LLaMA 3 API error:", e)
-        traceback.print_exc()
-        return KeywordResult(keywords=[])
-    
-# ─── Suggestion Generator Using Mixtral ────────────────────────────────
-def generate_suggestions(prompt: str, keywords: list[str], trends: list[str], max_suggestions: int = 3) -> list[str]:
-    trend_summary = ", ".join(f"#{t}" for t in trends)
-    user_prompt = (
-        f"My content is about: {prompt}. "
-        f"The extracted keywords are: {', '.join(keywords)}. "
-        f"The trending hashtags are: {trend_summary}. "
-        f"Give {max_suggestions} short and clear strategic tips for making content that performs well in this niche. "
-        f"Respond as a numbered list without explanations."
-    )
+        return future.result(timeout=STAGE_TIMEOUTS[stage])
+    except FutureTimeout:
+        raise StageError(f"{stage.capitalize()} timed out", 504)
 
+def iter_analysis(prompt, stream=False):
+    """Run the pipeline, yielding (event, data) as each stage completes.
+
+    With ``stream=True`` suggestions are also yielded token by token as
+    ``suggestion_token`` events before the final ``suggestions`` event.
+    """
+    timings = {}
+    t_start = time.perf_counter()
+
+    with STAGE_SECONDS.time(stage="keywords") as timer:
+        # Inline: nothing else can start before the keywords, and the gateway bounds the call
+        keywords = extract_keywords_llama(prompt).keywords
+    timings["keywords"] = round(timer.elapsed, 3)
+    if not keywords:
+        raise StageError("No keywords extracted", 500)
+    yield "keywords", {"keywords": keywords}
+
+    # Independent work that only needs the keywords runs alongside scraping:
+    # embedding the prompt and drafting suggestions.
+    with STAGE_SECONDS.time(stage="scraping") as timer:
+        # Only trend tags are looked up later, so the keywords aren't embedded
+        embed_future = _submit(embed_prompt_and_tags, prompt, [])
+        draft_future = _submit(generate_suggestions, prompt, keywords, []) if SUGGESTION_DRAFT else None
+        # Scrapes run on the scrape client's own pool, so a stalled Apify
+        # never ties up pipeline threads; this request just stops waiting
+        try:
+            hashtags = ensure_keywords_fresh_parallel(keywords, timeout=STAGE_TIMEOUTS["scraping"])
+        except FutureTimeout:
+            raise StageError("Scraping timed out", 504)
+    timings["scraping"] = round(timer.elapsed, 3)
+    if not hashtags:
+        raise StageError("No posts found", 404)
+
+    with STAGE_SECONDS.time(stage="trends") as timer:
+        try:
+            prompt_vector, _ = _stage_result("trends", embed_future)
+        except Exception as e:
+            print("⚠️ Prompt embedding failed, retrying inline:", e)
+            prompt_vector = None
+        counts = tag_counts_cache.merged(hashtags)
+        raw_trends = score_tag_counts(counts.tag_frequency, counts.doc_frequency, counts.total_posts,
+                                      top_n=COOC_CANDIDATE_POOL)
+        # Tags that co-occur strongly with a searched hashtag go first and skip embedding
+        raw_trends, related = prerank_candidates(raw_trends, hashtags, keep=15)
+        trends = filter_irrelevant_trends(prompt, raw_trends, keywords=keywords, similarity_threshold=0.2,
+                                          prompt_vector=prompt_vector, related=related)
+        final_trends = get_trend_engine().annotate(dict(list(trends.items())[:5]))
+    timings["trends"] = round(timer.elapsed, 3)
+    yield "trends", {"trends": final_trends}
+
+    with STAGE_SECONDS.time(stage="suggestions") as timer:
+        suggestions = []
+        if stream:
+            text = ""
+            try:
+                for token in stream_suggestions(prompt, keywords, list(final_trends.keys())):
+                    text += token
+                    yield "suggestion_token", {"token": token}
+                    if time.perf_counter() - timer.start > STAGE_TIMEOUTS["suggestions"]:
+                        print("⚠️ Suggestions timed out mid-stream")
+                        break
+            except Exception as e:
+                print("❌ Suggestion stream error:", e)
+            suggestions = parse_suggestions(text)
+        else:
+            suggestions_future = _submit(generate_suggestions, prompt, keywords, list(final_trends.keys()))
+            try:
+                suggestions = _stage_result("suggestions", suggestions_future)
+            except StageError as e:
+                print(f"⚠️ {e}")
+        if draft_future is not None:
+            if suggestions:
+                draft_future.cancel()   # frees the gateway slot if the draft hasn't started yet
+            else:
+                try:
+                    suggestions = _stage_result("suggestions", draft_future)
+                except StageError:
+                    suggestions = []
+    timings["suggestions"] = round(timer.elapsed, 3)
+    total = time.perf_counter() - t_start
+    STAGE_SECONDS.observe(total, stage="total")
+    timings["total"] = round(total, 3)
+    yield "suggestions", {"suggestions": suggestions}
+
+    done = {"timings": timings}
+    trace = current_trace()
+    if trace is not None:
+        done["trace"] = trace.to_dict()
+    yield "done", done
+
+def run_analysis(prompt):
+    result = {}
+    for _, data in iter_analysis(prompt):
+        result.update(data)
+    return result
+
+def _trace_id():
+    """Trace ID for this request if the client asked for a trace, via an
+    ``X-Trace-Id`` header or ``"trace": true`` in the body; else None."""
+    trace_id = request.headers.get("X-Trace-Id")
+    if trace_id:
+        return trace_id[:64]
+    if (request.get_json(silent=True) or {}).get("trace"):
+        return ""   # generate one
+    return None
+
+def _run_traced(fn, *args):
+    """Call ``fn`` inside a trace if the client asked for one; returns
+    (result, trace or None)."""
+    trace_id = _trace_id()
+    if trace_id is None:
+        return fn(*args), None
+    trace, token = start_trace(trace_id or None)
     try:
-        response = client.chat.completions.create(
-            model=client.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a creative strategist who gives concise, actionable suggestions to optimize content "
-                        "for social media performance."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            max_tokens=120,
-            temperature=0.7
-        )
-
-        text = response.choices[0].message.content.strip()
-        return [line.lstrip("1234567890. ").strip("•- ") for line in text.split("\n") if line]
-    except Exception as e:
-        print("❌ Suggestion generation error:", e)
-        traceback.print_exc()
-        return []
-
-# ─── Helpers ──────────────────────────────────────────────────────────
-def sanitize_hashtag(tag: str) -> str:
-    return re.sub(r'[^a-zA-Z0-9_]', '', tag)
-
-def run_and_fetch_cached(hashtag):
-    path = f"data/{hashtag}.json"
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-
-    posts = run_and_fetch_sync(hashtag)
-    if posts:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(posts, f, ensure_ascii=False, indent=2)
-    return posts or []
-
-def fetch_all_keywords_parallel(keywords):
-    all_posts = []
-    with ThreadPoolExecutor(max_workers=min(5, len(keywords))) as executor:
-        futures = [executor.submit(run_and_fetch_cached, sanitize_hashtag(kw)) for kw in keywords]
-        for f in futures:
-            posts = f.result()
-            if posts:
-                all_posts.extend(posts)
-    return all_posts
-
-def filter_irrelevant_trends(prompt, trends_dict, keywords, similarity_threshold=0.15, debug=True):
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    prompt_embedding = model.encode(prompt, convert_to_tensor=True)
-    filtered = {}
-    keywords = [kw.lower() for kw in keywords]
-    for tag, stats in trends_dict.items():
-        tag_text = tag.lower()
-        if any(kw in tag_text for kw in keywords):
-            if debug:
-                print(f"✅ Keeping #{tag} (matched keyword)")
-            filtered[tag] = stats
-            continue
-        tag_embedding = model.encode(tag_text, convert_to_tensor=True)
-        similarity = float(util.cos_sim(prompt_embedding, tag_embedding))
-        if debug:
-            print(f"🔍 #{tag.ljust(20)} → similarity: {similarity:.2f}")
-        if similarity >= similarity_threshold:
-            filtered[tag] = stats
-    return filtered
+        return fn(*args), trace
+    finally:
+        end_trace(token)
 
 # ─── API Routes ───────────────────────────────────────────────────────
-@app.route("/analyze", methods=["POST"])
+@api.route("/analyze", methods=["POST"])
 def analyze():
     try:
         prompt = request.json.get("prompt", "")
         if not prompt:
             return jsonify({"error": "Missing prompt"}), 400
 
-        t0 = time.time()
-        keyword_result = extract_keywords_llama(prompt)
-        keywords = keyword_result.keywords
-        print(f"⏱️ Keyword extraction took {time.time() - t0:.2f}s")
-
-        if not keywords:
-            return jsonify({"error": "No keywords extracted"}), 500
+        result, trace = _run_traced(run_analysis, prompt)
+        response = jsonify(result)
+        if trace is not None:
+            response.headers["X-Trace-Id"] = trace.id
+        return response
 
-        t1 = time.time()
-        all_posts = fetch_all_keywords_parallel(keywords)
-        print(f"⏱️ Scraping took {time.time() - t1:.2f}s")
+    except StageError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print("❌ Error in /analyze:", e)
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
 
-        if not all_posts:
-            return jsonify({"error": "No posts found"}), 404
+@api.route("/analyze/stream", methods=["POST"])
+def analyze_stream():
+    prompt = (request.json or {}).get("prompt", "")
+    if not prompt:
+        return jsonify({"error": "Missing prompt"}), 400
+    trace_id = _trace_id()
 
-        t2 = time.time()
-        raw_trends = compute_tf_idf_trends(all_posts, top_n=15)
-        trends = filter_irrelevant_trends(prompt, raw_trends, keywords=keywords, similarity_threshold=0.2)
-        final_trends = dict(list(trends.items())[:5])
-        print(f"⏱️ Trend analysis took {time.time() - t2:.2f}s")
+    # One JSON object per line: keywords, trends, suggestion_token*, suggestions, done
+    def generate():
+        token = start_trace(trace_id or None)[1] if trace_id is not None else None
+        try:
+            for event, data in iter_analysis(prompt, stream=True):
+                yield json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+        except StageError as e:
+            yield json.dumps({"event": "error", "error": str(e), "status": e.status}) + "\n"
+        except Exception as e:
+            print("❌ Error in /analyze/stream:", e)
+            traceback.print_exc()
+            yield json.dumps({"event": "error", "error": "Internal server error", "status": 500}) + "\n"
+        finally:
+            if token is not None:
+                end_trace(token)
 
-        suggestions = generate_suggestions(prompt, keywords, list(final_trends.keys()))
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        return jsonify({
-            "keywords": keywords,
-            "trends": final_trends,
-            "suggestions": suggestions
-        })
+@api.route("/analyze/batch", methods=["POST"])
+def analyze_batch_route():
+    body = request.get_json(silent=True) or {}
+    prompts = body.get("prompts")
+    if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) and p.strip() for p in prompts):
+        return jsonify({"error": "prompts must be a non-empty list of strings"}), 400
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        return jsonify({"error": f"At most {BATCH_MAX_PROMPTS} prompts per batch"}), 400
 
+    try:
+        (results, info), trace = _run_traced(analyze_batch, prompts, 5, bool(body.get("suggestions", True)))
+        payload = {"results": results, **info}
+        if trace is not None:
+            payload["trace"] = trace.to_dict()
+        response = jsonify(payload)
+        if trace is not None:
+            response.headers["X-Trace-Id"] = trace.id
+        return response
     except Exception as e:
-        print("❌ Error in /analyze:", e)
+        print("❌ Error in /analyze/batch:", e)
         traceback.print_exc()
         return jsonify({"error": "Internal server error"}), 500
 
-@app.route("/proxy-image")
+@api.route("/proxy-image")
 def proxy_image():
     url = request.args.get("url")
-    print(f"🔍 Proxying image: {url}")
+    if not url or not url.startswith(("http://", "https://")):
+        return '', 404
+    width, fmt = request.args.get("w"), request.args.get("format")
+    if fmt is not None and fmt not in IMAGE_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(IMAGE_FORMATS)}"}), 400
     try:
-        resp = requests.get(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0",
-                "Referer": "https://www.instagram.com/",
-            },
-            timeout=5
-        )
-        if resp.status_code == 200 and "image" in resp.headers.get("Content-Type", ""):
-            return send_file(BytesIO(resp.content), mimetype=resp.headers["Content-Type"])
-    except Exception as e:
-        print("❌ Image proxy failed:", e)
-    return '', 404
+        width = snap_width(int(width)) if width else None
+    except ValueError:
+        return jsonify({"error": "w must be an integer"}), 400
+    # Without Pillow, variants fall back to the original image
+    variant = RESIZE_AVAILABLE and (width is not None or fmt is not None)
+    if variant:
+        fmt = fmt or "webp"
+
+    etag = image_etag(variant_id(url, width, fmt) if variant else url)
+    final = True
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        proxy = get_image_proxy()
+        if variant:
+            opened = proxy.open_variant(url, width, fmt)
+            if opened is not None:
+                content_type, chunks, final = opened
+        else:
+            opened = proxy.open(url)
+            if opened is not None:
+                content_type, chunks = opened
+        if opened is None:
+            return '', 404
+        response = Response(chunks, mimetype=content_type, direct_passthrough=True)
+    response.cache_control.public = True
+    if final:
+        response.set_etag(etag)
+        response.cache_control.max_age = IMAGE_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Resize failed and this is the original: keep it briefly under the
+        # original's ETag so the variant is retried, not pinned
+        response.set_etag(image_etag(url))
+        response.cache_control.max_age = IMAGE_FALLBACK_MAX_AGE
+    return response
 
-@app.route("/hashtag/<tag>", methods=["GET"])
+@api.route("/hashtag/<tag>", methods=["GET"])
 def get_hashtag_posts(tag):
+    sort = request.args.get("sort", "engagement")
+    if sort not in SORT_MODES:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_MODES)}"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 6)), 1), 50)
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+
     try:
         clean_tag = sanitize_hashtag(tag)
-        posts = run_and_fetch_cached(clean_tag)
-
-        if not posts:
-            return jsonify({"posts": []})
-
-        sorted_posts = sorted(
-            posts,
-            key=lambda p: (p.get("likes", 0) + p.get("comments", 0)),
-            reverse=True
-        )
-
-        formatted = [{
-            "username": post.get("ownerUsername") or post.get("author") or "unknown",
-            "avatarUrl": post.get("profilePicUrl") or "",
-            "caption": post.get("description") or post.get("text") or "",
-            "imageUrl": post.get("displayUrl") or "",
-            "likes": post.get("likes") or 0,
-            "comments": post.get("comments") or 0,
-            "timestamp": post.get("timestamp") or "",
-            "url": post.get("url") or "",
-        } for post in sorted_posts[:6]]
-
-        return jsonify({"posts": formatted})
+        if not ensure_fresh(clean_tag):
+            return jsonify({"posts": [], "total": 0})
+
+        # Orders and top payloads are precomputed when the snapshot is built
+        snapshot = get_snapshot_store().get(clean_tag)
+        return jsonify({
+            "posts": snapshot.top_posts(sort, limit=limit, offset=offset),
+            "total": len(snapshot),
+        })
 
     except Exception as e:
         print("❌ Error in /hashtag/<tag>:", e)
         traceback.print_exc()
         return jsonify({"error": "Failed to fetch posts"}), 500
 
+@api.route("/trending", methods=["GET"])
+def trending():
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), TRENDING_TOP_K)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    # Precomputed from the streaming sketches; no posts are scanned here
+    snapshot = get_trending_tracker().snapshot()
+    return jsonify({**snapshot, "top": snapshot["top"][:limit], "rising": snapshot["rising"][:limit]})
+
+@api.route("/related/<tag>", methods=["GET"])
+def related_tags(tag):
+    tag = sanitize_hashtag(tag).lower()
+    by = request.args.get("by", "lift")
+    if by not in RANKINGS:
+        return jsonify({"error": f"by must be one of: {', '.join(RANKINGS)}"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), COOC_TOP_K)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    # Served from the in-memory index; no posts are scanned here
+    return jsonify({"tag": tag, "by": by, "related": get_cooccurrence_index().related(tag, limit=limit, by=by)})
+
+@api.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@api.route("/readyz", methods=["GET"])
+def readyz():
+    # Ready once this worker's embedding model has loaded and run a first pass
+    service = get_embedding_service()
+    status = {
+        "ready": service.ready,
+        "embeddings": "ready" if service.ready else ("failed" if service.error else "warming"),
+        "refresh_scheduler": refresh_scheduler.running,
+        "pid": os.getpid(),
+    }
+    return jsonify(status), 200 if service.ready else 503
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text format, summed over every worker when METRICS_DIR is set
+    return Response(render_all(), mimetype="text/plain; version=0.0.4")
+
+@api.route("/llm/stats", methods=["GET"])
+def llm_stats():
+    return jsonify(get_llm_gateway().stats())
+
+@api.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "embeddings": get_embedding_cache(get_embedding_service().model_name).stats(),
+        "keywords": keyword_cache.stats(),
+        "tag_counts": tag_counts_cache.stats(),
+        "snapshots": get_snapshot_store().stats(),
+        "images": get_image_proxy().stats(),
+        "cooccurrence": get_cooccurrence_index().stats(),
+    })
+
 # ─── Entrypoint ────────────────────────────────────────────────────────
+# Development server; use gunicorn with gunicorn.conf.py in production.
 if __name__ == "__main__":
+    app = create_app()
+    init_worker()
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG", "1") == "1", use_reloader=False)
@@ -0,0 +1,123 @@
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .apify_scraper import ensure_keywords_fresh_parallel, sanitize_hashtag
+    from .keyword_extractor import extract_keywords_llama, normalize_prompt
+    from .trend_analysis import score_tag_counts
+    from .tag_counts import tag_counts_cache, TagCounts
+    from .trend_windows import get_trend_engine
+    from .relevance import filter_irrelevant_trends, embed_prompts_and_tags
+    from .suggestions import generate_suggestions
+    from .metrics import STAGE_SECONDS
+    from .cooccurrence import prerank_candidates, COOC_CANDIDATE_POOL
+except ImportError:
+    from apify_scraper import ensure_keywords_fresh_parallel, sanitize_hashtag
+    from keyword_extractor import extract_keywords_llama, normalize_prompt
+    from trend_analysis import score_tag_counts
+    from tag_counts import tag_counts_cache, TagCounts
+    from trend_windows import get_trend_engine
+    from relevance import filter_irrelevant_trends, embed_prompts_and_tags
+    from suggestions import generate_suggestions
+    from metrics import STAGE_SECONDS
+    from cooccurrence import prerank_candidates, COOC_CANDIDATE_POOL
+
+# ─── Config ────────────────────────────────────────────────────────────
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "50"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))   # concurrent keyword / suggestion calls
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+def _map(fn, items):
+    # Like executor.map, but each call runs in a copy of the caller's context (request trace)
+    futures = [batch_executor.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+# ─── Batch Pipeline ────────────────────────────────────────────────────
+def analyze_batch(prompts, top_n=5, with_suggestions=True, debug=False):
+    """Analyze many prompts with the shared work done once.
+
+    Duplicate prompts are analyzed once. Keywords are deduplicated across
+    the batch so each hashtag is fetched once and counted once, and every
+    prompt and candidate tag is embedded in a single model call. Returns
+    (results, info): one result dict per prompt, in order, holding either
+    keywords/trends/suggestions or an ``error``; ``info`` has batch-level
+    timings and sharing stats.
+    """
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        raise ValueError(f"At most {BATCH_MAX_PROMPTS} prompts per batch")
+    unique = list(dict.fromkeys(normalize_prompt(p) for p in prompts))
+    originals = {}
+    for prompt in prompts:
+        originals.setdefault(normalize_prompt(prompt), prompt)
+    jobs = {key: {"prompt": originals[key]} for key in unique}
+    timings = {}
+
+    with STAGE_SECONDS.time(stage="batch_keywords") as timer:
+        keyword_results = _map(lambda key: extract_keywords_llama(jobs[key]["prompt"]), unique)
+        for key, result in zip(unique, keyword_results):
+            jobs[key]["keywords"] = result.keywords
+    timings["keywords"] = round(timer.elapsed, 3)
+
+    with STAGE_SECONDS.time(stage="batch_scraping") as timer:
+        all_keywords = list(dict.fromkeys(kw for job in jobs.values() for kw in job["keywords"]))
+        available = set(ensure_keywords_fresh_parallel(all_keywords)) if all_keywords else set()
+    timings["scraping"] = round(timer.elapsed, 3)
+
+    with STAGE_SECONDS.time(stage="batch_trends") as timer:
+        # One TagCounts per fetched hashtag, merged per prompt from the shared table
+        counts = {hashtag: tag_counts_cache.get(hashtag) for hashtag in available}
+        scored = []
+        for key, job in jobs.items():
+            if not job["keywords"]:
+                job["error"] = "No keywords extracted"
+                continue
+            hashtags = [tag for tag in dict.fromkeys(sanitize_hashtag(kw) for kw in job["keywords"]) if tag in available]
+            if not hashtags:
+                job["error"] = "No posts found"
+                continue
+            merged = TagCounts()
+            for hashtag in hashtags:
+                merged.merge(counts[hashtag])
+            raw_trends = score_tag_counts(merged.tag_frequency, merged.doc_frequency, merged.total_posts,
+                                          top_n=COOC_CANDIDATE_POOL)
+            job["raw_trends"], job["related"] = prerank_candidates(raw_trends, hashtags, keep=15)
+            scored.append(key)
+
+        # Co-occurring tags are kept without a relevance check, so only the rest are embedded
+        candidates = [tag for key in scored for tag in jobs[key]["raw_trends"] if tag not in jobs[key]["related"]]
+        prompt_matrix = None
+        if scored:
+            # Every prompt and every uncached candidate in one encode call
+            prompt_matrix, _ = embed_prompts_and_tags([jobs[key]["prompt"] for key in scored], candidates)
+        engine = get_trend_engine()
+        for row, key in enumerate(scored):
+            job = jobs[key]
+            trends = filter_irrelevant_trends(job["prompt"], job.pop("raw_trends"), keywords=job["keywords"],
+                                              similarity_threshold=0.2, debug=debug,
+                                              prompt_vector=prompt_matrix[row], related=job.pop("related"))
+            job["trends"] = engine.annotate(dict(list(trends.items())[:top_n]))
+    timings["trends"] = round(timer.elapsed, 3)
+
+    if with_suggestions:
+        with STAGE_SECONDS.time(stage="batch_suggestions") as timer:
+            suggestion_results = _map(
+                lambda key: generate_suggestions(jobs[key]["prompt"], jobs[key]["keywords"], list(jobs[key]["trends"])),
+                scored,
+            )
+            for key, suggestions in zip(scored, suggestion_results):
+                jobs[key]["suggestions"] = suggestions
+        timings["suggestions"] = round(timer.elapsed, 3)
+
+    timings["total"] = round(sum(timings.values()), 3)
+    info = {
+        "timings": timings,
+        "prompts": len(prompts),
+        "unique_prompts": len(unique),
+        "unique_keywords": len(all_keywords),
+        "hashtags_fetched": len(available),
+        "candidate_tags": len(set(candidates)),
+    }
+    results = [{**jobs[normalize_prompt(prompt)], "prompt": prompt} for prompt in prompts]
+    return results, info
@@ -0,0 +1,216 @@
+import os
+import math
+import time
+import heapq
+import threading
+from collections import Counter
+
+try:
+    from .post_store import get_post_store
+    from .trend_analysis import post_hashtags
+except ImportError:
+    from post_store import get_post_store
+    from trend_analysis import post_hashtags
+
+# ─── Config ────────────────────────────────────────────────────────────
+COOC_MAX_PAIRS = int(os.getenv("COOC_MAX_PAIRS", "2000000"))         # pair entries kept before pruning, all workers together
+COOC_MAX_TAGS = int(os.getenv("COOC_MAX_TAGS", "500000"))             # tags counted before pruning, all workers together
+COOC_MAX_TAGS_PER_POST = int(os.getenv("COOC_MAX_TAGS_PER_POST", "30"))
+COOC_HISTORY = float(os.getenv("COOC_HISTORY", str(30 * 24 * 3600)))  # seconds of post time loaded at start-up
+COOC_MIN_SUPPORT = int(os.getenv("COOC_MIN_SUPPORT", "2"))           # posts a pair needs to be reported
+COOC_MIN_LIFT = float(os.getenv("COOC_MIN_LIFT", "2.0"))             # "related" for /analyze pre-ranking
+COOC_TOP_K = int(os.getenv("COOC_TOP_K", "100"))                     # related tags ranked (and cached) per tag
+COOC_CANDIDATE_POOL = int(os.getenv("COOC_CANDIDATE_POOL", "30"))    # TF-IDF tags pre-ranked down to 15
+COOC_CACHE_TTL = float(os.getenv("COOC_CACHE_TTL", "60"))            # seconds a related-tags answer is reused
+COOC_CACHE_SIZE = int(os.getenv("COOC_CACHE_SIZE", "10000"))         # cached answers, oldest evicted first
+RANKINGS = ("lift", "count", "confidence")
+
+# ─── Co-occurrence Index ───────────────────────────────────────────────
+class CooccurrenceIndex:
+    """Sparse counts of hashtags appearing in the same post.
+
+    ``pairs[a][b]`` is the number of posts tagged with both ``a`` and
+    ``b`` (stored in both directions so a lookup is one dict access).
+    When the number of pair entries passes ``max_pairs`` (or of tags
+    passes ``max_tags``) the lowest-support pairs and tags are dropped
+    until both are back under three quarters of their limits.
+    """
+
+    def __init__(self, max_pairs=COOC_MAX_PAIRS, max_tags_per_post=COOC_MAX_TAGS_PER_POST, max_tags=COOC_MAX_TAGS):
+        self.max_pairs = max_pairs
+        self.max_tags = max_tags
+        self.max_tags_per_post = max_tags_per_post
+        self.tag_posts = {}     # tag -> posts carrying it
+        self.pairs = {}         # tag -> {other tag -> posts carrying both}
+        self.total_posts = 0
+        self.pair_entries = 0
+        self.prune_floor = 0    # support at or below which the last prune dropped pairs and tags
+        self.prunes = 0
+        self.ready = False      # False while the stored history is still loading
+        self._cache = {}        # (tag, by, min_support) -> (computed_at, ranked list)
+        self._lock = threading.Lock()
+
+    def add_post(self, tags):
+        tags = list(dict.fromkeys(tags))[:self.max_tags_per_post]
+        if not tags:
+            return
+        with self._lock:
+            self.total_posts += 1
+            for tag in tags:
+                self.tag_posts[tag] = self.tag_posts.get(tag, 0) + 1
+            for i, a in enumerate(tags):
+                row = self.pairs.get(a)
+                if row is None:
+                    row = self.pairs[a] = {}
+                for b in tags[i + 1:]:
+                    count = row.get(b)
+                    if count is None:
+                        self.pair_entries += 2
+                        row[b] = 1
+                        self.pairs.setdefault(b, {})[a] = 1
+                    else:
+                        row[b] = count + 1
+                        self.pairs[b][a] = count + 1
+            if self.pair_entries > self.max_pairs or len(self.tag_posts) > self.max_tags:
+                self._prune()
+
+    def add_posts(self, posts):
+        for post in posts:
+            self.add_post(post_hashtags(post))
+
+    def _prune(self):
+        # Smallest support floor that brings pairs and tags under their
+        # targets. A tag's pairs never outnumber its posts, so dropping tags
+        # at or below the floor never leaves a kept pair without its tags.
+        floor = max(
+            _floor_for(Counter(count for row in self.pairs.values() for count in row.values()),
+                       self.pair_entries, self.max_pairs * 3 // 4),
+            _floor_for(Counter(self.tag_posts.values()), len(self.tag_posts), self.max_tags * 3 // 4),
+        )
+        entries = 0
+        for tag in list(self.pairs):
+            row = self.pairs[tag]
+            dropped = [other for other, count in row.items() if count <= floor]
+            for other in dropped:
+                del row[other]
+            if row:
+                entries += len(row)
+            else:
+                del self.pairs[tag]
+        self.tag_posts = {tag: count for tag, count in self.tag_posts.items() if count > floor}
+        self.pair_entries = entries
+        self.prune_floor = floor
+        self.prunes += 1
+        self._cache.clear()
+
+    def _scored(self, tag, other, count):
+        # lift = P(a, b) / (P(a) P(b)); PMI is its log
+        lift = count * self.total_posts / (self.tag_posts[tag] * self.tag_posts[other])
+        return {
+            "tag": other,
+            "count": count,
+            "lift": round(lift, 3),
+            "pmi": round(math.log(lift), 3),
+            "confidence": round(count / self.tag_posts[tag], 3),   # P(other | tag)
+        }
+
+    def related(self, tag, limit=10, by="lift", min_support=COOC_MIN_SUPPORT):
+        """Up to COOC_TOP_K tags most associated with ``tag``, best first.
+        Ranking costs grow with the tag's neighbours, so answers are cached
+        per tag for COOC_CACHE_TTL seconds (or until a prune)."""
+        if by not in RANKINGS:
+            raise ValueError(f"by must be one of: {', '.join(RANKINGS)}")
+        tag = tag.lower()
+        key = (tag, by, min_support)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and now - cached[0] < COOC_CACHE_TTL:
+                return cached[1][:limit]
+            row = self.pairs.get(tag, {})
+            candidates = [(other, count) for other, count in row.items() if count >= min_support]
+            if by == "lift":
+                # For a fixed tag, lift (and PMI) order is count / posts(other)
+                tag_posts = self.tag_posts
+                order = lambda item: (item[1] / tag_posts[item[0]], item[1])
+            else:
+                order = lambda item: item[1]   # confidence is count / posts(tag)
+            top = heapq.nlargest(COOC_TOP_K, candidates, key=order)
+            ranked = [self._scored(tag, other, count) for other, count in top]
+            self._cache.pop(key, None)
+            if len(self._cache) >= COOC_CACHE_SIZE:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = (now, ranked)
+        return ranked[:limit]
+
+    def related_to_any(self, tags, min_lift=COOC_MIN_LIFT, min_support=COOC_MIN_SUPPORT, limit=COOC_TOP_K):
+        """{tag: best lift} over the tags related to any of ``tags``."""
+        best = {}
+        for tag in tags:
+            for entry in self.related(tag, limit=limit, min_support=min_support):
+                if entry["lift"] >= min_lift and entry["lift"] > best.get(entry["tag"], 0):
+                    best[entry["tag"]] = entry["lift"]
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {
+                "posts": self.total_posts,
+                "tags": len(self.tag_posts),
+                "pair_entries": self.pair_entries,
+                "prune_floor": self.prune_floor,
+                "prunes": self.prunes,
+                "ready": self.ready,
+                "cached_answers": len(self._cache),
+            }
+
+def _floor_for(histogram, total, target):
+    """Smallest count such that dropping everything at or below it leaves
+    at most ``target`` of ``total``; ``histogram`` maps count -> items."""
+    remaining, floor = total, 0
+    for count in sorted(histogram):
+        if remaining <= target:
+            break
+        remaining -= histogram[count]
+        floor = count
+    return floor
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_cooccurrence_index(workers=1) -> CooccurrenceIndex:
+    """Index over the last COOC_HISTORY seconds of stored posts plus every
+    post any process stores from then on. The history loads on a
+    background thread; lookups answer from what is in so far. Each of
+    ``workers`` server processes holds its own copy, so they share the
+    COOC_MAX_PAIRS and COOC_MAX_TAGS budgets."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                workers = max(1, workers)
+                index = CooccurrenceIndex(max_pairs=COOC_MAX_PAIRS // workers, max_tags=COOC_MAX_TAGS // workers)
+
+                def on_posts(posts, position):
+                    index.add_posts(posts)
+                    if position is not None and not index.ready:
+                        with index._lock:
+                            index.ready = True
+                            index._cache.clear()   # answers cached while loading were partial
+
+                get_post_store().follow(on_posts, since=time.time() - COOC_HISTORY, background=True)
+                _index = index
+    return _index
+
+# ─── Candidate Pre-ranking ─────────────────────────────────────────────
+def prerank_candidates(trends, hashtags, keep=15, index=None):
+    """Cut a wide TF-IDF candidate pool down to ``keep`` tags, favouring
+    those with high lift against a searched hashtag. Returns (trends,
+    related) where ``related`` maps kept co-occurring tags to their best
+    lift; those are relevant by association and need no embedding check."""
+    index = index or get_cooccurrence_index()
+    related = index.related_to_any(hashtags)
+    ranked = sorted(trends, key=lambda tag: tag.lower() not in related)   # stable: TF-IDF order otherwise
+    kept = set(ranked[:keep])
+    trends = {tag: stats for tag, stats in trends.items() if tag in kept}
+    return trends, {tag: related[tag.lower()] for tag in trends if tag.lower() in related}
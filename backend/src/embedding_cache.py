@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+# ─── Config ────────────────────────────────────────────────────────────
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/embeddings")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+def normalize_tag(tag: str) -> str:
+    return tag.strip().lstrip('#').lower()
+
+# ─── Hashtag Embedding Cache ───────────────────────────────────────────
+class HashtagEmbeddingCache:
+    """Two-tier cache of hashtag embeddings for one model.
+
+    Hot vectors live in an in-memory LRU. Every vector is also appended to
+    ``vectors.f32`` (a raw float32 matrix, memory-mapped for reads) and its
+    tag and row to the append-only ``index.log``, so restarts stay warm.
+    Each process reads only the log lines added since it last looked, and
+    looks again when a lookup misses, so other workers' vectors show up
+    without rewriting anything.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_memory_items=EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._dir = os.path.join(cache_dir, re.sub(r'[^a-zA-Z0-9_.-]', '_', model_name))
+        self._log_path = os.path.join(self._dir, "index.log")
+        self._legacy_index_path = os.path.join(self._dir, "index.json")
+        self._vectors_path = os.path.join(self._dir, "vectors.f32")
+        self._lock_path = os.path.join(self._dir, ".lock")
+
+        self._memory = OrderedDict()
+        self._index = {}
+        self._dim = None
+        self._matrix = None
+        self._log_offset = 0   # bytes of index.log already read
+        self._lock = threading.RLock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(self._dir, exist_ok=True)
+        if os.path.exists(self._legacy_index_path) and not os.path.exists(self._log_path):
+            self._migrate_legacy_index()
+        self._read_log()
+
+    # ── disk tier ──
+    def _flock(self):
+        lock_file = open(self._lock_path, 'w')
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _read_log(self):
+        """Apply the index.log lines written since the last call."""
+        try:
+            with open(self._log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return
+        # A writer may be mid-line; leave the partial line for next time
+        end = tail.rfind(b"\n") + 1
+        for line in tail[:end].splitlines():
+            entry = json.loads(line)
+            if isinstance(entry, dict):   # header
+                self._dim = entry["dim"]
+            else:
+                tag, row = entry
+                self._index[tag] = row
+        self._log_offset += end
+
+    def _append_log(self, entries):
+        with open(self._log_path, 'ab') as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries).encode())
+        self._read_log()
+
+    def _migrate_legacy_index(self):
+        # Caches written before index.log kept the whole map in index.json
+        with self._flock():
+            if os.path.exists(self._log_path):
+                return
+            with open(self._legacy_index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rows = sorted(data.get("rows", {}).items(), key=lambda item: item[1])
+            if data.get("dim"):
+                self._append_log([{"model": self.model_name, "dim": data["dim"]}] + [list(row) for row in rows])
+            os.remove(self._legacy_index_path)
+
+    def _disk_rows(self):
+        if not self._dim or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self._dim * 4)
+
+    def _read_row(self, row):
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            rows = self._disk_rows()
+            if row >= rows:
+                return None
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(rows, self._dim))
+        return np.array(self._matrix[row])
+
+    # ── memory tier ──
+    def _remember(self, tag, vector):
+        self._memory[tag] = vector
+        self._memory.move_to_end(tag)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup_disk(self, key):
+        row = self._index.get(key)
+        return self._read_row(row) if row is not None else None
+
+    # ── public API ──
+    def get_many(self, tags):
+        found = {}
+        missing = []
+        with self._lock:
+            for tag in tags:
+                key = normalize_tag(tag)
+                if key in found:
+                    continue
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[key] = vector
+                    continue
+                vector = self._lookup_disk(key)
+                if vector is not None:
+                    self.disk_hits += 1
+                    self._remember(key, vector)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+            if missing:
+                # Another worker may have embedded them since we last looked
+                self._read_log()
+                for key in dict.fromkeys(missing):
+                    vector = self._lookup_disk(key)
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._remember(key, vector)
+                        found[key] = vector
+                    else:
+                        self.misses += 1
+        return found
+
+    def put_many(self, tags, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(tags):
+            return
+        with self._lock, self._flock():
+            # Another worker may have appended since we last looked
+            self._read_log()
+            header = []
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                header = [{"model": self.model_name, "dim": self._dim}]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} != cached dim {self._dim}")
+
+            new_rows = {}
+            for tag, vector in zip(tags, vectors):
+                key = normalize_tag(tag)
+                self._remember(key, vector)
+                if key not in self._index:
+                    new_rows[key] = vector
+
+            if new_rows or header:
+                start = self._disk_rows()
+                if new_rows:
+                    # Vectors first: a row is only logged once it is on disk
+                    with open(self._vectors_path, 'ab') as f:
+                        f.write(np.stack(list(new_rows.values())).tobytes())
+                self._append_log(header + [[key, start + offset] for offset, key in enumerate(new_rows)])
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "model": self.model_name,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._index),
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(model_name) -> HashtagEmbeddingCache:
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = HashtagEmbeddingCache(model_name)
+        return _caches[model_name]
@@ -0,0 +1,96 @@
+import os
+import time
+import threading
+
+try:
+    from .metrics import EMBEDDING_SECONDS, EMBEDDING_TEXTS
+except ImportError:
+    from metrics import EMBEDDING_SECONDS, EMBEDDING_TEXTS
+
+# ─── Config ────────────────────────────────────────────────────────────
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None      # e.g. "cpu", "cuda"; None lets torch pick
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 keeps torch's default
+
+def preload_backend():
+    """Import sentence-transformers (and torch). Deferred to first use so
+    importing this module stays cheap; a preforking server calls it in the
+    master so workers share the imported code."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer
+
+# ─── Embedding Service ─────────────────────────────────────────────────
+class EmbeddingService:
+    """Owns a single SentenceTransformer per process and serializes access to it."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, device=EMBEDDING_DEVICE, num_threads=EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.device = device
+        self.num_threads = num_threads
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+        self._warm = threading.Event()
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def ready(self):
+        """True once the model is loaded and has run its first forward pass."""
+        return self._warm.is_set()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        t0 = time.time()
+        if self.num_threads > 0:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        model = preload_backend()(self.model_name, device=self.device)
+        print(f"🧠 Loaded {self.model_name} on {model.device} in {time.time() - t0:.2f}s")
+        return model
+
+    def encode(self, sentences, **kwargs):
+        model = self.model
+        with self._encode_lock, EMBEDDING_SECONDS.time():
+            embeddings = model.encode(sentences, **kwargs)
+        EMBEDDING_TEXTS.inc(len(sentences))
+        return embeddings
+
+    def warm_up(self):
+        # First forward pass also initialises torch kernels, so do one here
+        # rather than on the first user request.
+        self.encode(["warm up"], convert_to_tensor=True)
+        self._warm.set()
+
+    def _warm_up_logged(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            self.error = str(e)
+            print("❌ Embedding warm-up failed:", e)
+
+    def warm_up_async(self):
+        thread = threading.Thread(target=self._warm_up_logged, name="embedding-warmup", daemon=True)
+        thread.start()
+        return thread
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_embedding_service() -> EmbeddingService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService()
+    return _service
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import heapq
+import atexit
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process checkpoints
+    fcntl = None
+
+try:
+    from .post_store import get_post_store, parse_timestamp
+    from .trend_analysis import post_hashtags
+except ImportError:
+    from post_store import get_post_store, parse_timestamp
+    from trend_analysis import post_hashtags
+
+# ─── Config ────────────────────────────────────────────────────────────
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "5000"))           # tags monitored per sketch
+TRENDING_WINDOW = float(os.getenv("TRENDING_WINDOW", str(24 * 3600)))     # seconds per rising-tags window
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", "100"))                  # most tags /trending returns
+TRENDING_CHECKPOINT_PATH = os.getenv("TRENDING_CHECKPOINT_PATH", "data/trending.json")
+TRENDING_CHECKPOINT_INTERVAL = float(os.getenv("TRENDING_CHECKPOINT_INTERVAL", "60"))
+
+# ─── Space-Saving Sketch ───────────────────────────────────────────────
+class SpaceSaving:
+    """Approximate counts for the most frequent items in fixed memory.
+
+    Monitors at most ``capacity`` items. An unmonitored item replaces the
+    one with the smallest count and inherits that count as its error, so
+    ``count - error <= true count <= count``. Items are kept in buckets
+    by count (the "stream summary"), which makes every update O(1).
+    """
+
+    def __init__(self, capacity=TRENDING_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}     # item -> count
+        self.errors = {}     # item -> overestimate inherited on replacement
+        self._buckets = {}   # count -> {item: None}, oldest first
+        self.min_count = 0
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _unlink(self, item, count):
+        """Remove ``item`` from its bucket; True if the bucket emptied."""
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+            return True
+        return False
+
+    def add(self, item):
+        self.total += 1
+        count = self.counts.get(item)
+        if count is None and len(self.counts) < self.capacity:
+            self.counts[item] = 1
+            self.errors[item] = 0
+            self._buckets.setdefault(1, {})[item] = None
+            self.min_count = 1
+            return
+
+        if count is None:
+            # Replace the longest-unchanged item with the smallest count
+            count = self.min_count
+            victim = next(iter(self._buckets[count]))
+            emptied = self._unlink(victim, count)
+            del self.counts[victim]
+            del self.errors[victim]
+            self.errors[item] = count
+        else:
+            emptied = self._unlink(item, count)
+        self.counts[item] = count + 1
+        self._buckets.setdefault(count + 1, {})[item] = None
+        if emptied and count == self.min_count:
+            self.min_count = count + 1
+
+    def upper_bound(self, item):
+        """Most times ``item`` can have been seen: its count if monitored,
+        else the smallest monitored count once the sketch is full."""
+        count = self.counts.get(item)
+        if count is None:
+            return self.min_count if len(self.counts) >= self.capacity else 0
+        return count
+
+    def top(self, k):
+        return heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, count, self.errors[item]] for item, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data, capacity=None):
+        sketch = cls(capacity or data["capacity"])
+        items = sorted(data["items"], key=lambda entry: -entry[1])[:sketch.capacity]
+        for item, count, error in items:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+            sketch._buckets.setdefault(count, {})[item] = None
+        sketch.min_count = min(sketch._buckets) if sketch._buckets else 0
+        sketch.total = data["total"]
+        return sketch
+
+# ─── Global Trending Tracker ───────────────────────────────────────────
+class TrendingTracker:
+    """Most frequent and fastest-rising hashtags over every ingested post.
+
+    One sketch counts all posts; two more count the current and previous
+    ``window``-second windows of post time, and rising tags are ranked by
+    the guaranteed growth between them. Like the trend engine, "now" is
+    the newest post seen, since scraped posts are historical. Answers are
+    cached until the next update, so reads don't touch the sketches.
+    """
+
+    def __init__(self, capacity=TRENDING_CAPACITY, window=TRENDING_WINDOW, path=TRENDING_CHECKPOINT_PATH):
+        self.capacity = capacity
+        self.window = window
+        self.path = path
+        self.all_time = SpaceSaving(capacity)
+        self.current = SpaceSaving(capacity)
+        self.previous = SpaceSaving(capacity)
+        self.current_index = None   # window number of ``current``
+        self.posts = 0
+        self.position = 0           # post feed position the sketches are up to date with
+        self.ready = False          # False until the sketches match a feed position
+        self._version = 0
+        self._cached = (None, None)
+        self._checkpointed_at = time.monotonic()
+        self._lock_file = None
+        self._lock = threading.Lock()
+
+    def _window_for(self, timestamp):
+        if timestamp is None:
+            return None
+        index = int(timestamp // self.window)
+        if self.current_index is None or index > self.current_index:
+            if self.current_index is not None and index == self.current_index + 1:
+                self.previous = self.current
+            else:
+                self.previous = SpaceSaving(self.capacity)
+            self.current = SpaceSaving(self.capacity)
+            self.current_index = index
+        if index == self.current_index:
+            return self.current
+        if index == self.current_index - 1:
+            return self.previous
+        return None   # older than the previous window
+
+    def _add_post(self, tags, timestamp):
+        if not tags:
+            return
+        window = self._window_for(parse_timestamp(timestamp))
+        for tag in tags:
+            self.all_time.add(tag)
+            if window is not None:
+                window.add(tag)
+        self.posts += 1
+        self._version += 1
+
+    def add_post(self, tags, timestamp=None):
+        with self._lock:
+            self._add_post(tags, timestamp)
+
+    def add_posts(self, posts, position=None):
+        """Count a batch of posts; ``position`` is the post feed position
+        after it, saved with the sketches so a restore resumes from there."""
+        with self._lock:
+            for post in posts:
+                self._add_post(post_hashtags(post), post.get("timestamp"))
+            if position is not None:
+                self.position = position
+                if not self.ready:
+                    self.ready = True
+                    self._version += 1
+
+    def _compute(self):
+        top = [
+            {"tag": tag, "count": count, "error": self.all_time.errors[tag]}
+            for tag, count in self.all_time.top(TRENDING_TOP_K)
+        ]
+        rising = []
+        for tag, count in self.current.counts.items():
+            # Guaranteed growth: lower bound now minus upper bound before
+            previous = self.previous.upper_bound(tag)
+            growth = count - self.current.errors[tag] - previous
+            if growth > 0:
+                rising.append({"tag": tag, "count": count, "previous": previous, "growth": growth})
+        rising = heapq.nlargest(TRENDING_TOP_K, rising, key=lambda entry: entry["growth"])
+        window_start = None
+        if self.current_index is not None:
+            window_start = datetime.fromtimestamp(self.current_index * self.window, tz=timezone.utc).isoformat()
+        return {"top": top, "rising": rising, "posts": self.posts, "window_start": window_start,
+                "window_seconds": self.window, "ready": self.ready}
+
+    def snapshot(self):
+        """Top and rising tags (up to TRENDING_TOP_K each), recomputed
+        only after new posts arrive."""
+        with self._lock:
+            version, result = self._cached
+            if version != self._version:
+                result = self._compute()
+                self._cached = (self._version, result)
+            return result
+
+    # ── checkpoints ──
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "current_index": self.current_index,
+            "posts": self.posts,
+            "position": self.position,
+            "all_time": self.all_time.to_dict(),
+            "current": self.current.to_dict(),
+            "previous": self.previous.to_dict(),
+        }
+
+    def checkpoint(self):
+        with self._lock:
+            data = self.to_dict()
+            self._checkpointed_at = time.monotonic()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _owns_checkpoint(self):
+        # Every worker holds the same sketches, so one of them writes the file;
+        # another takes over once the owner's lock is released on exit
+        if self._lock_file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = open(self.path + ".lock", "a")
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    return False
+            self._lock_file = f
+        return True
+
+    def checkpoint_if_due(self, interval=TRENDING_CHECKPOINT_INTERVAL):
+        # Sketches are only checkpointed with a position they fully cover
+        if (self.ready and time.monotonic() - self._checkpointed_at >= interval
+                and self._owns_checkpoint()):
+            self.checkpoint()
+
+    def restore(self):
+        """Load the checkpoint at ``path``; False if there is none (or it
+        was written with a different window or without a feed position)."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("window") != self.window or "position" not in data:
+            return False
+        with self._lock:
+            self.all_time = SpaceSaving.from_dict(data["all_time"], self.capacity)
+            self.current = SpaceSaving.from_dict(data["current"], self.capacity)
+            self.previous = SpaceSaving.from_dict(data["previous"], self.capacity)
+            self.current_index = data["current_index"]
+            self.posts = data["posts"]
+            self.position = data["position"]
+            self.ready = True
+            self._version += 1
+        return True
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_trending_tracker() -> TrendingTracker:
+    """Process-wide tracker, fed every post any process stores. It loads
+    on a background thread: from the checkpoint when there is one, with
+    posts stored since then replayed; otherwise the checkpoint's owner
+    builds it from the store and the other processes wait to load that.
+    Until then ``snapshot()`` reports ``ready: false``."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                tracker = TrendingTracker()
+
+                def on_posts(posts, position):
+                    tracker.add_posts(posts, position)
+                    if position is not None:
+                        tracker.checkpoint_if_due()
+
+                def load():
+                    store = get_post_store()
+                    while True:
+                        if tracker.restore():
+                            store.follow(on_posts, position=tracker.position)
+                            return
+                        if tracker._owns_checkpoint():
+                            store.follow(on_posts)
+                            tracker.checkpoint_if_due(0)
+                            return
+                        time.sleep(1)   # another process is building the checkpoint
+
+                def load_logged():
+                    try:
+                        load()
+                    except Exception as e:
+                        print("❌ Loading the trending tracker failed:", e)
+
+                threading.Thread(target=load_logged, daemon=True, name="trending-load").start()
+                atexit.register(tracker.checkpoint_if_due, 0)
+                _tracker = tracker
+    return _tracker
@@ -0,0 +1,416 @@
+import os
+import time
+import hashlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow not installed: originals only
+    Image = None
+
+# ─── Config ────────────────────────────────────────────────────────────
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "data/images")
+IMAGE_CACHE_DISK_BYTES = int(os.getenv("IMAGE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_MEMORY_BYTES = int(os.getenv("IMAGE_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+IMAGE_MEMORY_ITEM_BYTES = int(os.getenv("IMAGE_MEMORY_ITEM_BYTES", str(512 * 1024)))   # larger images stay on disk only
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(16 * 1024 * 1024)))
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", "86400"))
+IMAGE_FALLBACK_MAX_AGE = int(os.getenv("IMAGE_FALLBACK_MAX_AGE", "60"))   # originals served when a resize fails
+IMAGE_PROXY_WORKERS = int(os.getenv("IMAGE_PROXY_WORKERS", "16"))
+IMAGE_PROXY_TIMEOUT = float(os.getenv("IMAGE_PROXY_TIMEOUT", "5"))
+# Every worker writes to the same cache directory; each rescans it this
+# often so the disk budget counts the other workers' files too.
+IMAGE_CACHE_SCAN_INTERVAL = float(os.getenv("IMAGE_CACHE_SCAN_INTERVAL", "30"))
+
+IMAGE_RESIZE_WORKERS = int(os.getenv("IMAGE_RESIZE_WORKERS", "2"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Requested widths snap up to one of these so each source has few variants
+IMAGE_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_WIDTHS", "160,320,480,640,960,1080").split(","))
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+RESIZE_AVAILABLE = Image is not None
+
+UPSTREAM_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Referer": "https://www.instagram.com/",
+}
+CHUNK_SIZE = 64 * 1024
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def image_etag(url: str) -> str:
+    # CDN image URLs are signed per asset, so the bytes behind a URL never change
+    return cache_key(url)[:32]
+
+def _write_atomic(path, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def snap_width(width):
+    if width is None:
+        return None
+    return next((w for w in IMAGE_WIDTHS if w >= width), IMAGE_WIDTHS[-1])
+
+def variant_id(url, width, fmt):
+    return f"{url}#w={width or ''}&f={fmt}"
+
+# ─── Resizing ──────────────────────────────────────────────────────────
+def resize_image(data: bytes, width=None, fmt="webp"):
+    """Downscale to at most ``width`` pixels wide (never upscale) and
+    re-encode; returns ``(body, content_type)``."""
+    pil_format, content_type = IMAGE_FORMATS[fmt]
+    with Image.open(BytesIO(data)) as im:
+        if width and im.width > width:
+            # Lets the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding
+            im.draft("RGB", (width, max(1, im.height * width // im.width)))
+        im = ImageOps.exif_transpose(im)
+        if width and im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if pil_format == "JPEG" and im.mode != "RGB":
+            im = im.convert("RGB")
+        elif im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+        out = BytesIO()
+        im.save(out, pil_format, quality=IMAGE_QUALITY)
+    return out.getvalue(), content_type
+
+# ─── In-flight download ────────────────────────────────────────────────
+class _Download:
+    """One upstream fetch being written to disk. Every request for the
+    same URL tails the file as it grows."""
+
+    def __init__(self, path):
+        self.path = path
+        self.cond = threading.Condition()
+        self.content_type = None
+        self.size = 0
+        self.done = False
+        self.failed = False
+
+    def wait_ready(self, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.content_type is not None or self.failed, timeout)
+            return self.content_type is not None and not self.failed
+
+    def tail(self, timeout):
+        try:
+            with self.cond:
+                f = open(self.path, "rb")
+        except FileNotFoundError:   # failed (and was cleaned up) before we got here
+            return
+        with f:
+            pos = 0
+            while True:
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.size > pos or self.done or self.failed, timeout):
+                        return
+                    size, finished = self.size, self.done or self.failed
+                if size > pos:
+                    chunk = f.read(size - pos)
+                    pos += len(chunk)
+                    yield chunk
+                elif finished:
+                    return
+
+# ─── Image Proxy ───────────────────────────────────────────────────────
+class ImageProxy:
+    """Fetches remote images through a pooled session and caches them in a
+    byte-bounded memory LRU in front of a byte-bounded disk LRU.
+
+    Concurrent requests for the same URL share one upstream download, and
+    bytes are streamed to every requester while it is still in progress.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, disk_bytes=IMAGE_CACHE_DISK_BYTES,
+                 memory_bytes=IMAGE_CACHE_MEMORY_BYTES, workers=IMAGE_PROXY_WORKERS, timeout=IMAGE_PROXY_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.disk_bytes = disk_bytes
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-proxy")
+        self.resize_executor = ThreadPoolExecutor(max_workers=IMAGE_RESIZE_WORKERS, thread_name_prefix="image-resize")
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> (content_type, bytes)
+        self._memory_size = 0
+        self._disk = OrderedDict()     # key -> size in bytes, oldest first
+        self._disk_size = 0
+        self._scanned_at = 0.0
+        self._inflight = {}            # key -> _Download
+        self._variants = {}            # key -> Future of (content_type, body)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.resizes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._lock:
+            self._scan_disk()
+            self._evict_disk()
+
+    # ── disk tier ──
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, key + ".img")
+
+    def _type_path(self, key):
+        return os.path.join(self.cache_dir, key + ".type")
+
+    def _scan_disk(self):
+        """Rebuild the disk index (oldest first) from the cache directory."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.name.endswith(".img"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(".img")], stat.st_size))
+                elif entry.name.endswith(".tmp") and entry.stat().st_mtime < time.time() - 3600:
+                    os.remove(entry.path)   # left over from an interrupted download
+            except FileNotFoundError:   # evicted by another worker meanwhile
+                continue
+        self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._disk_size = sum(self._disk.values())
+        self._scanned_at = time.monotonic()
+
+    def _add_disk(self, key, size):
+        self._disk_size += size - self._disk.pop(key, 0)
+        self._disk[key] = size
+        if time.monotonic() - self._scanned_at >= IMAGE_CACHE_SCAN_INTERVAL:
+            self._scan_disk()
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            for path in (self._body_path(key), self._type_path(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _remember(self, key, content_type, body):
+        if len(body) > IMAGE_MEMORY_ITEM_BYTES:
+            return
+        old = self._memory.pop(key, None)
+        if old:
+            self._memory_size -= len(old[1])
+        self._memory[key] = (content_type, body)
+        self._memory_size += len(body)
+        while self._memory_size > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    # ── lookups ──
+    def open(self, url):
+        """Return ``(content_type, chunks)`` for ``url``, or None if it could
+        not be fetched as an image."""
+        key = cache_key(url)
+        opened = self._lookup(key)
+        if opened:
+            return opened
+        with self._lock:
+            # A download that just finished may have filled the memory tier
+            opened = self._lookup_memory(key)
+            if opened:
+                return opened
+            download = self._inflight.get(key)
+            if download is None:
+                self.misses += 1
+                download = self._inflight[key] = _Download(self._body_path(key) + f".{os.getpid()}.tmp")
+                self.executor.submit(self._fetch, url, key, download)
+            else:
+                self.coalesced += 1
+
+        # Allow for connect + first byte upstream before giving up
+        if not download.wait_ready(2 * self.timeout):
+            return None
+        return download.content_type, download.tail(2 * self.timeout)
+
+    def open_variant(self, url, width=None, fmt="webp"):
+        """Like ``open``, but downscaled to ``width`` and re-encoded as
+        ``fmt``. Each source/width/format is resized once and cached.
+        Returns ``(content_type, chunks, resized)``; ``resized`` is False
+        when resizing failed and the original bytes are served instead."""
+        key = cache_key(variant_id(url, width, fmt))
+        opened = self._lookup(key)
+        if opened:
+            return opened + (True,)
+        with self._lock:
+            opened = self._lookup_memory(key)
+            if opened:
+                return opened + (True,)
+            future = self._variants.get(key)
+            leader = future is None
+            if leader:
+                future = self._variants[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                future.set_result(self._make_variant(url, key, width, fmt))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._variants.pop(key, None)
+        result = future.result()
+        if result is None:
+            return None
+        return result[0], [result[1]], result[2]
+
+    def _make_variant(self, url, key, width, fmt):
+        opened = self.open(url)
+        if opened is None:
+            return None
+        content_type, chunks = opened
+        data = b"".join(chunks)
+        try:
+            # CPU-bound work goes to a small pool so bursts can't starve the server
+            body, content_type = self.resize_executor.submit(resize_image, data, width, fmt).result()
+        except Exception as e:
+            print(f"❌ Resize failed for {url[:80]}, serving original:", e)
+            return content_type, data, False
+        with self._lock:
+            self.resizes += 1
+        self._put(key, content_type, body)
+        return content_type, body, True
+
+    def _lookup_memory(self, key):
+        # Caller holds self._lock
+        cached = self._memory.get(key)
+        if cached:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return cached[0], [cached[1]]
+        return None
+
+    def _lookup(self, key):
+        with self._lock:
+            opened = self._lookup_memory(key)
+        # Also finds images other workers stored since the last scan
+        return opened or self._open_disk(key)
+
+    def _open_disk(self, key):
+        # File IO runs outside the lock, like the download tail; only the
+        # index update takes it
+        try:
+            with open(self._type_path(key), encoding="utf-8") as f:
+                content_type = f.read().strip()
+            body = open(self._body_path(key), "rb")
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+            return None
+        size = os.fstat(body.fileno()).st_size
+        try:
+            os.utime(self._body_path(key))   # mtime is the LRU order every worker sees
+            evicted = False
+        except FileNotFoundError:   # evicted meanwhile; the open handle still reads
+            evicted = True
+        with self._lock:
+            if not evicted:
+                self._disk_size += size - self._disk.pop(key, 0)
+                self._disk[key] = size
+            self.disk_hits += 1
+
+        def chunks():
+            with body:
+                for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+                    yield chunk
+        return content_type, chunks()
+
+    # ── upstream ──
+    def _fetch(self, url, key, download):
+        try:
+            with open(download.path, "wb") as f:
+                with self.session.get(url, headers=UPSTREAM_HEADERS, timeout=self.timeout, stream=True) as resp:
+                    content_type = resp.headers.get("Content-Type", "")
+                    if resp.status_code != 200 or "image" not in content_type:
+                        raise ValueError(f"upstream returned {resp.status_code} {content_type or '(no type)'}")
+                    with download.cond:
+                        download.content_type = content_type
+                        download.cond.notify_all()
+                    for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                        if download.size + len(chunk) > IMAGE_MAX_BYTES:
+                            raise ValueError(f"image larger than {IMAGE_MAX_BYTES} bytes")
+                        f.write(chunk)
+                        f.flush()
+                        with download.cond:
+                            download.size += len(chunk)
+                            download.cond.notify_all()
+            self._store(key, download)
+        except Exception as e:
+            print(f"❌ Image proxy failed for {url[:80]}:", e)
+            with download.cond:
+                download.failed = True
+                download.cond.notify_all()
+            try:
+                os.remove(download.path)
+            except FileNotFoundError:
+                pass
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _store(self, key, download):
+        _write_atomic(self._type_path(key), download.content_type.encode("utf-8"))
+        body = None
+        if download.size <= IMAGE_MEMORY_ITEM_BYTES:
+            with open(download.path, "rb") as f:
+                body = f.read()
+        with self._lock:
+            with download.cond:
+                # Readers still tailing keep their open handles across the rename
+                os.replace(download.path, self._body_path(key))
+                download.path = self._body_path(key)
+                download.done = True
+                download.cond.notify_all()
+            self._add_disk(key, download.size)
+            if body is not None:
+                self._remember(key, download.content_type, body)
+
+    def _put(self, key, content_type, body):
+        _write_atomic(self._body_path(key), body)
+        _write_atomic(self._type_path(key), content_type.encode("utf-8"))
+        with self._lock:
+            self._add_disk(key, len(body))
+            self._remember(key, content_type, body)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "resizes": self.resizes,
+                "memory_bytes": self._memory_size,
+                "disk_bytes": self._disk_size,
+                "disk_items": len(self._disk),
+                "inflight": len(self._inflight) + len(self._variants),
+            }
+
+_proxy = None
+_proxy_lock = threading.Lock()
+
+def get_image_proxy() -> ImageProxy:
+    global _proxy
+    if _proxy is None:
+        with _proxy_lock:
+            if _proxy is None:
+                _proxy = ImageProxy()
+    return _proxy
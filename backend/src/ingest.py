@@ -0,0 +1,100 @@
+import json
+import codecs
+
+# ─── Projection ────────────────────────────────────────────────────────
+# Everything trend analysis and /hashtag/<tag> read from an Apify item;
+# childPosts, latestComments, images, musicInfo etc. are dropped.
+POST_FIELDS = (
+    "id", "shortCode", "url", "type",
+    "caption", "hashtags", "timestamp",
+    "likesCount", "commentsCount",
+    "ownerUsername", "ownerFullName", "ownerId",
+    "displayUrl",
+)
+
+def project_post(item: dict) -> dict:
+    return {field: item[field] for field in POST_FIELDS if field in item}
+
+# ─── Incremental JSON array parsing ────────────────────────────────────
+def iter_json_array(chunks):
+    """Yield the elements of a top-level JSON array of objects as soon as
+    each one is complete, from an iterable of bytes or str chunks."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    finished = False
+
+    for chunk in chunks:
+        if finished:
+            break
+        buffer += utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                finished = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # element not complete yet
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+
+    if not finished:
+        raise ValueError("Truncated JSON array")
+
+def iter_file_chunks(path, chunk_size=1 << 16):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+# ─── Post sources ──────────────────────────────────────────────────────
+def iter_posts_from_file(path):
+    for item in iter_json_array(iter_file_chunks(path)):
+        yield project_post(item)
+
+def iter_posts_from_response(resp, chunk_size=1 << 16):
+    """Projected posts from a streamed (``stream=True``) requests response."""
+    for item in iter_json_array(resp.iter_content(chunk_size=chunk_size)):
+        yield project_post(item)
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class JsonArrayWriter:
+    """Writes a JSON array one element at a time."""
+
+    def __init__(self, f):
+        self._f = f
+        self._first = True
+        f.write("[")
+
+    def write(self, item):
+        self._f.write("\n  " if self._first else ",\n  ")
+        json.dump(item, self._f, ensure_ascii=False)
+        self._first = False
+
+    def close(self):
+        self._f.write("\n]" if not self._first else "]")
@@ -1,20 +1,32 @@
 import os
-import traceback
+import re
 from typing import List
-from dotenv import load_dotenv
 from pydantic import BaseModel
-from huggingface_hub import InferenceClient
 
-# ─── Load Hugging Face Token ───────────────────────────────────────────
-load_dotenv()
-HF_TOKEN = os.getenv("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("❌ HF_TOKEN missing in .env")
+try:
+    from .llm_cache import TTLCache
+    from .llm_client import LLM_MODEL
+    from .llm_gateway import get_llm_gateway, LLMUnavailable
+    from .metrics import KEYWORD_LOOKUPS
+except ImportError:
+    from llm_cache import TTLCache
+    from llm_client import LLM_MODEL
+    from llm_gateway import get_llm_gateway, LLMUnavailable
+    from metrics import KEYWORD_LOOKUPS
 
-client = InferenceClient(
-    model="meta-llama/Meta-Llama-3-8B-Instruct",
-    token=HF_TOKEN
-)
+# ─── Keyword Result Cache ──────────────────────────────────────────────
+KEYWORD_CACHE_TTL = float(os.getenv("KEYWORD_CACHE_TTL", "86400"))
+KEYWORD_CACHE_SIZE = int(os.getenv("KEYWORD_CACHE_SIZE", "2048"))
+# Deterministic mode samples greedily (temperature 0) with a pinned seed so
+# a cached answer is the one any replica would have produced for the same
+# prompt.
+KEYWORD_DETERMINISTIC = os.getenv("KEYWORD_DETERMINISTIC", "0") == "1"
+KEYWORD_SEED = int(os.getenv("KEYWORD_SEED", "42"))
+
+keyword_cache = TTLCache(ttl=KEYWORD_CACHE_TTL, max_items=KEYWORD_CACHE_SIZE)
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
 
 # ─── Pydantic Result Model ──────────────────────────────────────────────
 class KeywordResult(BaseModel):
@@ -22,6 +34,43 @@ class KeywordResult(BaseModel):
 
 # ─── Extract Keywords with LLaMA 3 ───────────────────────────────────────
 def extract_keywords_llama(prompt: str, max_keywords: int = 3) -> KeywordResult:
+    key = (normalize_prompt(prompt), max_keywords, LLM_MODEL, KEYWORD_DETERMINISTIC and KEYWORD_SEED)
+    source = "cache"
+
+    def compute():
+        nonlocal source
+        source = "llm"
+        return _extract_keywords_uncached(prompt, max_keywords)
+
+    try:
+        keywords = keyword_cache.get_or_compute(
+            key,
+            compute,
+            should_cache=bool,  # never cache failures or empty answers
+        )
+    except LLMUnavailable as e:
+        print(f"⚠️ Keyword LLM unavailable ({e}), using local extraction")
+        keywords = ()
+    if not keywords:
+        source = "fallback"
+        keywords = fallback_keywords(prompt, max_keywords)
+    KEYWORD_LOOKUPS.inc(source=source)
+    return KeywordResult(keywords=list(keywords))
+
+# ─── Local Fallback ────────────────────────────────────────────────────
+STOPWORDS = set("""
+a about an and are as at be by for from has have i in is it its my of on or our that the this to
+was we with you your new best us will can just more very into over post content product
+""".split())
+
+def fallback_keywords(prompt: str, max_keywords: int = 3) -> tuple:
+    """Longest distinct non-stopword terms, used when the LLM is busy,
+    over budget or failing."""
+    words = [w for w in re.findall(r"[a-z][a-z0-9]+", prompt.lower()) if len(w) > 2 and w not in STOPWORDS]
+    ranked = sorted(dict.fromkeys(words), key=len, reverse=True)
+    return tuple(ranked[:max_keywords])
+
+def _extract_keywords_uncached(prompt: str, max_keywords: int) -> tuple:
     system_msg = {
         "role": "system",
         "content": (
@@ -34,23 +83,18 @@ def extract_keywords_llama(prompt: str, max_keywords: int = 3) -> KeywordResult:
         "content": f"Description: \"{prompt}\"\nKeywords:"
     }
 
-    try:
-        resp = client.chat.completions.create(
-            model=client.model,
-            messages=[system_msg, user_msg],
-            max_tokens=40,
-            temperature=0.7
-        )
-        text = resp.choices[0].message.content.strip()
-        if not text:
-            print("⚠️ Empty response")
-            return KeywordResult(keywords=[])
-        print("🧪 Raw response:", repr(text))
-        return KeywordResult(keywords=[k.strip().lower() for k in text.split(",") if k.strip()])
-    except Exception as e:
-        print("❌ LLaMA 3 API error:", e)
-        traceback.print_exc()
-        return KeywordResult(keywords=[])
+    text = get_llm_gateway().chat(
+        "keywords",
+        [system_msg, user_msg],
+        max_tokens=40,
+        temperature=0 if KEYWORD_DETERMINISTIC else 0.7,
+        seed=KEYWORD_SEED if KEYWORD_DETERMINISTIC else None
+    ).strip()
+    if not text:
+        print("⚠️ Empty response")
+        return ()
+    print("🧪 Raw response:", repr(text))
+    return tuple(k.strip().lower() for k in text.split(",") if k.strip())
 
 # ─── CLI Entrypoint ─────────────────────────────────────────────────────
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# ─── TTL Cache with Request Coalescing ─────────────────────────────────
+class TTLCache:
+    """Size-bounded LRU whose entries expire after ``ttl`` seconds.
+
+    ``get_or_compute`` coalesces concurrent misses for the same key: the
+    first caller runs ``compute`` and everyone else waits on its result.
+    """
+
+    def __init__(self, ttl: float, max_items: int):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()   # key -> (expires_at, value)
+        self._inflight = {}           # key -> Future
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_locked(self, key, now):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._get_locked(key, time.monotonic())
+        return entry[1] if entry else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get_or_compute(self, key, compute, should_cache=lambda value: True):
+        with self._lock:
+            entry = self._get_locked(key, time.monotonic())
+            if entry:
+                self.hits += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if should_cache(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "items": len(self._items),
+            }
@@ -0,0 +1,34 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# ─── Config ────────────────────────────────────────────────────────────
+load_dotenv()
+LLM_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+# OpenAI-compatible endpoint to use instead of the HF router, e.g. a local mock server
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+
+# ─── Shared Inference Clients ──────────────────────────────────────────
+_clients = {}   # request timeout -> InferenceClient
+_client_lock = threading.Lock()
+
+def get_inference_client(timeout=None):
+    """One InferenceClient per process (and request timeout), created on
+    first use so importing the app (or forking workers) never touches the
+    network stack."""
+    client = _clients.get(timeout)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(timeout)
+            if client is None:
+                from huggingface_hub import InferenceClient
+
+                token = os.getenv("HF_TOKEN")
+                if not token and not LLM_BASE_URL:
+                    raise ValueError("❌ HF_TOKEN missing in .env")
+                if LLM_BASE_URL:
+                    client = InferenceClient(base_url=LLM_BASE_URL, token=token, timeout=timeout)
+                else:
+                    client = InferenceClient(model=LLM_MODEL, token=token, timeout=timeout)
+                _clients[timeout] = client
+    return client
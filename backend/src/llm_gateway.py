@@ -0,0 +1,256 @@
+import os
+import math
+import time
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    from .llm_client import get_inference_client, LLM_MODEL
+    from .metrics import LLM_REQUEST_SECONDS, LLM_CALLS, LLM_TOKENS
+except ImportError:
+    from llm_client import get_inference_client, LLM_MODEL
+    from metrics import LLM_REQUEST_SECONDS, LLM_CALLS, LLM_TOKENS
+
+# ─── Config ────────────────────────────────────────────────────────────
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))        # wait for a free slot, seconds
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))                  # first retry delay, doubles each time
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 = no budget
+# Overall deadline per call type, retries included. Kept under the /analyze
+# stage timeouts so callers still have time to fall back.
+CALL_DEADLINES = {
+    "keywords": float(os.getenv("LLM_KEYWORDS_DEADLINE", "15")),
+    "suggestions": float(os.getenv("LLM_SUGGESTIONS_DEADLINE", "25")),
+}
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# CallStats counter -> hashtrend_llm_calls_total result label
+CALL_RESULTS = {"calls": "ok", "errors": "error", "retries": "retry", "rejected": "rejected"}
+
+class LLMUnavailable(Exception):
+    """The call was refused (busy, over budget) or failed within its
+    deadline; callers should take their fallback path."""
+
+def _retryable(error):
+    if isinstance(error, (ValueError, TypeError)):   # bad request or config, not transient
+        return False
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status is None or status in RETRY_STATUSES
+
+def estimate_tokens(messages, max_tokens):
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+# ─── Token Budget ──────────────────────────────────────────────────────
+class TokenBucket:
+    """Refills ``per_minute`` tokens per minute up to one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def take(self, n):
+        with self._lock:
+            self._refill()
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+    def settle(self, estimated, actual):
+        # Charged the estimate up front; correct it once usage is known
+        with self._lock:
+            self.tokens += estimated - actual
+
+# ─── Per-call-type Stats ───────────────────────────────────────────────
+class CallStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=512)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50": pick(0.5),
+            "latency_p95": pick(0.95),
+        }
+
+# ─── Gateway ───────────────────────────────────────────────────────────
+class LLMGateway:
+    """Single entry point for chat completions.
+
+    Bounds in-flight calls with a semaphore, enforces a deadline per call
+    type, retries transient failures with jittered backoff, charges calls
+    against an optional token budget and records latency and token usage
+    per call type. Refused or failed calls raise ``LLMUnavailable``.
+    """
+
+    def __init__(self, max_inflight=LLM_MAX_INFLIGHT, queue_timeout=LLM_QUEUE_TIMEOUT, retries=LLM_RETRIES,
+                 backoff=LLM_BACKOFF, tokens_per_minute=LLM_TOKENS_PER_MINUTE, deadlines=None):
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadlines = deadlines or CALL_DEADLINES
+        self.budget = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _record(self, call_type, **deltas):
+        latency = deltas.pop("latency", None)
+        with self._lock:
+            stats = self._stats.setdefault(call_type, CallStats())
+            if latency is not None:
+                stats.latencies.append(latency)
+            for name, value in deltas.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+        if latency is not None:
+            LLM_REQUEST_SECONDS.observe(latency, call_type=call_type)
+        for name, value in deltas.items():
+            if name in CALL_RESULTS:
+                LLM_CALLS.inc(value, call_type=call_type, result=CALL_RESULTS[name])
+            else:
+                LLM_TOKENS.inc(value, call_type=call_type, kind=name[:-len("_tokens")])
+
+    @contextmanager
+    def _slot(self, call_type, estimated):
+        if self.budget is not None and not self.budget.take(estimated):
+            self._record(call_type, rejected=1)
+            raise LLMUnavailable(f"{call_type}: over token budget")
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            if self.budget is not None:
+                self.budget.settle(estimated, 0)
+            self._record(call_type, rejected=1)
+            raise LLMUnavailable(f"{call_type}: too many LLM calls in flight")
+        usage = {"tokens": 0}   # set by the caller once tokens are actually used
+        try:
+            yield usage
+        finally:
+            self._slots.release()
+            # Charged the estimate up front; calls that fail or run out of
+            # time without output get it all back
+            if self.budget is not None:
+                self.budget.settle(estimated, usage["tokens"])
+
+    def _attempts(self, call_type, deadline):
+        """Yield (attempt, timeout) while there is time left, sleeping
+        with jittered backoff between attempts."""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                if time.monotonic() + delay >= deadline:
+                    return
+                self._record(call_type, retries=1)
+                time.sleep(delay)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Whole seconds so clients can be shared between calls
+            yield attempt, math.ceil(remaining)
+
+    def chat(self, call_type, messages, max_tokens, temperature=0.7, **kwargs) -> str:
+        estimated = estimate_tokens(messages, max_tokens)
+        deadline = time.monotonic() + self.deadlines[call_type]
+        last_error = None
+        with self._slot(call_type, estimated) as usage:
+            for _, timeout in self._attempts(call_type, deadline):
+                t0 = time.monotonic()
+                try:
+                    resp = get_inference_client(timeout).chat.completions.create(
+                        model=LLM_MODEL, messages=messages, max_tokens=max_tokens,
+                        temperature=temperature, **kwargs
+                    )
+                except Exception as e:
+                    last_error = e
+                    self._record(call_type, errors=1)
+                    print(f"❌ LLM {call_type} call failed:", e)
+                    if not _retryable(e):
+                        break
+                    continue
+
+                reported = getattr(resp, "usage", None)
+                prompt_tokens = getattr(reported, "prompt_tokens", None) or estimated - max_tokens
+                completion_tokens = getattr(reported, "completion_tokens", None) or max_tokens
+                usage["tokens"] = prompt_tokens + completion_tokens
+                self._record(call_type, calls=1, latency=time.monotonic() - t0,
+                             prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+                return resp.choices[0].message.content or ""
+        raise LLMUnavailable(f"{call_type}: {last_error or 'deadline exceeded'}")
+
+    def stream_chat(self, call_type, messages, max_tokens, temperature=0.7, **kwargs):
+        """Yield text chunks. Retries only happen before the first chunk;
+        after that the stream just ends early on error or deadline."""
+        estimated = estimate_tokens(messages, max_tokens)
+        deadline = time.monotonic() + self.deadlines[call_type]
+        last_error = None
+        with self._slot(call_type, estimated) as usage:
+            chunks = 0
+            for _, timeout in self._attempts(call_type, deadline):
+                t0 = time.monotonic()
+                try:
+                    stream = get_inference_client(timeout).chat.completions.create(
+                        model=LLM_MODEL, messages=messages, max_tokens=max_tokens,
+                        temperature=temperature, stream=True, **kwargs
+                    )
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            chunks += 1
+                            # Streams carry no usage, so count chunks as completion tokens
+                            usage["tokens"] = estimated - max_tokens + chunks
+                            yield chunk.choices[0].delta.content
+                        if time.monotonic() > deadline:
+                            print(f"⚠️ LLM {call_type} stream hit its deadline")
+                            break
+                except Exception as e:
+                    last_error = e
+                    self._record(call_type, errors=1)
+                    print(f"❌ LLM {call_type} stream failed:", e)
+                    if chunks or not _retryable(e):
+                        break
+                    continue
+                break
+
+            if chunks:
+                prompt_tokens = estimated - max_tokens
+                self._record(call_type, calls=1, latency=time.monotonic() - t0,
+                             prompt_tokens=prompt_tokens, completion_tokens=chunks)
+                return
+        raise LLMUnavailable(f"{call_type}: {last_error or 'no output before deadline'}")
+
+    def stats(self):
+        with self._lock:
+            return {call_type: stats.snapshot() for call_type, stats in self._stats.items()}
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
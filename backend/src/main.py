@@ -1,157 +1,17 @@
-import os
-import re
-import time
-import traceback
-from typing import List
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from huggingface_hub import InferenceClient
-from apify_scraper import run_and_fetch_sync
-from trend_analysis import compute_tf_idf_trends
-from sentence_transformers import SentenceTransformer, util
-from concurrent.futures import ThreadPoolExecutor
+import sys
 import json
-
-# ─── Load Hugging Face Token ───────────────────────────────────────────
-load_dotenv()
-HF_TOKEN = os.getenv("HF_TOKEN")
-if not HF_TOKEN:
-    raise ValueError("❌ HF_TOKEN missing in .env")
-
-# ─── Inference Client: Llama3 on hf-inference ────────────────────
-client = InferenceClient(
-    model="meta-llama/Meta-Llama-3-8B-Instruct",
-    token=HF_TOKEN
-)
-
-# ─── Pydantic Result Model ──────────────────────────────────────────────
-class KeywordResult(BaseModel):
-    keywords: List[str]
-
-# ─── Extract Keywords with LLaMA 3 ───────────────────────────────────────
-def extract_keywords_llama(prompt: str, max_keywords: int = 3) -> KeywordResult:
-    system_msg = {
-        "role": "system",
-        "content": (
-            f"You are an assistant. Extract {max_keywords} relevant keywords from a product description. "
-            f"Respond only with a comma-separated list."
-        )
-    }
-    user_msg = {
-        "role": "user",
-        "content": f"Description: \"{prompt}\"\nKeywords:"
-    }
-
-    try:
-        resp = client.chat.completions.create(
-            model=client.model,
-            messages=[system_msg, user_msg],
-            max_tokens=40,
-            temperature=0.7
-        )
-        text = resp.choices[0].message.content.strip()
-        if not text:
-            print("⚠️ Empty response")
-            return KeywordResult(keywords=[])
-        print("🧪 Raw response:", repr(text))
-        return KeywordResult(keywords=[k.strip().lower() for k in text.split(",") if k.strip()])
-    except Exception as e:
-        print("❌ LLaMA 3 API error:", e)
-        traceback.print_exc()
-        return KeywordResult(keywords=[])
-    
-# ─── Suggestion Generator Using Mixtral ────────────────────────────────
-def generate_suggestions(prompt: str, keywords: List[str], trends: List[str], max_suggestions: int = 3) -> List[str]:
-    trend_summary = ", ".join(f"#{t}" for t in trends)
-    user_prompt = (
-        f"My content is about: {prompt}. "
-        f"The extracted keywords are: {', '.join(keywords)}. "
-        f"The trending hashtags are: {trend_summary}. "
-        f"Give {max_suggestions} short and clear strategic tips for making content that performs well in this niche. "
-        f"Respond as a numbered list without explanations."
-    )
-
-    try:
-        response = client.chat.completions.create(
-            model=client.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a creative strategist who gives concise, actionable suggestions to optimize content "
-                        "for social media performance."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            max_tokens=120,
-            temperature=0.7
-        )
-
-        text = response.choices[0].message.content.strip()
-        return [line.lstrip("1234567890. ").strip("•- ") for line in text.split("\n") if line]
-    except Exception as e:
-        print("❌ Suggestion generation error:", e)
-        traceback.print_exc()
-        return []
-
-# ─── Trend Relevance Filtering ─────────────────────────────────────────
-def filter_irrelevant_trends(prompt, trends_dict, keywords, similarity_threshold=0.15, debug=True):
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    prompt_embedding = model.encode(prompt, convert_to_tensor=True)
-    filtered = {}
-
-    keywords = [kw.lower() for kw in keywords]
-
-    for tag, stats in trends_dict.items():
-        tag_text = tag.lower()
-        if any(kw in tag_text for kw in keywords):
-            if debug:
-                print(f"✅ Keeping #{tag} (matched keyword)")
-            filtered[tag] = stats
-            continue
-
-        tag_embedding = model.encode(tag_text, convert_to_tensor=True)
-        similarity = float(util.cos_sim(prompt_embedding, tag_embedding))
-
-        if debug:
-            print(f"🔍 #{tag.ljust(20)} → similarity: {similarity:.2f}")
-
-        if similarity >= similarity_threshold:
-            filtered[tag] = stats
-
-    return filtered
-
-# ─── Hashtag Sanitization ─────────────────────────────────────────────
-def sanitize_hashtag(tag):
-    return re.sub(r'[^a-zA-Z0-9_]', '', tag)
-
-# ─── Caching + Scraping ───────────────────────────────────────────────
-def run_and_fetch_cached(hashtag):
-    path = f"data/{hashtag}.json"
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            print(f"🗂️ Loaded cached #{hashtag}")
-            return json.load(f)
-
-    posts = run_and_fetch_sync(hashtag)
-    if posts:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(posts, f, ensure_ascii=False, indent=2)
-    return posts or []
-
-def fetch_all_keywords_parallel(keywords):
-    all_posts = []
-    with ThreadPoolExecutor(max_workers=min(5, len(keywords))) as executor:
-        futures = [executor.submit(run_and_fetch_cached, sanitize_hashtag(kw)) for kw in keywords]
-        for f in futures:
-            posts = f.result()
-            if posts:
-                all_posts.extend(posts)
-    return all_posts
+import argparse
+from apify_scraper import ensure_keywords_fresh_parallel
+from keyword_extractor import extract_keywords_llama
+from trend_analysis import score_tag_counts
+from tag_counts import tag_counts_cache
+from trend_windows import get_trend_engine
+from embedding_service import get_embedding_service
+from relevance import filter_irrelevant_trends
+from suggestions import generate_suggestions
+from metrics import STAGE_SECONDS
+from batch_analysis import analyze_batch
+from cooccurrence import prerank_candidates, COOC_CANDIDATE_POOL
 
 # ─── Trend Finder Workflow ─────────────────────────────────────────────
 class TrendFinder:
@@ -164,44 +24,93 @@ class TrendFinder:
             print("❌ No input provided.")
             return
 
-        t0 = time.time()
+        # Load the embedding model while the keyword LLM call is in flight
+        get_embedding_service().warm_up_async()
+
+        timings = {}
         print("🤖 Extracting keywords using Llama...")
-        keyword_result = extract_keywords_llama(prompt)
-        print(f"⏱️ Keyword extraction took {time.time() - t0:.2f}s")
-        keywords = keyword_result.keywords
+        with STAGE_SECONDS.time(stage="keywords") as timings["keywords"]:
+            keywords = extract_keywords_llama(prompt).keywords
         if not keywords:
             print("⚠️ No keywords extracted.")
             return
         print("🔑 Keywords:", ", ".join(keywords))
 
-        t1 = time.time()
-        all_posts = fetch_all_keywords_parallel(keywords)
-        print(f"⏱️ Scraping took {time.time() - t1:.2f}s")
-        if not all_posts:
+        with STAGE_SECONDS.time(stage="scraping") as timings["scraping"]:
+            hashtags = ensure_keywords_fresh_parallel(keywords)
+        if not hashtags:
             print("⚠️ No posts found.")
             return
 
-        t2 = time.time()
-        raw_trends = compute_tf_idf_trends(all_posts, top_n=15)
-        trends = filter_irrelevant_trends(prompt, raw_trends, keywords=keywords, similarity_threshold=0.2)
-        trends = dict(list(trends.items())[:self.top_n])
-        print(f"⏱️ Trend analysis took {time.time() - t2:.2f}s")
+        with STAGE_SECONDS.time(stage="trends") as timings["trends"]:
+            counts = tag_counts_cache.merged(hashtags)
+            raw_trends = score_tag_counts(counts.tag_frequency, counts.doc_frequency, counts.total_posts,
+                                          top_n=COOC_CANDIDATE_POOL)
+            raw_trends, related = prerank_candidates(raw_trends, hashtags, keep=15)
+            trends = filter_irrelevant_trends(prompt, raw_trends, keywords=keywords, similarity_threshold=0.2,
+                                              related=related, debug=True)
+            trends = get_trend_engine().annotate(dict(list(trends.items())[:self.top_n]))
 
         print("\n📈 Top Hashtag Trends:")
         if not trends:
             print("  (No relevant trends found)")
         else:
             for i, (tag, stats) in enumerate(trends.items(), 1):
-                print(f" {i}. #{tag} (score={stats['score']}, vol={stats['volume']})")
+                print(f" {i}. #{tag} (score={stats['score']}, vol={stats['volume']}, velocity={stats['velocity']}/h)")
 
         print("\n💡 Strategy Suggestions:")
-        suggestions = generate_suggestions(prompt, keywords, list(trends.keys()))
+        with STAGE_SECONDS.time(stage="suggestions") as timings["suggestions"]:
+            suggestions = generate_suggestions(prompt, keywords, list(trends.keys()))
         if suggestions:
             for i, tip in enumerate(suggestions, 1):
                 print(f" {i}. {tip}")
         else:
             print("  (No suggestions generated)")
 
+        print("\n⏱️ " + "  ".join(f"{stage} {timer.elapsed:.2f}s" for stage, timer in timings.items()))
+
+    def run_batch(self, prompts, json_path=None):
+        """Analyze many prompts at once, sharing scraping, counting and
+        embedding across them."""
+        prompts = [p.strip() for p in prompts if p.strip()]
+        if not prompts:
+            print("❌ No input provided.")
+            return
+        get_embedding_service().warm_up_async()
+
+        print(f"🤖 Analyzing {len(prompts)} prompts as one batch...")
+        results, info = analyze_batch(prompts, top_n=self.top_n)
+        for i, result in enumerate(results, 1):
+            print(f"\n━━ {i}. {result['prompt']}")
+            if "error" in result:
+                print(f"  ⚠️ {result['error']}")
+                continue
+            print("  🔑 Keywords:", ", ".join(result["keywords"]))
+            for tag, stats in result["trends"].items():
+                print(f"  📈 #{tag} (score={stats['score']}, vol={stats['volume']}, velocity={stats['velocity']}/h)")
+            for tip in result.get("suggestions", []):
+                print(f"  💡 {tip}")
+
+        print(f"\n📦 {info['unique_prompts']} unique prompts, {info['unique_keywords']} keywords, "
+              f"{info['hashtags_fetched']} hashtags fetched, {info['candidate_tags']} candidate tags")
+        print("⏱️ " + "  ".join(f"{stage} {seconds:.2f}s" for stage, seconds in info["timings"].items()))
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"results": results, **info}, f, indent=2, ensure_ascii=False)
+            print(f"✅ Saved to {json_path}")
+
 # ─── Entrypoint ────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    TrendFinder().run()
+    parser = argparse.ArgumentParser(description="Find trending hashtags for a product or post description")
+    parser.add_argument("--batch", metavar="FILE", help="analyze one prompt per line of FILE ('-' for stdin)")
+    parser.add_argument("--json", metavar="FILE", help="with --batch, also write the results as JSON")
+    args = parser.parse_args()
+
+    if args.batch:
+        if args.batch == "-":
+            TrendFinder().run_batch(sys.stdin.read().splitlines(), args.json)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                TrendFinder().run_batch(f.read().splitlines(), args.json)
+    else:
+        TrendFinder().run()
@@ -0,0 +1,402 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import bisect
+import threading
+import contextvars
+
+# ─── Config ────────────────────────────────────────────────────────────
+# Histogram bucket upper bounds in seconds; covers cache hits (sub-ms) up
+# to cold Apify runs (minutes).
+LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_BUCKETS", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120,300"
+    ).split(",")
+)
+# With several server processes, each writes its metrics to a file here and
+# /metrics reports the sum over all files. Empty: this process's metrics only.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "10"))   # seconds between writes
+RETIRED_FILE = "retired.json"   # counts of exited processes, folded into one file
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# ─── Metric Types ──────────────────────────────────────────────────────
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.count(self.name + _label_text(self.labels, key), amount)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(labels[n] for n in self.labels), 0)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, values):
+        with self._lock:
+            for key, value in values:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in items]
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # label values -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        return Timer(self, labels)
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(tuple(labels[n] for n in self.labels))
+            return sum(entry[0]) if entry else 0
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values:
+                entry = self._values.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = _label_text(self.labels, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+class Timer:
+    """Context manager that observes its elapsed time on a histogram and,
+    inside a trace, records it as a span. ``elapsed`` is set on exit."""
+
+    __slots__ = ("histogram", "labels", "start", "elapsed")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed, **self.labels)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.span(self.histogram.name, self.labels, self.start, self.elapsed)
+        return False
+
+# ─── Registry ──────────────────────────────────────────────────────────
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+                raise ValueError(f"Metric {name} already registered differently")
+            return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # ── multi-process ──
+    def dump(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"kind": metric.kind, "help": metric.help, "labels": list(metric.labels),
+                          **({"buckets": list(metric.buckets)} if metric.kind == "histogram" else {}),
+                          "values": metric.dump()}
+            for metric in metrics
+        }
+
+    def merge(self, data):
+        for name, entry in data.items():
+            try:
+                if entry["kind"] == "histogram":
+                    metric = self.histogram(name, entry["help"], entry["labels"], buckets=entry["buckets"])
+                    if list(metric.buckets) != entry["buckets"]:
+                        continue   # written with other METRICS_BUCKETS
+                else:
+                    metric = self.counter(name, entry["help"], entry["labels"])
+            except ValueError:
+                continue
+            metric.merge(entry["values"])
+
+_file_name = (None, None)   # (pid, file name)
+
+def _process_file(directory):
+    # One file per process lifetime: picked after fork, so workers never
+    # share one, and random, so a reused pid never overwrites a dead worker's
+    global _file_name
+    if _file_name[0] != os.getpid():
+        _file_name = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+    return os.path.join(directory, _file_name[1])
+
+def write_process_metrics(directory=None):
+    """Write this process's metrics to its file under ``directory``."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = _process_file(directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry.dump(), f)
+    os.replace(tmp_path, path)
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _load_retired(directory):
+    """(metrics, names of the process files already folded into them)."""
+    try:
+        data = _load(os.path.join(directory, RETIRED_FILE))
+    except FileNotFoundError:
+        return {}, []
+    return data["metrics"], data["folded"]
+
+def fold_process_metrics(pid, directory=None):
+    """Fold the files of exited process ``pid`` into ``retired.json`` so
+    worker restarts don't pile up files. Call it from the parent once
+    the process has exited (gunicorn's ``child_exit``)."""
+    directory = directory or METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return
+    dead = [name for name in os.listdir(directory)
+            if name.startswith(f"{pid}-") and name.endswith(".json")]
+    if not dead:
+        return
+    metrics, folded = _load_retired(directory)
+    retired = Registry()
+    retired.merge(metrics)
+    for name in dead:
+        try:
+            retired.merge(_load(os.path.join(directory, name)))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping metrics file {name}:", e)
+    # Readers skip the files listed here, so nothing is counted twice
+    # between writing retired.json and removing them
+    folded = [name for name in folded if os.path.exists(os.path.join(directory, name))] + dead
+    path = os.path.join(directory, RETIRED_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"metrics": retired.dump(), "folded": folded}, f)
+    os.replace(tmp_path, path)
+    for name in dead:
+        os.remove(os.path.join(directory, name))
+
+def render_all(directory=None) -> str:
+    """Metrics summed over every process that wrote to ``directory``,
+    this one included; this process's own metrics without one. Exited
+    workers' counts are kept in ``retired.json``, so totals never go
+    backwards."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return registry.render()
+    write_process_metrics(directory)
+    for _ in range(3):
+        merged = Registry()
+        metrics, folded = _load_retired(directory)
+        merged.merge(metrics)
+        vanished = False
+        for name in sorted(set(os.listdir(directory)) - set(folded) - {RETIRED_FILE}):
+            if not name.endswith(".json"):
+                continue
+            try:
+                merged.merge(_load(os.path.join(directory, name)))
+            except FileNotFoundError:
+                vanished = True   # folded since we read retired.json; start over
+                break
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping metrics file {name}:", e)
+        if not vanished:
+            break
+    return merged.render()
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def start_metrics_flusher(interval=METRICS_FLUSH_INTERVAL):
+    """Write this process's metrics every ``interval`` seconds and at exit,
+    so /metrics served by any worker includes them. No-op without METRICS_DIR."""
+    global _flusher
+    if not METRICS_DIR:
+        return
+    with _flusher_lock:
+        if _flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_process_metrics()
+                except OSError as e:
+                    print("❌ Writing metrics failed:", e)
+
+        _flusher = threading.Thread(target=run, daemon=True, name="metrics-flush")
+        _flusher.start()
+        atexit.register(write_process_metrics)
+
+registry = Registry()
+
+# ─── Request Traces ────────────────────────────────────────────────────
+class Trace:
+    """Spans and counter increments recorded while handling one request.
+
+    The trace is carried in a context variable; work submitted to thread
+    pools joins it when run with ``contextvars.copy_context().run``.
+    """
+
+    def __init__(self, trace_id=None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.spans = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, labels, start, elapsed):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                **({"labels": dict(labels)} if labels else {}),
+                "start": round(start - self.start, 4),
+                "seconds": round(elapsed, 4),
+            })
+
+    def count(self, name, amount):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "spans": sorted(self.spans, key=lambda s: s["start"]),
+                "counts": dict(self.counts),
+            }
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+def current_trace():
+    return _current_trace.get()
+
+def start_trace(trace_id=None):
+    """Make a new trace current; returns (trace, token) for ``end_trace``."""
+    trace = Trace(trace_id)
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+# ─── Pipeline Metrics ──────────────────────────────────────────────────
+STAGE_SECONDS = registry.histogram(
+    "hashtrend_stage_seconds", "Analysis pipeline stage latency", ["stage"])
+KEYWORD_LOOKUPS = registry.counter(
+    "hashtrend_keyword_lookups_total", "Keyword extractions by source", ["source"])
+SCRAPE_LOOKUPS = registry.counter(
+    "hashtrend_scrape_lookups_total", "Hashtag lookups by post-store state", ["result"])
+APIFY_REQUEST_SECONDS = registry.histogram(
+    "hashtrend_apify_request_seconds", "Apify actor run latency per attempt", ["status"])
+TFIDF_SECONDS = registry.histogram(
+    "hashtrend_tfidf_seconds", "TF-IDF scoring latency")
+EMBEDDING_SECONDS = registry.histogram(
+    "hashtrend_embedding_seconds", "Embedding model encode latency")
+EMBEDDING_TEXTS = registry.counter(
+    "hashtrend_embedding_texts_total", "Texts sent through the embedding model")
+LLM_REQUEST_SECONDS = registry.histogram(
+    "hashtrend_llm_request_seconds", "LLM call latency per successful attempt", ["call_type"])
+LLM_CALLS = registry.counter(
+    "hashtrend_llm_calls_total", "LLM call outcomes", ["call_type", "result"])
+LLM_TOKENS = registry.counter(
+    "hashtrend_llm_tokens_total", "LLM tokens used", ["call_type", "kind"])
+SUGGESTIONS = registry.counter(
+    "hashtrend_suggestions_total", "Suggestion sets by source", ["source"])
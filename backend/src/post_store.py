@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+try:
+    from .ingest import iter_posts_from_file, batched
+except ImportError:
+    from ingest import iter_posts_from_file, batched
+
+# ─── Config ────────────────────────────────────────────────────────────
+POST_STORE_PATH = os.getenv("POST_STORE_PATH", "data/posts.db")
+POST_TTL = float(os.getenv("POST_TTL", str(24 * 3600)))   # seconds a scrape stays fresh
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+REQUEST_HALF_LIFE = float(os.getenv("REQUEST_HALF_LIFE", str(6 * 3600)))  # popularity decay
+POST_RETENTION = float(os.getenv("POST_RETENTION", str(90 * 24 * 3600)))   # seconds of post time kept, 0 = forever
+POST_FEED_INTERVAL = float(os.getenv("POST_FEED_INTERVAL", "5"))   # seconds between checks for other processes' posts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id        TEXT PRIMARY KEY,
+    timestamp REAL,              -- epoch seconds, NULL if unknown
+    data      TEXT NOT NULL      -- projected Apify item as JSON
+);
+CREATE INDEX IF NOT EXISTS idx_posts_ts ON posts (timestamp);
+CREATE TABLE IF NOT EXISTS hashtag_posts (
+    hashtag   TEXT NOT NULL,
+    post_id   TEXT NOT NULL,
+    timestamp REAL,
+    PRIMARY KEY (hashtag, post_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_hashtag_posts_ts ON hashtag_posts (hashtag, timestamp);
+CREATE TABLE IF NOT EXISTS hashtag_fetches (
+    hashtag    TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    post_count INTEGER NOT NULL
+);
+-- Exponentially decayed request counts, kept as log2 of a forward-decayed
+-- sum so rows compare correctly without rewriting every score over time.
+CREATE TABLE IF NOT EXISTS hashtag_requests (
+    hashtag   TEXT PRIMARY KEY,
+    log_score REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hashtag_requests_score ON hashtag_requests (log_score);
+"""
+
+def parse_timestamp(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def post_key(post):
+    return str(post.get("id") or post.get("shortCode") or post.get("url") or "")
+
+# ─── Post Store ────────────────────────────────────────────────────────
+class PostStore:
+    """SQLite (WAL) store of scraped posts, deduplicated by post id and
+    indexed by the hashtag they were scraped for and their timestamp."""
+
+    def __init__(self, path=POST_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._listeners = []
+        self._feeds = []
+        self._feeds_lock = threading.Lock()
+        self._feed_thread = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ── writes ──
+    def add_listener(self, listener):
+        """Call ``listener(hashtag, new_posts)`` after each upsert with the
+        posts the store had not seen before."""
+        self._listeners.append(listener)
+
+    def upsert_posts(self, hashtag, posts, fetched_at=None, mark_fetched=True):
+        """Store ``posts`` under ``hashtag``; returns the number of posts
+        the store had not seen before. Streaming ingest passes
+        ``mark_fetched=False`` per batch and calls ``mark_fetched`` once done."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = []
+        for post in posts:
+            key = post_key(post)
+            if key:
+                rows.append((key, parse_timestamp(post.get("timestamp")), json.dumps(post, ensure_ascii=False), post))
+
+        new_posts = []
+        conn = self._conn()
+        with conn:
+            for key, ts, data, post in rows:
+                cursor = conn.execute("INSERT OR IGNORE INTO posts (id, timestamp, data) VALUES (?, ?, ?)",
+                                      (key, ts, data))
+                if cursor.rowcount:
+                    new_posts.append(post)
+                else:
+                    # Refresh content (likes/comments move) for posts we already had
+                    conn.execute("UPDATE posts SET timestamp = ?, data = ? WHERE id = ?", (ts, data, key))
+            conn.executemany(
+                "INSERT OR REPLACE INTO hashtag_posts (hashtag, post_id, timestamp) VALUES (?, ?, ?)",
+                [(hashtag, key, ts) for key, ts, _, _ in rows],
+            )
+            if mark_fetched:
+                self._mark_fetched(conn, hashtag, fetched_at)
+
+        for listener in self._listeners:
+            try:
+                listener(hashtag, new_posts)
+            except Exception as e:
+                print(f"❌ Post store listener failed for #{hashtag}:", e)
+        if new_posts:
+            self._poll_feeds()
+        return len(new_posts)
+
+    def _mark_fetched(self, conn, hashtag, fetched_at):
+        conn.execute(
+            "INSERT OR REPLACE INTO hashtag_fetches (hashtag, fetched_at, post_count) "
+            "VALUES (?, ?, (SELECT COUNT(*) FROM hashtag_posts WHERE hashtag = ?))",
+            (hashtag, fetched_at, hashtag),
+        )
+
+    def mark_fetched(self, hashtag, fetched_at=None):
+        conn = self._conn()
+        with conn:
+            self._mark_fetched(conn, hashtag, time.time() if fetched_at is None else fetched_at)
+
+    def ingest(self, hashtag, posts, batch_size=INGEST_BATCH_SIZE, fetched_at=None):
+        """Upsert a (possibly streaming) iterable of posts in batches, then
+        mark the hashtag fetched. Returns the number of new posts."""
+        new = 0
+        for batch in batched(posts, batch_size):
+            new += self.upsert_posts(hashtag, batch, mark_fetched=False)
+        self.mark_fetched(hashtag, fetched_at)
+        return new
+
+    def import_json_file(self, hashtag, path):
+        return self.ingest(hashtag, iter_posts_from_file(path), fetched_at=os.path.getmtime(path))
+
+    # ── retention ──
+    def prune_posts(self, retention=POST_RETENTION, now=None):
+        """Delete posts older than ``retention`` seconds; returns how many.
+        The newest row is always kept, so rowids never get reused and feed
+        positions stay valid. Freed pages are reused by later inserts."""
+        if not retention:
+            return 0
+        cutoff = (time.time() if now is None else now) - retention
+        old = "SELECT id FROM posts WHERE timestamp < ? AND rowid < (SELECT MAX(rowid) FROM posts)"
+        conn = self._conn()
+        with conn:
+            conn.execute(f"DELETE FROM hashtag_posts WHERE post_id IN ({old})", (cutoff,))
+            deleted = conn.execute(f"DELETE FROM posts WHERE id IN ({old})", (cutoff,)).rowcount
+            if deleted:
+                conn.execute("UPDATE hashtag_fetches SET post_count = "
+                             "(SELECT COUNT(*) FROM hashtag_posts WHERE hashtag = hashtag_fetches.hashtag)")
+        return deleted
+
+    # ── freshness ──
+    def fetched_at(self, hashtag):
+        row = self._conn().execute(
+            "SELECT fetched_at FROM hashtag_fetches WHERE hashtag = ?", (hashtag,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def post_count(self, hashtag):
+        row = self._conn().execute(
+            "SELECT post_count FROM hashtag_fetches WHERE hashtag = ?", (hashtag,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def is_fresh(self, hashtag, ttl=POST_TTL):
+        fetched_at = self.fetched_at(hashtag)
+        return fetched_at is not None and time.time() - fetched_at < ttl
+
+    # ── popularity ──
+    # A request at time t adds 2**(t / half_life) to a tag's forward-decayed
+    # sum; storing log2 of that sum keeps numbers small. The decayed count
+    # as of ``now`` is 2**(log_score - now / half_life).
+    def record_requests(self, hashtags, now=None, half_life=REQUEST_HALF_LIFE):
+        exponent = (time.time() if now is None else now) / half_life
+        conn = self._conn()
+        with conn:
+            for hashtag in set(hashtags):
+                row = conn.execute("SELECT log_score FROM hashtag_requests WHERE hashtag = ?",
+                                   (hashtag,)).fetchone()
+                if row:
+                    high, low = max(row[0], exponent), min(row[0], exponent)
+                    log_score = high + math.log2(1 + 2 ** (low - high))
+                else:
+                    log_score = exponent
+                conn.execute("INSERT OR REPLACE INTO hashtag_requests (hashtag, log_score) VALUES (?, ?)",
+                             (hashtag, log_score))
+
+    def hot_hashtags(self, limit=100, now=None, half_life=REQUEST_HALF_LIFE):
+        """Most requested hashtags as (hashtag, decayed_count, fetched_at)."""
+        exponent = (time.time() if now is None else now) / half_life
+        rows = self._conn().execute(
+            "SELECT r.hashtag, r.log_score, f.fetched_at FROM hashtag_requests r "
+            "LEFT JOIN hashtag_fetches f ON f.hashtag = r.hashtag "
+            "ORDER BY r.log_score DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [(tag, 2 ** (log_score - exponent), fetched_at) for tag, log_score, fetched_at in rows]
+
+    def prune_requests(self, min_count=1e-3, now=None, half_life=REQUEST_HALF_LIFE):
+        exponent = (time.time() if now is None else now) / half_life
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM hashtag_requests WHERE log_score < ?", (exponent + math.log2(min_count),))
+
+    # ── reads ──
+    def iter_posts(self, hashtags, since=None):
+        """Yield distinct posts scraped for any of ``hashtags``, newest first,
+        optionally only those newer than ``since`` (epoch, datetime or ISO)."""
+        hashtags = list(hashtags)
+        if not hashtags:
+            return
+        placeholders = ",".join("?" * len(hashtags))
+        sql = (
+            "SELECT p.data FROM posts p WHERE p.id IN ("
+            f"SELECT post_id FROM hashtag_posts WHERE hashtag IN ({placeholders})"
+        )
+        params = list(hashtags)
+        since_ts = parse_timestamp(since)
+        if since_ts is not None:
+            sql += " AND timestamp >= ?"
+            params.append(since_ts)
+        sql += ") ORDER BY p.timestamp DESC"
+        for (data,) in self._conn().execute(sql, params):
+            yield json.loads(data)
+
+    def iter_all_posts(self, since=None, max_rowid=None):
+        """Yield every stored post, oldest first, optionally only newer than
+        ``since`` and only those stored up to ``max_rowid``."""
+        sql, params = "SELECT data FROM posts WHERE 1", []
+        since_ts = parse_timestamp(since)
+        if since_ts is not None:
+            sql += " AND timestamp >= ?"
+            params.append(since_ts)
+        if max_rowid is not None:
+            sql += " AND rowid <= ?"
+            params.append(max_rowid)
+        for (data,) in self._conn().execute(sql + " ORDER BY timestamp", params):
+            yield json.loads(data)
+
+    # Rowids grow in the order posts were first stored, by whichever process
+    # (pruning never removes the newest row, so none is reused); they double
+    # as a position in that stream. Pruned posts are simply never delivered.
+    def max_rowid(self):
+        return self._conn().execute("SELECT COALESCE(MAX(rowid), 0) FROM posts").fetchone()[0]
+
+    def posts_after(self, rowid, limit=INGEST_BATCH_SIZE):
+        """Up to ``limit`` (rowid, post) pairs stored after ``rowid``, in the order they were stored."""
+        rows = self._conn().execute(
+            "SELECT rowid, data FROM posts WHERE rowid > ? ORDER BY rowid LIMIT ?", (rowid, limit)
+        ).fetchall()
+        return [(row_id, json.loads(data)) for row_id, data in rows]
+
+    # ── feeds ──
+    def follow(self, consume, position=None, since=None, background=False) -> "PostFeed":
+        """Feed stored posts to ``consume(posts, position)``: those already
+        stored (newer than ``since``), or only those after ``position`` when
+        resuming, then every post any process stores from then on. Posts
+        stored here are fed right after the upsert, others within
+        POST_FEED_INTERVAL seconds. With ``background`` the history is fed
+        from a separate thread; ``feed.ready`` is set once it is in."""
+        feed = PostFeed(self, consume, position or 0)
+
+        def start():
+            if position is None:
+                feed.bootstrap(since)
+            feed.poll()
+            with self._feeds_lock:
+                self._feeds.append(feed)
+                if self._feed_thread is None:
+                    self._feed_thread = threading.Thread(target=self._run_feeds, daemon=True, name="post-feed")
+                    self._feed_thread.start()
+            feed.ready.set()
+
+        def start_logged():
+            try:
+                start()
+            except Exception as e:
+                print("❌ Post feed bootstrap failed:", e)
+
+        if background:
+            threading.Thread(target=start_logged, daemon=True, name="post-feed-bootstrap").start()
+        else:
+            start()
+        return feed
+
+    def _poll_feeds(self):
+        with self._feeds_lock:
+            feeds = list(self._feeds)
+        for feed in feeds:
+            try:
+                feed.poll()
+            except Exception as e:
+                print("❌ Post feed failed:", e)
+
+    def _run_feeds(self):
+        while True:
+            time.sleep(POST_FEED_INTERVAL)
+            self._poll_feeds()
+
+    def posts_for_hashtag(self, hashtag, since=None):
+        return list(self.iter_posts([hashtag], since=since))
+
+# ─── Post Feed ─────────────────────────────────────────────────────────
+class PostFeed:
+    """A consumer's position in the store's stream of new posts. Each post
+    is delivered once, whichever process stored it, and ``position`` (the
+    last rowid delivered) lets a consumer save it with its own state. It is
+    None for all but the last batch of the bootstrap."""
+
+    def __init__(self, store, consume, position=0):
+        self.store = store
+        self.consume = consume
+        self.position = position
+        self.ready = threading.Event()   # set once the history is in and new posts follow
+        self._lock = threading.Lock()
+
+    def bootstrap(self, since=None):
+        """Deliver the posts stored so far (newer than ``since``), oldest
+        first, and move the position past them."""
+        with self._lock:
+            high = self.store.max_rowid()
+            batch = None
+            for next_batch in batched(self.store.iter_all_posts(since=since, max_rowid=high), INGEST_BATCH_SIZE):
+                if batch is not None:
+                    self.consume(batch, None)   # no position to resume from until the history is in
+                batch = next_batch
+            self.consume(batch or [], high)
+            self.position = high
+
+    def poll(self):
+        """Deliver posts stored since the last delivery; returns how many."""
+        delivered = 0
+        with self._lock:
+            while True:
+                rows = self.store.posts_after(self.position)
+                if not rows:
+                    return delivered
+                position = rows[-1][0]
+                self.consume([post for _, post in rows], position)
+                self.position = position
+                delivered += len(rows)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_post_store() -> PostStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PostStore()
+    return _store
+
+# ─── CLI: import legacy per-hashtag JSON files ─────────────────────────
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    store = get_post_store()
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith(".json") or name == "scraped_data.json":
+            continue
+        hashtag = name[:-len(".json")]
+        new = store.import_json_file(hashtag, os.path.join(data_dir, name))
+        print(f"📥 Imported #{hashtag}: {new} new posts")
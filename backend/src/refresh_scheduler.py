@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every scheduler runs cycles
+    fcntl = None
+
+try:
+    from .post_store import get_post_store, POST_TTL
+    from .apify_scraper import refresh_hashtag
+except ImportError:
+    from post_store import get_post_store, POST_TTL
+    from apify_scraper import refresh_hashtag
+
+# ─── Config ────────────────────────────────────────────────────────────
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "300"))   # seconds between cycles
+REFRESH_BUDGET = int(os.getenv("REFRESH_BUDGET", "5"))           # max scrapes per cycle
+REFRESH_AHEAD = float(os.getenv("REFRESH_AHEAD", "0.8"))         # refresh once this fraction of POST_TTL has passed
+REFRESH_CANDIDATES = int(os.getenv("REFRESH_CANDIDATES", "200")) # hottest tags considered per cycle
+# Only the process holding this lock runs cycles, so several server workers
+# can each start a scheduler without scraping the same tags twice.
+REFRESH_LOCK_PATH = os.getenv("REFRESH_LOCK_PATH", "data/refresh.lock")
+
+# ─── Refresh Scheduler ─────────────────────────────────────────────────
+class RefreshScheduler:
+    """Keeps popular hashtags pre-scraped.
+
+    Each cycle looks at the most requested hashtags (decayed request counts
+    from the post store), keeps those past ``REFRESH_AHEAD`` of their TTL,
+    ranks them by popularity × staleness and re-scrapes at most ``budget``.
+    """
+
+    def __init__(self, store=None, interval=REFRESH_INTERVAL, budget=REFRESH_BUDGET,
+                 ttl=POST_TTL, ahead=REFRESH_AHEAD, candidates=REFRESH_CANDIDATES, lock_path=REFRESH_LOCK_PATH):
+        self._store = store
+        self.interval = interval
+        self.budget = budget
+        self.ttl = ttl
+        self.ahead = ahead
+        self.candidates = candidates
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """True while this process holds the scheduler lock and runs cycles."""
+        return self._lock_file is not None and self._thread is not None and self._thread.is_alive()
+
+    def _acquire_lock(self):
+        if self._lock_file is None:
+            directory = os.path.dirname(self.lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = open(self.lock_path, "a")
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    return False
+            self._lock_file = f
+        return True
+
+    @property
+    def store(self):
+        return self._store or get_post_store()
+
+    def plan(self, now=None):
+        now = time.time() if now is None else now
+        ranked = []
+        for hashtag, popularity, fetched_at in self.store.hot_hashtags(limit=self.candidates, now=now):
+            staleness = 1.0 if fetched_at is None else (now - fetched_at) / self.ttl
+            if staleness >= self.ahead:
+                ranked.append((popularity * staleness, hashtag))
+        ranked.sort(reverse=True)
+        return [hashtag for _, hashtag in ranked[:self.budget]]
+
+    def run_once(self):
+        planned = self.plan()
+        refreshed = 0
+        for hashtag in planned:
+            if self._stop.is_set():
+                break
+            try:
+                refreshed += refresh_hashtag(hashtag)
+            except Exception as e:
+                print(f"❌ Scheduled refresh of #{hashtag} failed:", e)
+        self.store.prune_requests()
+        pruned = self.store.prune_posts()
+        if pruned:
+            print(f"🧹 Pruned {pruned} posts older than the retention period")
+        if planned:
+            print(f"🔄 Refreshed {refreshed}/{len(planned)} hot hashtags")
+        return planned
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            if not self._acquire_lock():
+                # Another process is scheduling; take over if it goes away
+                self._stop.wait(self.interval)
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                print("❌ Refresh cycle failed:", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="refresh-scheduler", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+# ─── CLI Entrypoint ─────────────────────────────────────────────────────
+if __name__ == "__main__":
+    scheduler = RefreshScheduler()
+    if "--once" in sys.argv:
+        print("📋 Refreshed:", ", ".join(scheduler.run_once()) or "(nothing due)")
+    else:
+        print(f"⏰ Refreshing up to {scheduler.budget} hashtags every {scheduler.interval:.0f}s (Ctrl+C to stop)")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
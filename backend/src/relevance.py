@@ -0,0 +1,93 @@
+import numpy as np
+
+try:
+    from .embedding_service import get_embedding_service
+    from .embedding_cache import get_embedding_cache, normalize_tag
+except ImportError:
+    from embedding_service import get_embedding_service
+    from embedding_cache import get_embedding_cache, normalize_tag
+
+# ─── Tag Embeddings ────────────────────────────────────────────────────
+def embed_prompts_and_tags(prompts, tags):
+    """Return (prompt_matrix, {normalized_tag: vector}) using the tag cache.
+
+    Every prompt and every uncached tag go through the model in one batch;
+    ``prompt_matrix`` has one row per prompt (None if there are none).
+    """
+    service = get_embedding_service()
+    cache = get_embedding_cache(service.model_name)
+
+    keys = list(dict.fromkeys(normalize_tag(tag) for tag in tags))
+    vectors = cache.get_many(keys)
+    missing = [key for key in keys if key not in vectors]
+
+    texts = list(prompts) + missing
+    if not texts:
+        return None, vectors
+
+    embeddings = service.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+    prompt_matrix, embeddings = embeddings[:len(prompts)], embeddings[len(prompts):]
+    if missing:
+        cache.put_many(missing, embeddings)
+        vectors.update(zip(missing, embeddings))
+    return (prompt_matrix if len(prompts) else None), vectors
+
+def embed_prompt_and_tags(prompt, tags, prompt_vector=None):
+    """Return (prompt_vector, {normalized_tag: vector}) using the tag cache.
+
+    The prompt (unless ``prompt_vector`` is already known) and every
+    uncached tag go through the model in one batch.
+    """
+    prompts = [prompt] if prompt_vector is None else []
+    prompt_matrix, vectors = embed_prompts_and_tags(prompts, tags)
+    return (prompt_matrix[0] if prompt_vector is None else prompt_vector), vectors
+
+# ─── Trend Relevance Filtering ─────────────────────────────────────────
+def filter_irrelevant_trends(prompt, trends_dict, keywords, similarity_threshold=0.15, debug=False, prompt_vector=None,
+                             related=None):
+    """Keep tags that match a keyword or are similar enough to the prompt.
+
+    Tags in ``related`` ({tag: lift} from the co-occurrence index) are kept
+    as they are, without being embedded. ``debug`` prints the decision for
+    every tag (the CLI turns it on).
+    """
+    if not trends_dict:
+        return {}
+
+    related = related or {}
+    tags = [tag for tag in trends_dict if tag not in related]
+    tag_texts = [tag.lower() for tag in tags]
+    keywords = [kw.lower() for kw in keywords]
+
+    similarities = []
+    if tags:
+        # With normalized embeddings the cosine similarities are a single
+        # matrix-vector product.
+        prompt_vector, vectors = embed_prompt_and_tags(prompt, tag_texts, prompt_vector)
+        tag_matrix = np.stack([vectors[normalize_tag(text)] for text in tag_texts])
+        similarities = (tag_matrix @ prompt_vector).tolist()
+    similarity_of = dict(zip(tags, similarities))
+
+    filtered = {}
+    for tag in trends_dict:
+        if tag in related:
+            if debug:
+                print(f"✅ Keeping #{tag} (co-occurs, lift {related[tag]:.1f})")
+            filtered[tag] = {**trends_dict[tag], 'lift': related[tag]}
+            continue
+
+        tag_text, similarity = tag.lower(), similarity_of[tag]
+        stats = {**trends_dict[tag], 'similarity': round(similarity, 3)}
+        if any(kw in tag_text for kw in keywords):
+            if debug:
+                print(f"✅ Keeping #{tag} (matched keyword)")
+            filtered[tag] = stats
+            continue
+
+        if debug:
+            print(f"🔍 #{tag.ljust(20)} → similarity: {similarity:.2f}")
+
+        if similarity >= similarity_threshold:
+            filtered[tag] = stats
+
+    return filtered
@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+try:
+    from .post_store import get_post_store, parse_timestamp
+    from .trend_analysis import post_hashtags, USE_STRUCTURED_HASHTAGS
+    from .top_posts import rank_rows, top_payloads, format_post
+except ImportError:
+    from post_store import get_post_store, parse_timestamp
+    from trend_analysis import post_hashtags, USE_STRUCTURED_HASHTAGS
+    from top_posts import rank_rows, top_payloads, format_post
+
+# ─── Config ────────────────────────────────────────────────────────────
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+SNAPSHOT_CACHE_SIZE = int(os.getenv("SNAPSHOT_CACHE_SIZE", "256"))   # open snapshots kept
+SNAPSHOT_GRACE = float(os.getenv("SNAPSHOT_GRACE", "60"))   # seconds a replaced snapshot is kept for readers
+
+# ─── Layout ────────────────────────────────────────────────────────────
+# Each build of a hashtag's snapshot is an immutable directory
+# ``<tag>.<build id>``; the text file ``<tag>.current`` names the published
+# one and is swapped atomically. A build directory holds a meta.json and
+# one .npy per column:
+#   strings / string_offsets   utf-8 blob + int64 offsets (shared string table)
+#   <string column>            int32 ids into the string table, -1 if missing
+#   likesCount, commentsCount  int64, -1 if missing
+#   epoch                      float64 post timestamp, NaN if unknown
+#   hashtags_*                 the structured hashtag lists (CSR + presence mask)
+#   tags_*                     post_hashtags() per post as CSR of string ids
+#   order_<mode>               row order per /hashtag sort mode
+#   top_posts.json             formatted payloads of the first TOP_POSTS_K rows per mode
+SNAPSHOT_FORMAT = 2
+STRING_COLUMNS = (
+    "id", "shortCode", "url", "type", "caption", "timestamp",
+    "ownerUsername", "ownerFullName", "ownerId", "displayUrl",
+)
+INT_COLUMNS = ("likesCount", "commentsCount")
+MISSING = -1
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.blob = bytearray()
+        self.offsets = array('q', [0])
+
+    def intern(self, value):
+        if value is None:
+            return MISSING
+        value = str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.offsets) - 1
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return string_id
+
+def _save(directory, name, values, dtype):
+    np.save(os.path.join(directory, name + ".npy"), np.asarray(values, dtype=dtype))
+
+def write_snapshot(path, posts, version=None, structured=None):
+    """Write ``posts`` (projected dicts, in the order given) as a columnar
+    snapshot at ``path``, which must not exist yet."""
+    structured = USE_STRUCTURED_HASHTAGS if structured is None else structured
+    strings = _StringTable()
+    string_columns = {name: array('i') for name in STRING_COLUMNS}
+    int_columns = {name: array('q') for name in INT_COLUMNS}
+    epoch = array('d')
+    hashtags, hashtags_indptr, hashtags_mask = array('i'), array('q', [0]), array('B')
+    tags, tags_indptr = array('i'), array('q', [0])
+
+    for post in posts:
+        for name in STRING_COLUMNS:
+            string_columns[name].append(strings.intern(post.get(name)))
+        for name in INT_COLUMNS:
+            value = post.get(name)
+            int_columns[name].append(int(value) if isinstance(value, (int, float)) else MISSING)
+        ts = parse_timestamp(post.get("timestamp"))
+        epoch.append(float("nan") if ts is None else ts)
+
+        listed = isinstance(post.get("hashtags"), list)
+        hashtags_mask.append(listed)
+        if listed:
+            hashtags.extend(strings.intern(tag) for tag in post["hashtags"])
+        hashtags_indptr.append(len(hashtags))
+        tags.extend(strings.intern(tag) for tag in post_hashtags(post, structured))
+        tags_indptr.append(len(tags))
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(tmp_path)
+    try:
+        _save(tmp_path, "strings", strings.blob, np.uint8)
+        _save(tmp_path, "string_offsets", strings.offsets, np.int64)
+        for name, values in string_columns.items():
+            _save(tmp_path, name, values, np.int32)
+        for name, values in int_columns.items():
+            _save(tmp_path, name, values, np.int64)
+        _save(tmp_path, "epoch", epoch, np.float64)
+        _save(tmp_path, "hashtags_ids", hashtags, np.int32)
+        _save(tmp_path, "hashtags_indptr", hashtags_indptr, np.int64)
+        _save(tmp_path, "hashtags_mask", hashtags_mask, np.uint8)
+        _save(tmp_path, "tags_ids", tags, np.int32)
+        _save(tmp_path, "tags_indptr", tags_indptr, np.int64)
+        orders = rank_rows(int_columns["likesCount"], int_columns["commentsCount"], epoch)
+        for mode, order in orders.items():
+            _save(tmp_path, "order_" + mode, order, np.int32)
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": SNAPSHOT_FORMAT, "version": version, "structured": structured,
+                       "rows": len(epoch)}, f)
+        payloads = top_payloads(orders, PostSnapshot(tmp_path).post)
+        with open(os.path.join(tmp_path, "top_posts.json"), "w", encoding="utf-8") as f:
+            json.dump(payloads, f, ensure_ascii=False)
+
+        os.rename(tmp_path, path)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return PostSnapshot(path)
+
+def _pointer_path(root, hashtag):
+    return os.path.join(root, hashtag + ".current")
+
+def read_snapshot(root, hashtag):
+    """The published snapshot of ``hashtag`` under ``root``, or None."""
+    pointer = _pointer_path(root, hashtag)
+    for _ in range(3):
+        try:
+            with open(pointer, encoding="utf-8") as f:
+                name = f.read().strip()
+            return PostSnapshot(os.path.join(root, name))
+        except FileNotFoundError:
+            if not os.path.exists(pointer):
+                return None
+            # Replaced and removed while we were opening it; resolve again
+    return None
+
+def publish_snapshot(root, hashtag, path):
+    """Point ``<tag>.current`` at the build directory ``path`` and remove
+    builds replaced more than SNAPSHOT_GRACE seconds ago."""
+    pointer = _pointer_path(root, hashtag)
+    tmp_pointer = f"{pointer}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(path))
+    os.replace(tmp_pointer, pointer)
+
+    # Builds are only ever named by the pointer, so anything else is stale
+    # once readers have had SNAPSHOT_GRACE seconds to open what they resolved
+    try:
+        with open(pointer, encoding="utf-8") as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        current = os.path.basename(path)
+    now = time.time()
+    for entry in os.scandir(root):
+        name = entry.name
+        if name == current or not entry.is_dir(follow_symlinks=False):
+            continue
+        if name == hashtag:
+            grace = 0                 # unversioned directory from before builds were versioned
+        elif name.startswith(hashtag + ".") and name.endswith(".tmp"):
+            grace = 3600              # interrupted build
+        elif name.startswith(hashtag + ".") and name.count(".") == hashtag.count(".") + 1:
+            grace = SNAPSHOT_GRACE
+        else:
+            continue
+        try:
+            if entry.stat().st_mtime < now - grace:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+# ─── Reader ────────────────────────────────────────────────────────────
+class PostSnapshot:
+    """Memory-mapped view of a snapshot. Columns are read in place and a
+    post dict is only built for the rows asked for.
+
+    Every file is opened up front, so a reader never mixes two builds and
+    keeps working after its directory has been replaced and removed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.format = meta.get("format", 1)
+        self.version = meta["version"]
+        self.structured = meta["structured"]
+        self.rows = meta["rows"]
+        self._columns = {
+            name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        self._top_posts = None
+        top_posts_path = os.path.join(path, "top_posts.json")
+        if os.path.exists(top_posts_path):   # missing only while the build is being written
+            with open(top_posts_path, encoding="utf-8") as f:
+                self._top_posts = json.load(f)
+
+    def column(self, name):
+        return self._columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def string(self, string_id):
+        if string_id < 0:
+            return None
+        offsets = self.column("string_offsets")
+        return bytes(self.column("strings")[offsets[string_id]:offsets[string_id + 1]]).decode("utf-8")
+
+    def _list(self, prefix, row):
+        indptr = self.column(prefix + "_indptr")
+        return [self.string(i) for i in self.column(prefix + "_ids")[indptr[row]:indptr[row + 1]]]
+
+    def post(self, row) -> dict:
+        """The projected post stored at ``row``."""
+        post = {}
+        for name in STRING_COLUMNS:
+            value = self.string(int(self.column(name)[row]))
+            if value is not None:
+                post[name] = value
+        for name in INT_COLUMNS:
+            value = int(self.column(name)[row])
+            if value != MISSING:
+                post[name] = value
+        if self.column("hashtags_mask")[row]:
+            post["hashtags"] = self._list("hashtags", row)
+        return post
+
+    def top_posts(self, sort="engagement", limit=6, offset=0):
+        """Formatted posts ``offset .. offset + limit`` in ``sort`` order."""
+        if self._top_posts is None:
+            with open(os.path.join(self.path, "top_posts.json"), encoding="utf-8") as f:
+                self._top_posts = json.load(f)
+        top = self._top_posts[sort]
+        if offset + limit <= len(top) or len(top) == self.rows:
+            return top[offset:offset + limit]
+        # Past the precomputed head: format just the requested rows
+        order = self.column("order_" + sort)
+        return [format_post(self.post(int(row))) for row in order[offset:offset + limit]]
+
+    def tags(self, row):
+        return self._list("tags", row)
+
+    def tag_counts(self):
+        """(tag_frequency, doc_frequency, total_posts) computed over the tag
+        columns, keyed in first-seen order like count_hashtags."""
+        ids = np.asarray(self.column("tags_ids"), dtype=np.int64)
+        if not len(ids):
+            return Counter(), Counter(), self.rows
+        indptr = self.column("tags_indptr")
+        rows = np.repeat(np.arange(self.rows, dtype=np.int64), np.diff(indptr))
+
+        unique, first, tf = np.unique(ids, return_index=True, return_counts=True)
+        span = int(unique[-1]) + 1
+        df = np.bincount(np.unique(rows * span + ids) % span, minlength=span)
+
+        tag_frequency, doc_frequency = Counter(), Counter()
+        for k in np.argsort(first, kind="stable"):
+            tag = self.string(int(unique[k]))
+            tag_frequency[tag] = int(tf[k])
+            doc_frequency[tag] = int(df[unique[k]])
+        return tag_frequency, doc_frequency, self.rows
+
+# ─── Snapshots kept in step with the post store ────────────────────────
+class SnapshotStore:
+    """Per-hashtag snapshots under ``root``, rebuilt from the post store
+    whenever the hashtag's ``fetched_at`` moves on."""
+
+    def __init__(self, root=SNAPSHOT_DIR, store=None, max_open=SNAPSHOT_CACHE_SIZE):
+        self.root = root
+        self._store = store
+        self.max_open = max_open
+        self._open = OrderedDict()   # hashtag -> PostSnapshot
+        self._building = {}          # (hashtag, version) -> Future of PostSnapshot
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    @property
+    def store(self):
+        return self._store or get_post_store()
+
+    def _current(self, snapshot, version):
+        return (snapshot is not None and snapshot.format == SNAPSHOT_FORMAT
+                and snapshot.version == version and snapshot.structured == USE_STRUCTURED_HASHTAGS)
+
+    def get(self, hashtag, version=None) -> PostSnapshot:
+        version = self.store.fetched_at(hashtag) if version is None else version
+        key = (hashtag, version)
+        with self._lock:
+            snapshot = self._open.get(hashtag)
+            if self._current(snapshot, version):
+                self._open.move_to_end(hashtag)
+                return snapshot
+            # One thread opens or builds each version; other lookups go on
+            future = self._building.get(key)
+            leader = future is None
+            if leader:
+                future = self._building[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            snapshot = read_snapshot(self.root, hashtag)
+            if not self._current(snapshot, version):
+                snapshot = self._build(hashtag, version)
+        except BaseException as e:
+            with self._lock:
+                self._building.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._building.pop(key, None)
+            self._open[hashtag] = snapshot
+            self._open.move_to_end(hashtag)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        future.set_result(snapshot)
+        return snapshot
+
+    def _build(self, hashtag, version):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{hashtag}.{uuid.uuid4().hex[:12]}")
+        snapshot = write_snapshot(path, self.store.iter_posts([hashtag]), version)
+        with self._lock:
+            self.builds += 1
+        # Another worker may have published while we built: keep theirs if
+        # it is this version, or leave a newer one in place
+        published = read_snapshot(self.root, hashtag)
+        if self._current(published, version):
+            shutil.rmtree(path, ignore_errors=True)
+            return published
+        if published is None or published.version is None or version is None or published.version < version:
+            publish_snapshot(self.root, hashtag, path)
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._open), "builds": self.builds}
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    global _snapshots
+    if _snapshots is None:
+        with _snapshots_lock:
+            if _snapshots is None:
+                _snapshots = SnapshotStore()
+    return _snapshots
+
+# ─── CLI: convert legacy per-hashtag JSON files ────────────────────────
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    store = get_post_store()
+    snapshots = get_snapshot_store()
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith(".json") or name == "scraped_data.json":
+            continue
+        hashtag = name[:-len(".json")]
+        if store.fetched_at(hashtag) is None:
+            store.import_json_file(hashtag, os.path.join(data_dir, name))
+        snapshot = snapshots.get(hashtag)
+        print(f"🧊 Snapshot #{hashtag}: {len(snapshot)} posts → {snapshot.path}")
@@ -0,0 +1,77 @@
+try:
+    from .llm_gateway import get_llm_gateway, LLMUnavailable
+    from .metrics import SUGGESTIONS
+except ImportError:
+    from llm_gateway import get_llm_gateway, LLMUnavailable
+    from metrics import SUGGESTIONS
+
+# ─── Suggestion Generator ──────────────────────────────────────────────
+def _suggestion_messages(prompt, keywords, trends, max_suggestions):
+    trend_summary = ", ".join(f"#{t}" for t in trends)
+    user_prompt = (
+        f"My content is about: {prompt}. "
+        f"The extracted keywords are: {', '.join(keywords)}. "
+        f"The trending hashtags are: {trend_summary}. "
+        f"Give {max_suggestions} short and clear strategic tips for making content that performs well in this niche. "
+        f"Respond as a numbered list without explanations."
+    )
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a creative strategist who gives concise, actionable suggestions to optimize content "
+                "for social media performance."
+            )
+        },
+        {
+            "role": "user",
+            "content": user_prompt
+        }
+    ]
+
+def parse_suggestions(text: str) -> list[str]:
+    return [line.lstrip("1234567890. ").strip("•- ") for line in text.strip().split("\n") if line]
+
+def fallback_suggestions(keywords: list[str], trends: list[str], max_suggestions: int = 3) -> list[str]:
+    """Template tips for when the LLM is busy, over budget or failing."""
+    tags = " ".join(f"#{t}" for t in trends[:3])
+    topic = keywords[0] if keywords else "your niche"
+    tips = [
+        f"Pair your post with trending tags like {tags}" if tags else f"Research the top hashtags for {topic} before posting",
+        f"Open with a clear hook about {topic} in the first line of the caption",
+        "Post consistently at the times your audience is most active",
+        "Ask a question in the caption to invite comments",
+    ]
+    return tips[:max_suggestions]
+
+def generate_suggestions(prompt: str, keywords: list[str], trends: list[str], max_suggestions: int = 3) -> list[str]:
+    try:
+        text = get_llm_gateway().chat(
+            "suggestions",
+            _suggestion_messages(prompt, keywords, trends, max_suggestions),
+            max_tokens=120,
+            temperature=0.7
+        )
+        suggestions = parse_suggestions(text)
+        if suggestions:
+            SUGGESTIONS.inc(source="llm")
+            return suggestions
+    except LLMUnavailable as e:
+        print(f"⚠️ Suggestion LLM unavailable ({e}), using templates")
+    SUGGESTIONS.inc(source="fallback")
+    return fallback_suggestions(keywords, trends, max_suggestions)
+
+def stream_suggestions(prompt: str, keywords: list[str], trends: list[str], max_suggestions: int = 3):
+    """Yield suggestion text chunks as the model produces them."""
+    try:
+        yield from get_llm_gateway().stream_chat(
+            "suggestions",
+            _suggestion_messages(prompt, keywords, trends, max_suggestions),
+            max_tokens=120,
+            temperature=0.7
+        )
+        SUGGESTIONS.inc(source="llm")
+    except LLMUnavailable as e:
+        print(f"⚠️ Suggestion LLM unavailable ({e}), using templates")
+        SUGGESTIONS.inc(source="fallback")
+        yield "\n".join(f"{i}. {tip}" for i, tip in enumerate(fallback_suggestions(keywords, trends, max_suggestions), 1))
@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import Counter, OrderedDict
+
+try:
+    from .post_store import get_post_store
+    from .trend_analysis import count_hashtags
+except ImportError:
+    from post_store import get_post_store
+    from trend_analysis import count_hashtags
+
+# ─── Config ────────────────────────────────────────────────────────────
+TAG_COUNTS_CACHE_SIZE = int(os.getenv("TAG_COUNTS_CACHE_SIZE", "512"))
+
+# ─── Per-hashtag Tag Counts ────────────────────────────────────────────
+class TagCounts:
+    __slots__ = ("tag_frequency", "doc_frequency", "total_posts")
+
+    def __init__(self, tag_frequency=None, doc_frequency=None, total_posts=0):
+        self.tag_frequency = tag_frequency if tag_frequency is not None else Counter()
+        self.doc_frequency = doc_frequency if doc_frequency is not None else Counter()
+        self.total_posts = total_posts
+
+    @classmethod
+    def from_posts(cls, posts):
+        return cls(*count_hashtags(posts))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(*snapshot.tag_counts())
+
+    def merge(self, other: "TagCounts"):
+        self.tag_frequency.update(other.tag_frequency)
+        self.doc_frequency.update(other.doc_frequency)
+        self.total_posts += other.total_posts
+        return self
+
+def _snapshot_store():
+    try:
+        from .snapshot import get_snapshot_store
+    except ImportError:
+        try:
+            from snapshot import get_snapshot_store
+        except ImportError:  # numpy not installed
+            return None
+    return get_snapshot_store()
+
+# ─── Hot Cache ─────────────────────────────────────────────────────────
+class TagCountsCache:
+    """Bounded LRU of TagCounts per scraped hashtag.
+
+    Entries are tagged with the post store's ``fetched_at`` for the hashtag
+    and rebuilt once a newer scrape lands.
+    """
+
+    def __init__(self, store=None, max_items=TAG_COUNTS_CACHE_SIZE):
+        self._store = store
+        self.max_items = max_items
+        self._items = OrderedDict()   # hashtag -> (version, TagCounts)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def store(self):
+        return self._store or get_post_store()
+
+    def get(self, hashtag) -> TagCounts:
+        version = self.store.fetched_at(hashtag)
+        with self._lock:
+            entry = self._items.get(hashtag)
+            if entry and entry[0] == version:
+                self._items.move_to_end(hashtag)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        counts = self._count(hashtag, version)
+        with self._lock:
+            self._items[hashtag] = (version, counts)
+            self._items.move_to_end(hashtag)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return counts
+
+    def _count(self, hashtag, version):
+        snapshots = _snapshot_store() if self._store is None else None
+        if snapshots is not None:
+            return TagCounts.from_snapshot(snapshots.get(hashtag, version))
+        return TagCounts.from_posts(self.store.iter_posts([hashtag]))
+
+    def merged(self, hashtags) -> TagCounts:
+        # Cached counters are shared, so merge into a fresh one
+        total = TagCounts()
+        for hashtag in hashtags:
+            total.merge(self.get(hashtag))
+        return total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "items": len(self._items),
+            }
+
+tag_counts_cache = TagCountsCache()
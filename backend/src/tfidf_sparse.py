@@ -0,0 +1,104 @@
+from array import array
+import numpy as np
+from scipy import sparse
+
+try:
+    from .trend_analysis import post_hashtags
+    from .metrics import TFIDF_SECONDS
+except ImportError:
+    from trend_analysis import post_hashtags
+    from metrics import TFIDF_SECONDS
+
+# ─── Tag Vocabulary ────────────────────────────────────────────────────
+class TagVocabulary:
+    """Interns tags to dense column ids in first-seen order."""
+
+    def __init__(self):
+        self.ids = {}
+        self.tags = []
+
+    def intern(self, tag):
+        tag_id = self.ids.get(tag)
+        if tag_id is None:
+            tag_id = self.ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return tag_id
+
+    def __len__(self):
+        return len(self.tags)
+
+# ─── Post × Tag Matrix ─────────────────────────────────────────────────
+def build_post_tag_matrix(posts, vocab=None, structured=None, engine=None):
+    """CSR matrix with one row per post and one column per interned tag;
+    entries are how often the post mentions the tag."""
+    vocab = vocab if vocab is not None else TagVocabulary()
+    indptr = array('q', [0])
+    indices = array('i')
+    intern = vocab.intern
+    for post in posts:
+        tags = post_hashtags(post, structured)
+        indices.extend([intern(tag) for tag in tags])
+        indptr.append(len(indices))
+        if engine is not None:
+            engine.add_post(tags, post.get('timestamp'))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32),
+         np.asarray(indices, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocab)),
+    )
+    matrix.sum_duplicates()
+    return matrix, vocab
+
+# ─── Scoring ───────────────────────────────────────────────────────────
+def select_top(scores, top_n):
+    """Indices of the ``top_n`` best scores, ordered exactly like
+    ``sorted(..., key=round(score, 2), reverse=True)`` over column order."""
+    n = len(scores)
+    if n == 0 or top_n <= 0:
+        return []
+    if top_n < n:
+        kth = np.partition(scores, n - top_n)[n - top_n]
+        # Rounding to 2dp can tie values up to 0.01 apart, so keep the
+        # whole band around the cut and settle it in Python.
+        candidates = np.flatnonzero(scores >= kth - 0.01)
+    else:
+        candidates = np.arange(n)
+    rounded = [round(float(scores[i]), 2) for i in candidates]
+    order = sorted(range(len(candidates)), key=lambda j: (-rounded[j], candidates[j]))
+    return [int(candidates[j]) for j in order[:top_n]]
+
+def score_arrays(tags, tag_frequency, doc_frequency, total_posts, top_n=5):
+    tag_frequency = np.asarray(tag_frequency, dtype=np.float64)
+    doc_frequency = np.asarray(doc_frequency, dtype=np.float64)
+    idf = np.maximum(1.0, total_posts / (doc_frequency + 1))
+    scores = tag_frequency * idf
+    return {
+        tags[i]: {
+            'score': round(float(scores[i]), 2),
+            'volume': int(tag_frequency[i]),
+            'velocity': None,  # Filled in by TrendEngine.annotate
+            'window_start': None
+        }
+        for i in select_top(scores, top_n)
+    }
+
+def score_matrix(matrix, vocab, top_n=5):
+    with TFIDF_SECONDS.time():
+        tag_frequency = np.asarray(matrix.sum(axis=0)).ravel()
+        doc_frequency = matrix.getnnz(axis=0)
+        return score_arrays(vocab.tags, tag_frequency, doc_frequency, matrix.shape[0], top_n)
+
+def score_counts(tag_frequency, doc_frequency, total_posts, top_n=5):
+    """score_tag_counts over Counters (e.g. merged per-hashtag counts),
+    vectorized; same result and tie order."""
+    with TFIDF_SECONDS.time():
+        tags = list(tag_frequency)
+        tf = np.fromiter(tag_frequency.values(), dtype=np.float64, count=len(tags))
+        df = np.fromiter(map(doc_frequency.__getitem__, tags), dtype=np.float64, count=len(tags))
+        return score_arrays(tags, tf, df, total_posts, top_n)
+
+def compute_sparse_trends(posts, top_n=5, structured=None, engine=None):
+    matrix, vocab = build_post_tag_matrix(posts, structured=structured, engine=engine)
+    return score_matrix(matrix, vocab, top_n)
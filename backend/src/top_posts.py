@@ -0,0 +1,35 @@
+import os
+import numpy as np
+
+# ─── Config ────────────────────────────────────────────────────────────
+TOP_POSTS_K = int(os.getenv("TOP_POSTS_K", "60"))   # formatted posts precomputed per sort mode
+SORT_MODES = ("engagement", "recency")
+
+# ─── Response payload ──────────────────────────────────────────────────
+def format_post(post: dict) -> dict:
+    return {
+        "username": post.get("ownerUsername") or post.get("author") or "unknown",
+        "avatarUrl": post.get("profilePicUrl") or "",
+        "caption": post.get("caption") or post.get("description") or post.get("text") or "",
+        "imageUrl": post.get("displayUrl") or "",
+        "likes": max(post.get("likesCount") or 0, 0),   # Apify reports hidden likes as -1
+        "comments": max(post.get("commentsCount") or 0, 0),
+        "timestamp": post.get("timestamp") or "",
+        "url": post.get("url") or "",
+    }
+
+# ─── Orderings ─────────────────────────────────────────────────────────
+def rank_rows(likes, comments, epoch):
+    """Row orders for every sort mode. Engagement is likes + comments with
+    newer posts first on ties; recency puts posts without a timestamp last."""
+    likes = np.maximum(np.asarray(likes, dtype=np.int64), 0)
+    comments = np.maximum(np.asarray(comments, dtype=np.int64), 0)
+    recency = np.nan_to_num(np.asarray(epoch, dtype=np.float64), nan=-np.inf)
+    return {
+        "engagement": np.lexsort((-recency, -(likes + comments))).astype(np.int32),
+        "recency": np.argsort(-recency, kind="stable").astype(np.int32),
+    }
+
+def top_payloads(orders, post_at, k=TOP_POSTS_K):
+    """Formatted payloads for the first ``k`` rows of each ordering."""
+    return {mode: [format_post(post_at(int(row))) for row in order[:k]] for mode, order in orders.items()}
@@ -1,16 +1,28 @@
-import json
 import os
+import heapq
 from collections import Counter, defaultdict
 from typing import List
 from datetime import datetime
 
+try:
+    from .trend_windows import TrendEngine
+    from .ingest import iter_posts_from_file
+    from .metrics import TFIDF_SECONDS
+except ImportError:
+    from trend_windows import TrendEngine
+    from ingest import iter_posts_from_file
+    from metrics import TFIDF_SECONDS
+
+# Use Apify's structured `hashtags` list instead of re-parsing captions
+USE_STRUCTURED_HASHTAGS = os.getenv("USE_STRUCTURED_HASHTAGS", "0") == "1"
+
 # ─── Load scraped data ─────────────────────────────────────────────────────────
 def load_scraped(path='data/scraped_data.json'):
+    """Iterate projected posts from ``path`` without loading the whole file."""
     if not os.path.exists(path):
         print(f"🔴 No scraped data found at {path}")
-        return []
-    with open(path, encoding='utf-8') as f:
-        return json.load(f)
+        return iter(())
+    return iter_posts_from_file(path)
 
 # ─── Extract hashtags from captions ────────────────────────────────────────────
 def extract_hashtags(caption: str) -> List[str]:
@@ -22,48 +34,80 @@ def extract_hashtags(caption: str) -> List[str]:
         if word.startswith('#')
     ]
 
-# ─── Compute TF-IDF-like trending score ────────────────────────────────────────
-def compute_tf_idf_trends(posts: List[dict], top_n=5):
+def post_hashtags(post: dict, structured: bool = None) -> List[str]:
+    if structured is None:
+        structured = USE_STRUCTURED_HASHTAGS
+    if structured and isinstance(post.get('hashtags'), list):
+        return [tag.lower() for tag in post['hashtags'] if tag]
+    return extract_hashtags(post.get('caption') or post.get('description', ''))
+
+# ─── Count hashtags across posts ───────────────────────────────────────────────
+def count_hashtags(posts: List[dict], engine: TrendEngine = None, structured: bool = None):
     tag_frequency = Counter()
     doc_frequency = Counter()
     total_posts = 0
 
     for post in posts:
         total_posts += 1
-        caption = post.get('caption') or post.get('description', '')
-        tags = set(extract_hashtags(caption))
-        for tag in tags:
-            doc_frequency[tag] += 1
-        for tag in extract_hashtags(caption):
-            tag_frequency[tag] += 1
+        tags = post_hashtags(post, structured)
+        tag_frequency.update(tags)
+        doc_frequency.update(set(tags))
+        if engine is not None:
+            engine.add_post(tags, post.get('timestamp'))
 
-    avg_volume = sum(tag_frequency.values()) / (len(tag_frequency) or 1)
+    return tag_frequency, doc_frequency, total_posts
 
-    trends = {}
-    for tag in tag_frequency:
-        tf = tag_frequency[tag]
-        df = doc_frequency[tag]
-        idf = max(1.0, total_posts / (df + 1))
-        score = tf * idf
-        trends[tag] = {
-            'score': round(score, 2),
-            'volume': tf,
-            'velocity': None,  # Not applicable in TF-IDF mode
-            'window_start': None  # Not used here
+# ─── Compute TF-IDF-like trending score ────────────────────────────────────────
+def _sparse_backend():
+    try:
+        from . import tfidf_sparse
+    except ImportError:
+        try:
+            import tfidf_sparse
+        except ImportError:  # numpy/scipy not installed
+            return None
+    return tfidf_sparse
+
+def score_tag_counts(tag_frequency: Counter, doc_frequency: Counter, total_posts: int, top_n=5):
+    backend = _sparse_backend()
+    if backend is not None:
+        return backend.score_counts(tag_frequency, doc_frequency, total_posts, top_n)
+    return score_tag_counts_python(tag_frequency, doc_frequency, total_posts, top_n)
+
+def score_tag_counts_python(tag_frequency: Counter, doc_frequency: Counter, total_posts: int, top_n=5):
+    def score(tag):
+        idf = max(1.0, total_posts / (doc_frequency[tag] + 1))
+        return round(tag_frequency[tag] * idf, 2)
+
+    # nlargest is a stable partial sort: same order as sorting everything
+    with TFIDF_SECONDS.time():
+        top = heapq.nlargest(top_n, ((tag, score(tag)) for tag in tag_frequency), key=lambda x: x[1])
+    return {
+        tag: {
+            'score': tag_score,
+            'volume': tag_frequency[tag],
+            'velocity': None,  # Filled in by TrendEngine.annotate
+            'window_start': None
         }
+        for tag, tag_score in top
+    }
 
-    top = dict(sorted(trends.items(), key=lambda x: x[1]['score'], reverse=True)[:top_n])
-    return top
+def compute_tf_idf_trends(posts: List[dict], top_n=5, structured: bool = None):
+    engine = TrendEngine()
+    backend = _sparse_backend()
+    if backend is not None:
+        top = backend.compute_sparse_trends(posts, top_n=top_n, structured=structured, engine=engine)
+    else:
+        top = score_tag_counts_python(*count_hashtags(posts, engine, structured), top_n=top_n)
+    return engine.annotate(top)
 
 # ─── CLI Entrypoint for testing ────────────────────────────────────────────────
 if __name__ == "__main__":
-    posts = load_scraped()
-    if not posts:
+    trends = compute_tf_idf_trends(load_scraped(), top_n=5)
+    if not trends:
         print("⚠️ No data to analyze.")
         exit()
 
-    trends = compute_tf_idf_trends(posts, top_n=5)
-
     print("\n📈 Top Hashtag Trends (TF-IDF-style):")
     for tag, stats in trends.items():
-        print(f"  #{tag} → score={stats['score']}  volume={stats['volume']}")
+        print(f"  #{tag} → score={stats['score']}  volume={stats['volume']}  velocity={stats['velocity']}/h")
@@ -0,0 +1,163 @@
+import os
+import time
+import threading
+from array import array
+from datetime import datetime, timezone
+
+try:
+    from .post_store import parse_timestamp
+except ImportError:
+    from post_store import parse_timestamp
+
+# ─── Config ────────────────────────────────────────────────────────────
+# name -> (bucket width in seconds, buckets kept, buckets per trend window)
+RESOLUTIONS = {
+    "hourly": (3600, 24 * 14, 24),   # two weeks of hours, 1-day windows
+    "daily": (86400, 60, 7),         # two months of days, 1-week windows
+}
+TREND_MAX_TAGS = int(os.getenv("TREND_MAX_TAGS", "10000"))
+
+# ─── Windowed Counter ──────────────────────────────────────────────────
+class WindowedCounter:
+    """Per-tag ring buffers of fixed-width time buckets.
+
+    Each tag owns a ``num_buckets`` uint32 array indexed by
+    ``bucket % num_buckets`` plus the newest bucket it has written. Slots
+    between that bucket and a newer one are zeroed lazily on write, so an
+    add is O(1) amortized and nothing is ever recomputed from scratch.
+    """
+
+    def __init__(self, bucket_seconds, num_buckets, max_tags=TREND_MAX_TAGS):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.max_tags = max_tags
+        self._buckets = {}   # tag -> array('I')
+        self._heads = {}     # tag -> newest bucket number written
+
+    def bucket_of(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def add(self, tag, timestamp, count=1):
+        bucket = self.bucket_of(timestamp)
+        counts = self._buckets.get(tag)
+        if counts is None:
+            if len(self._buckets) >= self.max_tags:
+                self._evict()
+            counts = self._buckets[tag] = array('I', bytes(4 * self.num_buckets))
+            self._heads[tag] = bucket
+        head = self._heads[tag]
+        if bucket > head:
+            for b in range(head + 1, min(bucket, head + self.num_buckets) + 1):
+                counts[b % self.num_buckets] = 0
+            self._heads[tag] = bucket
+        elif bucket <= head - self.num_buckets:
+            return  # older than the history we keep
+        counts[bucket % self.num_buckets] += count
+
+    def _evict(self):
+        # Drop the tenth of tags that have been quiet the longest
+        quiet = sorted(self._heads, key=self._heads.get)[:max(1, len(self._heads) // 10)]
+        for tag in quiet:
+            del self._buckets[tag]
+            del self._heads[tag]
+
+    def series(self, tag, end_bucket, length):
+        """Counts for buckets ``end_bucket - length + 1 .. end_bucket``."""
+        counts = self._buckets.get(tag)
+        if counts is None:
+            return [0] * length
+        head = self._heads[tag]
+        out = []
+        for b in range(end_bucket - length + 1, end_bucket + 1):
+            if b > head or b <= head - self.num_buckets:
+                out.append(0)
+            else:
+                out.append(counts[b % self.num_buckets])
+        return out
+
+    def __len__(self):
+        return len(self._buckets)
+
+# ─── Trend Engine ──────────────────────────────────────────────────────
+class TrendEngine:
+    """Sliding-window volume, velocity and acceleration per hashtag.
+
+    For a window of W buckets ending at ``now``: volume is the count in the
+    current window, velocity is (current − previous window) / W per
+    bucket, and acceleration is the change in velocity between the current
+    and previous window pairs.
+    """
+
+    def __init__(self, resolutions=None, max_tags=TREND_MAX_TAGS):
+        resolutions = resolutions or RESOLUTIONS
+        self.windows = {name: window for name, (_, _, window) in resolutions.items()}
+        self.counters = {
+            name: WindowedCounter(seconds, buckets, max_tags)
+            for name, (seconds, buckets, _) in resolutions.items()
+        }
+        self.latest_timestamp = None
+        self._lock = threading.Lock()
+
+    def add_post(self, tags, timestamp):
+        timestamp = parse_timestamp(timestamp)
+        if timestamp is None or not tags:
+            return
+        with self._lock:
+            for counter in self.counters.values():
+                for tag in tags:
+                    counter.add(tag, timestamp)
+            if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+                self.latest_timestamp = timestamp
+
+    def stats(self, tag, resolution="hourly", now=None):
+        counter = self.counters[resolution]
+        window = self.windows[resolution]
+        # Scraped data is historical, so default to the newest post seen
+        now = now if now is not None else (self.latest_timestamp or time.time())
+        end = counter.bucket_of(now)
+        with self._lock:
+            series = counter.series(tag, end, 3 * window)
+        older, previous, current = (sum(series[i * window:(i + 1) * window]) for i in range(3))
+        velocity = (current - previous) / window
+        acceleration = velocity - (previous - older) / window
+        window_start = (end - window + 1) * counter.bucket_seconds
+        return {
+            'window_volume': current,
+            'velocity': round(velocity, 3),
+            'acceleration': round(acceleration, 3),
+            'window_start': datetime.fromtimestamp(window_start, tz=timezone.utc).isoformat(),
+        }
+
+    def annotate(self, trends, resolution="hourly", now=None):
+        for tag, stats in trends.items():
+            stats.update(self.stats(tag, resolution=resolution, now=now))
+        return trends
+
+# ─── Process-wide engine fed by the post store ─────────────────────────
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_trend_engine() -> TrendEngine:
+    """Engine over every stored post: bootstrapped once from the store's
+    recent history, then fed every post any process stores after that."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                try:
+                    from .post_store import get_post_store
+                    from .trend_analysis import post_hashtags
+                except ImportError:
+                    from post_store import get_post_store
+                    from trend_analysis import post_hashtags
+
+                engine = TrendEngine()
+
+                def on_posts(posts, position):
+                    for post in posts:
+                        engine.add_post(post_hashtags(post), post.get('timestamp'))
+
+                history = max(seconds * buckets for seconds, buckets, _ in RESOLUTIONS.values())
+                get_post_store().follow(on_posts, since=time.time() - history)
+                _engine = engine
+    return _engine
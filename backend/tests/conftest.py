@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the app as ``src.*`` and the local stubs as ``bench.*``, like bench/run.py
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+
+from src.embedding_cache import HashtagEmbeddingCache
+
+def vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+def test_vectors_survive_a_restart(tmp_path):
+    cache = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    cache.put_many(["#Coffee", "tea"], vectors(2))
+    reopened = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    found = reopened.get_many(["coffee", "TEA", "latte"])
+    assert sorted(found) == ["coffee", "tea"]
+    np.testing.assert_array_equal(found["coffee"], vectors(2)[0])
+    assert reopened.stats()["disk_hits"] == 2 and reopened.stats()["misses"] == 1
+
+def test_another_workers_vectors_show_up_on_a_miss(tmp_path):
+    first = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    second = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    first.put_many(["coffee"], vectors(1))
+    np.testing.assert_array_equal(second.get_many(["coffee"])["coffee"], vectors(1)[0])
+    # Both appending keeps rows aligned with their tags
+    second.put_many(["tea", "coffee"], vectors(2, seed=1))
+    first.put_many(["latte"], vectors(1, seed=2))
+    found = HashtagEmbeddingCache("model", cache_dir=tmp_path).get_many(["coffee", "tea", "latte"])
+    np.testing.assert_array_equal(found["coffee"], vectors(1)[0])
+    np.testing.assert_array_equal(found["tea"], vectors(2, seed=1)[0])
+    np.testing.assert_array_equal(found["latte"], vectors(1, seed=2)[0])
+
+def test_a_partial_log_line_is_left_for_later(tmp_path):
+    cache = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    cache.put_many(["coffee"], vectors(1))
+    with open(cache._log_path, "ab") as f:
+        f.write(b'["te')
+    reader = HashtagEmbeddingCache("model", cache_dir=tmp_path)
+    assert sorted(reader.get_many(["coffee", "tea"])) == ["coffee"]
+
+def test_a_legacy_index_is_migrated(tmp_path):
+    directory = tmp_path / "model"
+    directory.mkdir()
+    vectors(2).tofile(directory / "vectors.f32")
+    (directory / "index.json").write_text(json.dumps({"model": "model", "dim": 4, "rows": {"coffee": 0, "tea": 1}}))
+    found = HashtagEmbeddingCache("model", cache_dir=tmp_path).get_many(["tea"])
+    np.testing.assert_array_equal(found["tea"], vectors(2)[1])
+    assert not (directory / "index.json").exists()
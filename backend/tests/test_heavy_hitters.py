@@ -0,0 +1,81 @@
+import json
+import random
+from collections import Counter
+
+from src.heavy_hitters import SpaceSaving, TrendingTracker
+
+def zipf_stream(n, vocab=500, seed=7):
+    rnd = random.Random(seed)
+    weights = [1 / rank for rank in range(1, vocab + 1)]
+    return rnd.choices([f"t{i}" for i in range(vocab)], weights, k=n)
+
+def test_exact_while_under_capacity():
+    sketch = SpaceSaving(capacity=10)
+    stream = ["a", "b", "a", "c", "a", "b"]
+    for item in stream:
+        sketch.add(item)
+    assert sketch.counts == Counter(stream)
+    assert all(error == 0 for error in sketch.errors.values())
+    assert sketch.top(2) == [("a", 3), ("b", 2)]
+    assert sketch.upper_bound("z") == 0
+
+def test_error_bounds_hold_on_a_skewed_stream():
+    stream = zipf_stream(20_000)
+    true = Counter(stream)
+    sketch = SpaceSaving(capacity=50)
+    for item in stream:
+        sketch.add(item)
+    assert len(sketch) == 50 and sketch.total == len(stream)
+    assert sketch.min_count == min(sketch.counts.values())
+    for item, count in sketch.counts.items():
+        assert count - sketch.errors[item] <= true[item] <= count
+    for item, n in true.items():
+        assert n <= sketch.upper_bound(item)
+        if n > len(stream) / sketch.capacity:   # guaranteed heavy hitters are always monitored
+            assert item in sketch.counts
+    assert [item for item, _ in sketch.top(5)] == [item for item, _ in true.most_common(5)]
+
+def test_round_trip_continues_like_the_original():
+    stream = zipf_stream(5_000)
+    original = SpaceSaving(capacity=40)
+    for item in stream[:3_000]:
+        original.add(item)
+    restored = SpaceSaving.from_dict(json.loads(json.dumps(original.to_dict())))
+    for item in stream[3_000:]:
+        original.add(item)
+        restored.add(item)
+    assert restored.counts == original.counts
+    assert restored.errors == original.errors
+    assert restored.total == original.total
+
+def post(tags, day):
+    return {"caption": " ".join(f"#{tag}" for tag in tags), "timestamp": day * 86400.0}
+
+def test_tracker_ranks_rising_tags_between_windows():
+    tracker = TrendingTracker(capacity=100, window=86400, path="unused.json")
+    tracker.add_posts([post(["steady"], 10)] * 5 + [post(["steady", "new"], 11)] * 5 + [post(["steady"], 11)] * 1,
+                      position=11)
+    snapshot = tracker.snapshot()
+    assert snapshot["ready"] and snapshot["posts"] == 11
+    assert snapshot["top"][0] == {"tag": "steady", "count": 11, "error": 0}
+    assert [entry["tag"] for entry in snapshot["rising"]] == ["new", "steady"]
+    assert snapshot["rising"][0]["growth"] == 5
+
+def test_checkpoint_restores_sketches_and_feed_position(tmp_path):
+    path = str(tmp_path / "trending.json")
+    tracker = TrendingTracker(capacity=100, window=86400, path=path)
+    tracker.add_posts([post(["a", "b"], 1), post(["a"], 2)], position=42)
+    tracker.checkpoint()
+    restored = TrendingTracker(capacity=100, window=86400, path=path)
+    assert restored.restore()
+    assert restored.position == 42 and restored.ready
+    assert restored.snapshot()["top"] == tracker.snapshot()["top"]
+
+    # Other windows, or checkpoints without a feed position, are rebuilt instead
+    assert not TrendingTracker(window=3600, path=path).restore()
+    with open(path) as f:
+        data = json.load(f)
+    del data["position"]
+    with open(path, "w") as f:
+        json.dump(data, f)
+    assert not TrendingTracker(capacity=100, window=86400, path=path).restore()
@@ -0,0 +1,86 @@
+import threading
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from bench.stubs import _Handler, _serve
+from src.image_proxy import ImageProxy
+
+def png(width=640, height=480):
+    out = BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, "PNG")
+    return out.getvalue()
+
+IMAGES = {"/photo.png": png(), "/broken.png": b"not really a png"}
+
+@pytest.fixture
+def image_server():
+    class Images(_Handler):
+        calls = 0
+
+        def do_GET(self):
+            Images.calls += 1
+            body = IMAGES.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server, url = _serve(Images)
+    server.handler = Images
+    yield server, url
+    server.shutdown()
+
+def read(opened):
+    content_type, chunks = opened[:2]
+    return content_type, b"".join(chunks)
+
+def test_images_are_fetched_once_and_shared_on_disk(tmp_path, image_server):
+    server, url = image_server
+    proxy = ImageProxy(cache_dir=str(tmp_path))
+    assert read(proxy.open(url + "/photo.png")) == ("image/png", IMAGES["/photo.png"])
+    assert read(proxy.open(url + "/photo.png")) == ("image/png", IMAGES["/photo.png"])
+    # Another worker finds it in the shared directory
+    other = ImageProxy(cache_dir=str(tmp_path))
+    assert read(other.open(url + "/photo.png")) == ("image/png", IMAGES["/photo.png"])
+    assert server.handler.calls == 1
+    assert proxy.stats()["memory_hits"] == 1 and other.stats()["disk_hits"] == 1
+    assert proxy.open(url + "/missing.png") is None
+
+def test_concurrent_disk_hits(tmp_path, image_server):
+    server, url = image_server
+    read(ImageProxy(cache_dir=str(tmp_path)).open(url + "/photo.png"))
+    proxy = ImageProxy(cache_dir=str(tmp_path), memory_bytes=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(read(proxy.open(url + "/photo.png"))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [("image/png", IMAGES["/photo.png"])] * 8
+    assert proxy.stats()["disk_hits"] == 8 and proxy.stats()["disk_items"] == 1
+
+def test_variants_are_resized(tmp_path, image_server):
+    _, url = image_server
+    proxy = ImageProxy(cache_dir=str(tmp_path))
+    content_type, body = read(proxy.open_variant(url + "/photo.png", 320, "webp"))
+    assert content_type == "image/webp"
+    with Image.open(BytesIO(body)) as im:
+        assert im.size == (320, 240)
+    assert proxy.stats()["resizes"] == 1
+
+def test_a_failed_resize_serves_the_original_uncached(tmp_path, image_server):
+    _, url = image_server
+    proxy = ImageProxy(cache_dir=str(tmp_path))
+    content_type, chunks, resized = proxy.open_variant(url + "/broken.png", 320, "webp")
+    assert (content_type, b"".join(chunks), resized) == ("image/png", IMAGES["/broken.png"], False)
+    assert proxy.stats()["resizes"] == 0
+    assert proxy.open_variant(url + "/broken.png", 320, "webp")[2] is False
@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from src.ingest import iter_json_array, project_post, batched, JsonArrayWriter
+
+ITEMS = [
+    {"id": "1", "caption": "Café ☕ #coffee", "hashtags": ["coffee"], "likesCount": 3},
+    {"id": "2", "caption": "brackets ] and [ in \"text\"", "nested": {"a": [1, {"b": "}"}]}},
+    {"id": "3", "caption": "emoji 🚀 #launch"},
+]
+
+def byte_chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 16])
+def test_iter_json_array_across_chunk_boundaries(size):
+    data = json.dumps(ITEMS, ensure_ascii=False, indent=2).encode("utf-8")
+    # Size 1 splits every multi-byte character as well as every token
+    assert list(iter_json_array(byte_chunks(data, size))) == ITEMS
+
+def test_iter_json_array_yields_each_item_before_the_rest_arrives():
+    chunks = iter([b'[{"id": "1"}, ', b'{"id": "2"}', b"]"])
+    items = iter_json_array(chunks)
+    assert next(items) == {"id": "1"}
+    assert next(chunks) == b'{"id": "2"}'   # the parser had only read the first chunk
+
+def test_iter_json_array_accepts_str_chunks_and_empty_arrays():
+    assert list(iter_json_array(['[{"a":', ' 1}]'])) == [{"a": 1}]
+    assert list(iter_json_array([b"  [ ]  "])) == []
+
+def test_iter_json_array_ignores_data_after_the_array():
+    assert list(iter_json_array([b'[{"a": 1}]', b"garbage"])) == [{"a": 1}]
+
+@pytest.mark.parametrize("data", [b'{"a": 1}', b"", b'[{"a": 1}, {"b":'])
+def test_iter_json_array_rejects_non_arrays_and_truncated_input(data):
+    with pytest.raises(ValueError):
+        list(iter_json_array([data]))
+
+def test_writer_round_trips_through_the_parser():
+    for items in (ITEMS, []):
+        out = io.StringIO()
+        writer = JsonArrayWriter(out)
+        for item in items:
+            writer.write(item)
+        writer.close()
+        assert json.loads(out.getvalue()) == items
+        assert list(iter_json_array([out.getvalue()])) == items
+
+def test_project_post_keeps_only_analysed_fields():
+    item = {"id": "1", "caption": "x", "latestComments": [{}], "childPosts": [], "displayUrl": "u"}
+    assert project_post(item) == {"id": "1", "caption": "x", "displayUrl": "u"}
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 3)) == []
@@ -0,0 +1,58 @@
+import pytest
+
+from bench.stubs import start_llm_stub
+from bench.synth import Corpus
+from src import llm_client
+from src.llm_gateway import LLMGateway, LLMUnavailable
+
+MESSAGES = [{"role": "user", "content": "Extract 3 keywords from: handmade skincare"}]
+
+@pytest.fixture
+def llm_url(monkeypatch):
+    """Point the shared inference clients at a local OpenAI-compatible stub."""
+    server, url = start_llm_stub(Corpus(vocab_size=500))
+    monkeypatch.setattr(llm_client, "LLM_BASE_URL", url)
+    monkeypatch.setattr(llm_client, "_clients", {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def dead_url(monkeypatch):
+    """A base URL nothing listens on, so every attempt fails to connect."""
+    server, url = start_llm_stub(Corpus(vocab_size=500))
+    server.shutdown()
+    server.server_close()
+    monkeypatch.setattr(llm_client, "LLM_BASE_URL", url)
+    monkeypatch.setattr(llm_client, "_clients", {})
+
+def gateway(**kwargs):
+    return LLMGateway(backoff=0.01, deadlines={"keywords": 10, "suggestions": 10}, **kwargs)
+
+def test_chat_returns_stub_completion_and_records_usage(llm_url):
+    llm = gateway(tokens_per_minute=100_000)
+    text = llm.chat("keywords", MESSAGES, max_tokens=50)
+    assert len(text.split(", ")) == 3
+    assert llm_url.handler.calls == 1
+    stats = llm.stats()["keywords"]
+    assert stats["calls"] == 1 and stats["errors"] == 0
+    assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+    # The budget is charged what the stub reported, not the estimate
+    used = stats["prompt_tokens"] + stats["completion_tokens"]
+    assert llm.budget.tokens == pytest.approx(100_000 - used, abs=5)
+
+def test_failed_calls_refund_their_estimate(dead_url):
+    llm = gateway(retries=1, tokens_per_minute=1_000)
+    with pytest.raises(LLMUnavailable):
+        llm.chat("keywords", MESSAGES, max_tokens=50)
+    with pytest.raises(LLMUnavailable):
+        list(llm.stream_chat("suggestions", MESSAGES, max_tokens=50))
+    assert llm.budget.tokens == pytest.approx(1_000, abs=1)
+    assert llm.stats()["keywords"]["errors"] == 2   # first attempt and one retry
+
+def test_over_budget_calls_are_rejected_without_a_request(llm_url):
+    llm = gateway(tokens_per_minute=10)
+    with pytest.raises(LLMUnavailable, match="budget"):
+        llm.chat("keywords", MESSAGES, max_tokens=50)
+    assert llm_url.handler.calls == 0
+    assert llm.budget.tokens == pytest.approx(10, abs=1)
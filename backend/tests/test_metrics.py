@@ -0,0 +1,42 @@
+import json
+import os
+
+from src import metrics
+from src.metrics import Registry, fold_process_metrics, render_all
+
+def write_worker(directory, pid, requests, seconds):
+    registry = Registry()
+    registry.counter("requests_total", "Requests", ["route"]).inc(requests, route="/analyze")
+    registry.histogram("latency_seconds", "Latency").observe(seconds)
+    with open(os.path.join(directory, f"{pid}-abcd1234.json"), "w", encoding="utf-8") as f:
+        json.dump(registry.dump(), f)
+
+def totals(text):
+    return {line.split(" ")[0]: float(line.split(" ")[1]) for line in text.splitlines()
+            if line.startswith(("requests_total", "latency_seconds_count"))}
+
+def test_exited_workers_fold_into_one_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "registry", Registry())
+    directory = str(tmp_path)
+    for pid in (101, 102, 103):
+        write_worker(directory, pid, requests=pid - 100, seconds=0.2)
+    before = totals(render_all(directory))
+    assert before == {'requests_total{route="/analyze"}': 6, "latency_seconds_count": 3}
+
+    fold_process_metrics(101, directory)
+    fold_process_metrics(102, directory)
+    fold_process_metrics(999, directory)   # no file: nothing to do
+    assert totals(render_all(directory)) == before
+    names = sorted(name for name in os.listdir(directory) if not name.startswith(str(os.getpid())))
+    assert names == ["103-abcd1234.json", "retired.json"]
+
+def test_files_listed_as_folded_are_not_counted_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "registry", Registry())
+    directory = str(tmp_path)
+    write_worker(directory, 101, requests=5, seconds=0.2)
+    fold_process_metrics(101, directory)
+    # As if a reader looked between writing retired.json and removing the file
+    write_worker(directory, 101, requests=5, seconds=0.2)
+    with open(os.path.join(directory, "retired.json"), encoding="utf-8") as f:
+        assert json.load(f)["folded"] == ["101-abcd1234.json"]
+    assert totals(render_all(directory))['requests_total{route="/analyze"}'] == 5
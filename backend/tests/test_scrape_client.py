@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+from bench.stubs import start_apify_stub, _Handler, _serve
+from bench.synth import Corpus
+from src import apify_scraper, post_store, snapshot
+from src.apify_scraper import ScrapeClient, ensure_keywords_fresh_parallel
+
+POSTS_PER_HASHTAG = 20
+
+@pytest.fixture(autouse=True)
+def scratch_dir(tmp_path, monkeypatch):
+    """Post store, snapshots and scraped_data.json under a fresh directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(post_store, "_store", None)
+    monkeypatch.setattr(snapshot, "_snapshots", None)
+
+def stub(latency=0.0):
+    server, url = start_apify_stub(Corpus(vocab_size=500), POSTS_PER_HASHTAG, latency)
+    return server, url + "/acts/stub/run-sync-get-dataset-items"
+
+def test_fetch_streams_items_into_the_post_store():
+    server, url = stub()
+    try:
+        client = ScrapeClient(sync_url=url, token="test", backoff=0.01)
+        assert client.fetch("coffee") == POSTS_PER_HASHTAG
+        store = post_store.get_post_store()
+        assert store.post_count("coffee") == POSTS_PER_HASHTAG
+        assert store.fetched_at("coffee") is not None
+        with open("data/scraped_data.json", encoding="utf-8") as f:
+            assert len(json.load(f)) == POSTS_PER_HASHTAG
+    finally:
+        server.shutdown()
+
+def test_simultaneous_fetches_share_one_upstream_call():
+    server, url = stub(latency=0.3)
+    try:
+        client = ScrapeClient(sync_url=url, token="test", concurrency=4)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.fetch("coffee"))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [POSTS_PER_HASHTAG] * 6
+        assert server.handler.calls == 1
+    finally:
+        server.shutdown()
+
+def flaky_stub(failures, status):
+    """Answers ``status`` for the first ``failures`` calls, then one post."""
+
+    class Flaky(_Handler):
+        calls = 0
+
+        def do_POST(self):
+            self._body()
+            Flaky.calls += 1
+            if Flaky.calls <= failures:
+                self._json({"error": "busy"}, status=status)
+            else:
+                self._json([{"id": "1", "caption": "#coffee", "timestamp": "2025-07-01T00:00:00Z"}], status=201)
+
+    server, url = _serve(Flaky)
+    server.handler = Flaky
+    return server, url
+
+def test_transient_errors_are_retried():
+    server, url = flaky_stub(failures=2, status=503)
+    try:
+        assert ScrapeClient(sync_url=url, token="test", retries=3, backoff=0.01).fetch("coffee") == 1
+        assert server.handler.calls == 3
+    finally:
+        server.shutdown()
+
+def test_permanent_errors_and_exhausted_retries_give_up():
+    server, url = flaky_stub(failures=10, status=400)
+    try:
+        assert ScrapeClient(sync_url=url, token="test", retries=3, backoff=0.01).fetch("coffee") == 0
+        assert server.handler.calls == 1
+    finally:
+        server.shutdown()
+    server, url = flaky_stub(failures=10, status=429)
+    try:
+        assert ScrapeClient(sync_url=url, token="test", retries=2, backoff=0.01).fetch("coffee") == 0
+        assert server.handler.calls == 3
+    finally:
+        server.shutdown()
+
+def test_a_stage_timeout_leaves_the_scrapes_running(monkeypatch):
+    server, url = stub(latency=0.5)
+    try:
+        client = ScrapeClient(sync_url=url, token="test")
+        monkeypatch.setattr(apify_scraper, "_client", client)
+        with pytest.raises(TimeoutError):
+            ensure_keywords_fresh_parallel(["coffee", "tea"], timeout=0.05)
+        client.executor.shutdown(wait=True)
+        store = post_store.get_post_store()
+        assert store.post_count("coffee") == store.post_count("tea") == POSTS_PER_HASHTAG
+    finally:
+        server.shutdown()
@@ -0,0 +1,77 @@
+import os
+import threading
+
+from src.post_store import PostStore
+from src.snapshot import write_snapshot, read_snapshot, SnapshotStore
+from src.trend_analysis import count_hashtags
+from src.top_posts import format_post
+
+POSTS = [
+    {"id": "1", "shortCode": "a", "caption": "Morning brew #coffee #Café", "hashtags": ["coffee", "café"],
+     "timestamp": "2025-07-01T08:00:00.000Z", "likesCount": 10, "commentsCount": 2, "ownerUsername": "ana"},
+    {"id": "2", "caption": "No tags, no likes", "timestamp": "2025-07-02T08:00:00.000Z"},
+    {"id": "3", "caption": "#coffee again 🚀 #latte", "hashtags": [], "likesCount": 10, "commentsCount": 2,
+     "timestamp": "2025-07-03T08:00:00.000Z"},
+    {"id": "4", "caption": "undated #latte", "likesCount": 50},
+]
+
+def test_round_trip_preserves_posts_and_tag_counts(tmp_path):
+    snap = write_snapshot(str(tmp_path / "tag.1"), POSTS, version=1.0, structured=False)
+    assert len(snap) == len(POSTS)
+    assert [snap.post(row) for row in range(len(POSTS))] == POSTS
+    assert snap.tag_counts() == count_hashtags(POSTS, structured=False)
+    assert [snap.tags(row) for row in range(len(POSTS))] == [["coffee", "café"], [], ["coffee", "latte"], ["latte"]]
+
+def test_top_posts_follow_each_sort_mode(tmp_path):
+    snap = write_snapshot(str(tmp_path / "tag.1"), POSTS, version=1.0, structured=False)
+    # Engagement ties (posts 1 and 3) go to the newer post; recency puts undated posts last
+    expected = lambda order: [format_post(POSTS[i]) for i in order]
+    assert snap.top_posts("engagement", limit=4) == expected((3, 2, 0, 1))
+    assert snap.top_posts("recency", limit=4) == expected((2, 1, 0, 3))
+    assert snap.top_posts("recency", limit=2, offset=1) == expected((1, 0))
+
+def test_empty_snapshot(tmp_path):
+    snap = write_snapshot(str(tmp_path / "tag.1"), [], version=1.0, structured=False)
+    assert len(snap) == 0
+    assert snap.top_posts() == []
+    assert snap.tag_counts() == (count_hashtags([], structured=False))
+
+def test_store_publishes_and_rebuilds_on_new_scrapes(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    root = str(tmp_path / "snapshots")
+    snapshots = SnapshotStore(root=root, store=store)
+    store.ingest("coffee", iter(POSTS[:2]), fetched_at=1.0)
+    first = snapshots.get("coffee")
+    assert len(first) == 2 and snapshots.get("coffee") is first
+    assert read_snapshot(root, "coffee").path == first.path
+
+    store.ingest("coffee", iter(POSTS[2:]), fetched_at=2.0)
+    second = snapshots.get("coffee")
+    assert len(second) == 4 and second.version == 2.0
+    assert read_snapshot(root, "coffee").path == second.path
+    # A reader of the replaced build keeps working
+    assert first.post(0)["id"] in {"1", "2"}
+    assert snapshots.builds == 2
+
+def test_concurrent_gets_share_one_build(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    store.ingest("coffee", iter(POSTS), fetched_at=1.0)
+    snapshots = SnapshotStore(root=str(tmp_path / "snapshots"), store=store)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snapshots.get("coffee").path)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1 and snapshots.builds == 1
+
+def test_losing_a_build_race_keeps_the_published_build(tmp_path):
+    store = PostStore(str(tmp_path / "posts.db"))
+    store.ingest("coffee", iter(POSTS), fetched_at=1.0)
+    root = str(tmp_path / "snapshots")
+    winner = SnapshotStore(root=root, store=store).get("coffee")
+    # A second process that built before seeing the pointer throws its copy away
+    loser = SnapshotStore(root=root, store=store)
+    built = loser._build("coffee", 1.0)
+    assert built.path == winner.path
+    assert sorted(name for name in os.listdir(root) if not name.endswith(".current")) == [os.path.basename(winner.path)]
@@ -0,0 +1,10 @@
+import pytest
+
+from check_startup import BUDGETS, measure
+
+@pytest.mark.parametrize("module", list(BUDGETS))
+def test_import_stays_within_budget(module):
+    budget, forbidden = BUDGETS[module]
+    result = measure(module, forbidden)
+    assert not result["loaded"], f"{module} imports {', '.join(result['loaded'])} at import time"
+    assert result["elapsed"] <= budget, f"{module} took {result['elapsed'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)"
@@ -0,0 +1,8 @@
+from src.app import create_app
+from src.embedding_service import preload_backend
+
+app = create_app()
+
+# With preload_app the master imports this module once; pulling in the ML
+# stack here lets every forked worker share it instead of importing its own.
+preload_backend()
@@ -58,6 +58,40 @@ function TrendAnalyzer() {
     }
   };
 
+  // Parse "1. tip\n2. tip" text (possibly still streaming) into a list of tips
+  const parseSuggestions = (text) =>
+    text
+      .split("\n")
+      .map((line) => line.replace(/^[\s\d.•-]+/, "").trim())
+      .filter(Boolean);
+
+  const applyStreamEvent = (event, state) => {
+    switch (event.event) {
+      case "keywords":
+        setKeywords(event.keywords || []);
+        break;
+      case "trends":
+        setTrends(
+          Object.entries(event.trends || {}).map(([tag, stats]) => ({
+            tag: tag.startsWith('#') ? tag : `#${tag}`,
+            ...stats
+          }))
+        );
+        break;
+      case "suggestion_token":
+        state.suggestionText += event.token;
+        setSuggestions(parseSuggestions(state.suggestionText));
+        break;
+      case "suggestions":
+        setSuggestions(event.suggestions || []);
+        break;
+      case "error":
+        throw new Error(event.error || `Server error: ${event.status}`);
+      default:
+        break;
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -67,26 +101,33 @@ function TrendAnalyzer() {
     setError("");
 
     try {
-      const response = await fetch("http://localhost:5000/analyze", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ prompt }),
-    });
+      // Streams NDJSON events so each section renders as soon as its stage finishes
+      const response = await fetch("http://localhost:5000/analyze/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ prompt }),
+      });
 
       if (!response.ok) {
         throw new Error(`Server error: ${response.status}`);
       }
 
-      const data = await response.json();
-
-      const trendList = Object.entries(data.trends || {}).map(([tag, stats]) => ({
-        tag: tag.startsWith('#') ? tag : `#${tag}`,
-        ...stats
-      }));
-
-      setKeywords(data.keywords || []);
-      setTrends(trendList);
-      setSuggestions(data.suggestions || []);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const state = { suggestionText: "" };
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        for (const line of lines) {
+          if (line.trim()) applyStreamEvent(JSON.parse(line), state);
+        }
+      }
+      if (buffer.trim()) applyStreamEvent(JSON.parse(buffer), state);
     } catch (err) {
       console.error("Error:", err);
       setError(err.message || "Failed to analyze trends. Please try again.");
@@ -243,7 +284,7 @@ function TrendAnalyzer() {
                   <div className="aspect-square bg-slate-800">
                     {post.imageUrl ? (
                       <img
-                        src={`http://localhost:5000/proxy-image?url=${encodeURIComponent(post.imageUrl)}`}
+                        src={`http://localhost:5000/proxy-image?url=${encodeURIComponent(post.imageUrl)}&w=480&format=webp`}
                         alt="Instagram post"
                         className="w-full h-full object-cover"
                         onError={(e) => {